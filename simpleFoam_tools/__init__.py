@@ -1,9 +1,53 @@
-from .gen_blockMeshDict import generate_blockMeshDict
-from .gen_controlDict import generate_controlDict
-from .gen_p import generate_pressure_field
-from .gen_U import generate_velocity_field
-from .gen_snappyHexMeshDict import generate_snappyHexMeshDict
-from .remove_run import remove_run_files
-from .vti2stl import vti_to_stl
+import importlib
+
+# Public names and the modules defining them. Modules are imported on first
+# attribute access, so `import simpleFoam_tools` (e.g. for the CLI or for
+# remove_run_files) does not pay for numpy/scipy/pandas until they are needed.
+_EXPORTS = {
+    "gen_blockMeshDict": ["generate_blockMeshDict"],
+    "gen_controlDict": ["generate_controlDict"],
+    "gen_p": ["generate_pressure_field"],
+    "gen_U": ["generate_velocity_field"],
+    "gen_snappyHexMeshDict": ["generate_snappyHexMeshDict"],
+    "gen_decomposeParDict": ["generate_decomposeParDict"],
+    "gen_fvSolution": ["generate_fvSolution"],
+    "gen_fvSchemes": ["generate_fvSchemes"],
+    "gen_Phi": ["generate_potential_field"],
+    "remove_run": ["remove_run_files"],
+    "vti2stl": ["vti_to_stl"],
+    "voxel_mesh": ["write_voxel_polyMesh"],
+    "mesh_cache": ["MeshCache"],
+    "results_store": ["ResultsStore"],
+    "convergence": ["ConvergenceMonitor"],
+    "profiling": ["Profiler", "aggregate_profiles"],
+    "porosity_comp": ["vti_phi", "vti_shape", "find_pore_location"],
+    "voxel_volume": ["VoxelVolume"],
+    "percolation": ["percolating_volume"],
+    "stokes": ["solve_stokes"],
+    "descriptors": ["describe", "screen_subvolumes"],
+    "permeability": ["darcy_permeability", "read_final_flow_rate"],
+    "mesh_estimate": ["estimate_mesh", "predict_mesh"],
+    "throats": ["find_throats", "write_throat_regions"],
+    "pyramid": ["build_pyramid", "run_preview"],
+    "foam_reader": ["FoamMesh", "read_field", "plane_fluxes", "velocity_statistics", "permeability_history"],
+    "batch": ["run_batch", "run_case", "prepare_case"],
+    "rev": ["run_rev"],
+    "tensor": ["run_tensor"],
+    "grid_convergence": ["run_mesh_convergence", "richardson_extrapolation"],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+__all__ = list(_MODULES) + ["run_simplefoam"]
+
+# Imported eagerly (it is light): the function shares its module's name, which a
+# lazy import of the submodule would otherwise bind on the package
 from .run_simplefoam import run_simplefoam
-from .porosity_comp import vti_phi, vti_shape, find_pore_location
\ No newline at end of file
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_MODULES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,440 @@
+import os
+import csv
+import glob
+import json
+import shutil
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+
+from .gen_blockMeshDict import generate_blockMeshDict
+from .gen_controlDict import generate_controlDict, IO_PROFILES
+from .gen_p import generate_pressure_field
+from .gen_U import generate_velocity_field
+from .gen_snappyHexMeshDict import generate_snappyHexMeshDict
+from .gen_fvSolution import generate_fvSolution
+from .gen_fvSchemes import generate_fvSchemes
+from .gen_Phi import generate_potential_field
+from .vti2stl import vti_to_stl
+from .voxel_mesh import write_voxel_polyMesh
+from .run_simplefoam import run_simplefoam
+from .porosity_comp import vti_phi, vti_shape, find_pore_location
+from .permeability import darcy_permeability, read_final_flow_rate, M2_TO_MD
+from .voxel_volume import as_volume
+from .percolation import percolating_volume
+from .stokes import solve_stokes
+from .profiling import Profiler, mesh_size
+from .convergence import ConvergenceMonitor
+from .mesh_cache import MeshCache, _link_or_copy
+from .results_store import ResultsStore
+from .mesh_estimate import predict_mesh, check_memory, connected_pore
+from .descriptors import interface_faces, kozeny_carman_permeability
+from .throats import find_throats, throat_region_cells, write_throat_regions
+
+DEFAULT_PARAMS = {
+    "scale": 1e-6,              # voxel size [m]
+    "dp": 1.0,                  # pressure difference [Pa]
+    "mu": 1e-3,                 # viscosity [Pa s]
+    "boundary": "symmetryPlane",
+    "refinement": 0,
+    "factor_mesh": (1, 1, 1),   # (factor_mesh_x, factor_mesh_y, factor_mesh_z)
+    "dt": 1e-6,
+    "end_time": 50e-6,
+    "write_interval": 10,
+    "mesher": "snappy",
+    "n_procs": 1,               # or "auto": the predicted recommended process count
+    "io_profile": "ascii",      # see gen_controlDict.IO_PROFILES
+    "solver": "simpleFoam",     # or "stokes" for the built-in voxel Stokes solver (no OpenFOAM)
+    "mesh_cache": None,         # MeshCache directory shared by all jobs, or None
+    "flow_axis": 0,             # flow direction: 0 = x, 1 = y, 2 = z
+    "percolation": True,        # mesh only the pore clusters connecting inlet and outlet (fails if none)
+    "monitor": None,            # ConvergenceMonitor keyword arguments ({} for defaults) to stop early, or None
+    "flux_functions": True,     # flowRate_* function objects in controlDict instead of postProcess passes
+    "memory_gb": None,          # memory a job may use; larger predicted meshes are rejected (None: only warn)
+    "fv_preset": None,          # fvSolution/fvSchemes preset ("stokes", "robust", "default"), or None for the template's
+    "potential_init": False,    # seed U and p with potentialFoam before simpleFoam
+    "throat_cells": None,       # refine throats resolved by fewer background cells across (snappy), or None
+    "throat_regions": "stl",    # throat refinement regions: "stl" (voxel surfaces) or "box" (searchableBox)
+}
+
+# Template entries that belong to a single run and are never cloned
+_TEMPLATE_SKIP = {"polyMesh", "geometry", "triSurface", "cellLevel", "pointLevel"}
+
+def _clone_template(template_dir, case_dir):
+    """Copy system/, constant/ and 0/ from the template case, without meshes, geometry or results."""
+    if os.path.abspath(template_dir) == os.path.abspath(case_dir):
+        return  # the template is set up in place, as in run_porePermFoam.ipynb
+    for sub in ("system", "constant", "0"):
+        src = os.path.join(template_dir, sub)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(case_dir, sub), dirs_exist_ok=True,
+                            ignore=lambda d, names: [n for n in names if n in _TEMPLATE_SKIP])
+
+def _mesh_resolution(shape, factor_mesh):
+    fx, fy, fz = factor_mesh
+    return (int(shape[0]*fx), int(shape[1]*fy), int(shape[2]*fz))
+
+def _mesh_stats(volume, mesher, location_in_mesh=None) -> tuple:
+    """(pore fraction, interface faces) of the pore space `mesher` meshes, as taken by predict_mesh."""
+    if mesher == "voxel":
+        return vti_phi(volume), interface_faces(volume)
+    return connected_pore(volume, location_in_mesh)
+
+def _plan_mesh(volume, p, max_procs=None, stats=None, regions=None) -> dict:
+    """
+    predict_mesh() for the case of `p`, resolving n_procs="auto" to the recommended
+    count (at most `max_procs`, default: all cores). `stats` caches _mesh_stats();
+    `regions` are the throat refinement regions (see throats.throat_region_cells).
+    """
+    porosity, faces = stats or _mesh_stats(volume, p["mesher"])
+    mesh_resolution = _mesh_resolution(volume.shape, p["factor_mesh"])
+    n_procs = p["n_procs"]
+    if n_procs == "auto":
+        recommended = predict_mesh(volume.shape, mesh_resolution, porosity, faces, p["refinement"],
+                                   p["mesher"], regions=regions)["recommended_procs"]
+        n_procs = min(recommended, max_procs or os.cpu_count())
+    estimate = predict_mesh(volume.shape, mesh_resolution, porosity, faces, p["refinement"], p["mesher"],
+                            n_procs=int(n_procs), regions=regions)
+    estimate["n_procs"] = int(n_procs)
+    return estimate
+
+def prepare_case(vti_path, case_dir: str, params: dict, template_dir: str = ".", profiler=None,
+                 stl_path: str = None) -> str:
+    """
+    Create an isolated OpenFOAM case for one sample: clone the template and
+    generate STL, blockMesh/snappyHexMesh (or voxel polyMesh), controlDict, p and U,
+    as done in the setup cell of run_porePermFoam.ipynb. The parameters, sample
+    shape, porosity and mesh estimate are written to case_dir/params.json (read by
+    the `porepermfoam` mesh/solve/post commands). A template_dir equal to case_dir
+    is used in place.
+
+    With params['mesh_cache'] set, the STL / voxel polyMesh is not generated when the
+    mesh is already cached; run_simplefoam restores it from the returned key. An
+    existing `stl_path` (e.g. shared by the flow directions of run_tensor) is linked
+    into the case instead of extracting the surface again; it must be the surface of
+    the volume this case meshes (see params['percolation'] below).
+
+    The mesh size and memory are predicted first (see mesh_estimate.predict_mesh):
+    a case that would not fit in params['memory_gb'] raises MemoryError before
+    anything is meshed (without memory_gb, a case larger than this node's memory
+    only gets a warning), and the snappyHexMesh castellated cell limits are sized
+    from the prediction.
+
+    With params['fv_preset'] the template's fvSolution/fvSchemes are replaced by
+    generated ones (see gen_fvSolution.SOLVER_PRESETS). With params['potential_init']
+    0/Phi is generated for potentialFoam, with an inlet potential from the
+    Kozeny-Carman permeability so that the seeded velocity has about the right magnitude.
+
+    With params['throat_cells'] (snappy only) the pore throats resolved by fewer
+    background cells across are found from the pore distance transform (see
+    throats.find_throats) and refined locally through snappyHexMesh refinementRegions
+    (params['throat_regions'] "stl" or "box"), instead of raising factor_mesh or
+    refinement everywhere.
+
+    With params['percolation'] (default) the pore clusters that do not connect the
+    inlet and outlet faces along params['flow_axis'] are removed first (see
+    percolation.percolating_volume) and everything below is built from the cleaned
+    volume; a sample that does not percolate raises ValueError before anything is
+    meshed. The percolation report is written to params.json.
+
+    Returns:
+        str: The MeshCache key of this case's mesh, or None without a mesh cache.
+    """
+    p = {**DEFAULT_PARAMS, **params}
+    profiler = profiler or Profiler()
+    volume = as_volume(vti_path)
+    porosity = vti_phi(volume)
+    percolation = None
+    if p["percolation"]:
+        with profiler.stage("percolation", voxels=volume.size):
+            volume, percolation = percolating_volume(volume, axis=p["flow_axis"])
+    _clone_template(template_dir, case_dir)
+
+    shape = vti_shape(volume)
+    mesh_resolution = _mesh_resolution(shape, p["factor_mesh"])
+    stats = (vti_phi(volume), interface_faces(volume))
+    location_in_mesh = find_pore_location(volume) if p["mesher"] != "voxel" else None
+    throats, throat_labels = [], None
+    if p["throat_cells"] and p["mesher"] != "voxel":
+        with profiler.stage("find_throats", voxels=volume.size):
+            throats, throat_labels = find_throats(volume, p["throat_cells"], p["factor_mesh"],
+                                                      flow_axis=p["flow_axis"])
+    mesh_stats = stats if p["mesher"] == "voxel" else connected_pore(volume, location_in_mesh)
+    estimate = _plan_mesh(volume, p, stats=mesh_stats,
+                          regions=throat_region_cells(throats, shape, p["factor_mesh"]) if throats else None)
+    print(f"Predicted mesh: {estimate['cells']:,} cells, {estimate['faces']:,} faces, "
+          f"{estimate['memory_bytes'] / 2**30:.2f} GB, {estimate['recommended_procs']} processes recommended")
+    check_memory(estimate, p["memory_gb"] * 2**30 if p["memory_gb"] else None)
+
+    mesh_key, cached = None, False
+    if p["mesh_cache"]:
+        cache = MeshCache(p["mesh_cache"])
+        mesh_key = cache.key(volume, mesher=p["mesher"], shape=shape, mesh_resolution=mesh_resolution,
+                             refinement=p["refinement"], boundary=p["boundary"],
+                             location_in_mesh=location_in_mesh, scale=p["scale"], flow_axis=p["flow_axis"],
+                             throat_cells=p["throat_cells"], throat_regions=p["throat_regions"])
+        cached = mesh_key in cache
+
+    io = IO_PROFILES[p["io_profile"]]
+    if p["mesher"] == "voxel":
+        if not cached:
+            with profiler.stage("voxel_polyMesh", voxels=volume.size) as record:
+                write_voxel_polyMesh(volume, case_dir, mesh_resolution, scale=p["scale"], boundary=p["boundary"],
+                                     binary=io["write_format"] == "binary", compression=io["write_compression"],
+                                     flow_axis=p["flow_axis"])
+                record["cells"] = mesh_size(case_dir)[0]
+    else:
+        case_stl = os.path.join(case_dir, "constant", "triSurface", "sample.stl")
+        if stl_path and not cached:
+            os.makedirs(os.path.dirname(case_stl), exist_ok=True)
+            if os.path.lexists(case_stl):
+                os.remove(case_stl)
+            _link_or_copy(stl_path, case_stl)
+        elif not cached:
+            with profiler.stage("vti_to_stl", voxels=volume.size):
+                vti_to_stl(volume, case_stl)
+        regions = None
+        if throats:
+            regions = write_throat_regions(throats, throat_labels, case_dir, mode=p["throat_regions"],
+                                           factor_mesh=p["factor_mesh"])
+        generate_blockMeshDict(shape, mesh_resolution, os.path.join(case_dir, "system", "blockMeshDict"),
+                               boundary=p["boundary"], flow_axis=p["flow_axis"])
+        generate_snappyHexMeshDict(location_in_mesh, "sample.stl",
+                                   os.path.join(case_dir, "system", "snappyHexMeshDict"),
+                                   refinement=p["refinement"], max_local_cells=estimate["max_local_cells"],
+                                   max_global_cells=estimate["max_global_cells"], regions=regions)
+    generate_controlDict(os.path.join(case_dir, "system", "controlDict"),
+                         end_time=p["end_time"], write_interval=p["write_interval"], dt=p["dt"],
+                         flux_functions=p["flux_functions"] or p["monitor"] is not None, io_profile=p["io_profile"])
+    generate_pressure_field(os.path.join(case_dir, "0", "p"), dp=p["dp"], boundary=p["boundary"])
+    generate_velocity_field(os.path.join(case_dir, "0", "U"), boundary=p["boundary"])
+    if p["fv_preset"]:
+        generate_fvSolution(os.path.join(case_dir, "system", "fvSolution"), preset=p["fv_preset"])
+        generate_fvSchemes(os.path.join(case_dir, "system", "fvSchemes"), preset=p["fv_preset"])
+    if p["potential_init"]:
+        # Mean pore velocity k dp / (mu porosity L) times the sample length L; k at most
+        # that of a slit as wide as the domain (Kozeny-Carman is infinite without solid)
+        porosity, faces = stats
+        k = min(kozeny_carman_permeability(porosity, faces * p["scale"]**2 / (volume.size * p["scale"]**3)),
+                (min(shape) * p["scale"])**2 / 12)
+        generate_potential_field(os.path.join(case_dir, "0", "Phi"), k * p["dp"] / (p["mu"] * porosity),
+                                 boundary=p["boundary"])
+
+    with open(os.path.join(case_dir, "params.json"), 'w') as f:
+        json.dump({"vti": str(getattr(vti_path, "path", vti_path)), **p, "n_procs": estimate["n_procs"],
+                   "mesh_key": mesh_key, "shape": list(shape), "porosity": porosity, "percolation": percolation,
+                   "mesh_estimate": estimate}, f, indent=2)
+    return mesh_key
+
+def run_case(vti_path, case_dir: str, params: dict, template_dir: str = ".", stl_path: str = None,
+             map_fields_from: str = None) -> dict:
+    """
+    Prepare and run one case, returning a result row with porosity and permeability.
+
+    With params['solver'] == "stokes" no OpenFOAM case is set up; the built-in
+    voxel Stokes solver computes the permeability directly. The permeability is
+    along params['flow_axis']; `stl_path` is passed to prepare_case and
+    `map_fields_from` (warm start from another case) to run_simplefoam.
+
+    All output of the case goes to case_dir/log.run. Failures are reported in the
+    row ('status' and 'error') instead of being raised, so a batch keeps going.
+    params['n_procs'] == "auto" runs on the recommended process count (see _plan_mesh).
+    """
+    p = {**DEFAULT_PARAMS, **params}
+    row = {"case": os.path.basename(case_dir), "vti": str(getattr(vti_path, "path", vti_path)), **p,
+           "status": "failed", "porosity": None, "permeability_m2": None, "permeability_mD": None, "error": ""}
+    os.makedirs(case_dir, exist_ok=True)
+    with open(os.path.join(case_dir, "log.run"), 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            profiler = Profiler(row["case"])
+            volume = as_volume(vti_path)
+            if p["n_procs"] == "auto":
+                p["n_procs"] = 1 if p["solver"] == "stokes" else _plan_mesh(volume, p)["n_procs"]
+                row["n_procs"] = p["n_procs"]
+            if p["solver"] == "stokes":
+                k = solve_stokes(volume, axis=p["flow_axis"], scale=p["scale"], dp=p["dp"], mu=p["mu"],
+                                 boundary=p["boundary"], profiler=profiler)["permeability_m2"]
+                profiler.write(case_dir)
+            else:
+                mesh_key = prepare_case(volume, case_dir, p, template_dir=template_dir, profiler=profiler,
+                                        stl_path=stl_path)
+                shape = vti_shape(volume)
+                monitor = ConvergenceMonitor(case_dir, **p["monitor"]) if p["monitor"] is not None else None
+                run_simplefoam(case_dir, scale=p["scale"], mesher=p["mesher"], n_procs=p["n_procs"], shape=shape,
+                               profiler=profiler, mesh_cache=MeshCache(p["mesh_cache"]) if mesh_key else None,
+                               mesh_key=mesh_key, monitor=monitor, map_fields_from=map_fields_from,
+                               potential_init=p["potential_init"])
+                q = read_final_flow_rate(case_dir, "inlet")
+                k = darcy_permeability(q, shape, p["scale"], p["dp"], p["mu"], axis=p["flow_axis"])
+            row.update(status="done", porosity=vti_phi(volume), permeability_m2=k, permeability_mD=k * M2_TO_MD)
+        except (Exception, SystemExit) as e:
+            row["error"] = str(e)
+            print(f"Case failed: {e}")
+    return row
+
+def expand_grid(grid: dict) -> list:
+    """Expand {name: [values, ...]} into the list of all parameter combinations."""
+    if not grid:
+        return [{}]
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+def _read_samples(samples):
+    """Return [(vti_path, per-sample params)] from a directory, a manifest CSV or a list of paths."""
+    if isinstance(samples, str) and os.path.isdir(samples):
+        return [(path, {}) for path in sorted(glob.glob(os.path.join(samples, "*.vti")))]
+    if isinstance(samples, str) and samples.lower().endswith(".csv"):
+        base = os.path.dirname(os.path.abspath(samples))
+        entries = []
+        with open(samples, newline='') as f:
+            for record in csv.DictReader(f):
+                vti = record.pop("vti")
+                overrides = {k: json.loads(v) if v[:1] in "[{" else _parse_scalar(v)
+                             for k, v in record.items() if v not in (None, "")}
+                if "factor_mesh" in overrides:
+                    overrides["factor_mesh"] = tuple(overrides["factor_mesh"])
+                entries.append((os.path.join(base, vti), overrides))
+        return entries
+    if isinstance(samples, str):
+        samples = [samples]
+    return [(path, {}) for path in samples]
+
+def _parse_scalar(value):
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+def schedule(jobs: list, core_budget: int, worker=run_case, on_result=None) -> list:
+    """
+    Run jobs on a process pool without exceeding `core_budget` cores in total.
+
+    Each job is a dict of keyword arguments for `worker` whose params['n_procs']
+    gives the cores it occupies; serial and MPI jobs are packed together, largest
+    first, and a new job starts whenever enough cores are free. `on_result(job, result)`
+    is called in this process as soon as each job finishes.
+
+    Returns:
+        list: Worker results, in the order of `jobs`.
+    """
+    cores = [max(1, int(job["params"].get("n_procs", 1))) for job in jobs]
+    too_big = [c for c in cores if c > core_budget]
+    if too_big:
+        raise ValueError(f"Job needs {max(too_big)} cores but the core budget is {core_budget}")
+
+    pending = sorted(range(len(jobs)), key=lambda i: -cores[i])
+    results = [None] * len(jobs)
+    running = {}
+    free = core_budget
+    with ProcessPoolExecutor(max_workers=core_budget) as pool:
+        while pending or running:
+            for i in list(pending):
+                if cores[i] <= free:
+                    pending.remove(i)
+                    free -= cores[i]
+                    running[pool.submit(worker, **jobs[i])] = i
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                free += cores[i]
+                results[i] = future.result()
+                if on_result is not None:
+                    on_result(jobs[i], results[i])
+                print(f"[{len(jobs) - len(pending) - len(running)}/{len(jobs)}] "
+                      f"{os.path.basename(jobs[i]['case_dir'])}: {results[i].get('status', 'done')}")
+    return results
+
+def run_batch(samples, work_dir: str, grid: dict = None, core_budget: int = None,
+              template_dir: str = ".", params: dict = None, store=None) -> pd.DataFrame:
+    """
+    Run a permeability sweep over many samples and parameter combinations.
+
+    With a results store, jobs whose geometry and parameters were already computed
+    are not run again: their stored rows are returned, and every new run is recorded
+    as soon as it finishes, so a resubmitted campaign only computes what is missing.
+
+    The mesh size and memory of every OpenFOAM job are predicted up front (see
+    mesh_estimate.predict_mesh): n_procs="auto" becomes the recommended process
+    count (at most core_budget), and with params['memory_gb'] set, jobs that would
+    not fit are reported with status "rejected" instead of being scheduled.
+
+    Parameters:
+        samples: Directory of .vti files, a manifest CSV with a 'vti' column (other
+            columns override parameters per sample), or a list of .vti paths.
+        work_dir (str): Directory that receives one case directory per job and results.csv.
+        grid (dict): Parameter grid, e.g. {"dp": [0.5, 1.0], "boundary": ["Wall"],
+            "factor_mesh": [(1, 1, 1), (2, 2, 2)], "n_procs": [1, 4]}.
+        core_budget (int): Total cores to use at once (default: all cores).
+        template_dir (str): Case whose system/, constant/ and 0/ are cloned for every job.
+        params (dict): Fixed parameters applied to every job (see DEFAULT_PARAMS).
+        store (str or ResultsStore): SQLite results store (path or instance), or None.
+
+    Returns:
+        pandas.DataFrame: One row per job with its parameters, status, porosity and permeability.
+    """
+    core_budget = core_budget or os.cpu_count()
+    os.makedirs(work_dir, exist_ok=True)
+    if isinstance(store, str):
+        store = ResultsStore(store)
+
+    jobs, positions, rows, keys, rejected = [], [], [], {}, 0
+    for vti_path, overrides in _read_samples(samples):
+        volume = as_volume(vti_path)  # build the voxel cache once, before the workers share it
+        geometry_hash = volume.content_hash if store is not None else None
+        stem = os.path.splitext(os.path.basename(vti_path))[0]
+        stats = {}  # _mesh_stats per mesher
+        for combo in expand_grid(grid):
+            case_dir = os.path.join(os.path.abspath(work_dir), f"{stem}_{len(rows):04d}")
+            job = {
+                "vti_path": os.path.abspath(vti_path),
+                "case_dir": case_dir,
+                "params": {**(params or {}), **combo, **overrides},
+                "template_dir": os.path.abspath(template_dir),
+            }
+            rows.append(None)
+            if store is not None:
+                key = store.key(geometry_hash, {**DEFAULT_PARAMS, **job["params"]})
+                if key in store:
+                    rows[-1] = store.get(key)
+                    continue
+                keys[case_dir] = (key, geometry_hash)
+            p = {**DEFAULT_PARAMS, **job["params"]}
+            if p["solver"] == "stokes":
+                job["params"]["n_procs"] = 1 if p["n_procs"] == "auto" else p["n_procs"]
+            else:
+                if p["mesher"] not in stats:
+                    stats[p["mesher"]] = _mesh_stats(volume, p["mesher"])
+                estimate = _plan_mesh(volume, p, max_procs=core_budget, stats=stats[p["mesher"]])
+                job["params"]["n_procs"] = estimate["n_procs"]
+                try:
+                    check_memory(estimate, p["memory_gb"] * 2**30 if p["memory_gb"] else None)
+                except MemoryError as e:
+                    rows[-1] = {"case": os.path.basename(case_dir), "vti": job["vti_path"], **p,
+                                "n_procs": estimate["n_procs"], "status": "rejected", "porosity": vti_phi(volume),
+                                "permeability_m2": None, "permeability_mD": None, "error": str(e)}
+                    print(f"Rejected {os.path.basename(case_dir)}: {e}")
+                    rejected += 1
+                    continue
+            positions.append(len(rows) - 1)
+            jobs.append(job)
+    skipped = len(rows) - len(jobs) - rejected
+    print(f"Running {len(jobs)} cases on {core_budget} cores in {work_dir}"
+          + (f" ({skipped} already in {store.path})" if skipped else "")
+          + (f" ({rejected} rejected: predicted memory too large)" if rejected else ""))
+
+    def record(job, row):
+        if store is not None:
+            key, geometry_hash = keys[job["case_dir"]]
+            store.record_case(key, geometry_hash, row, {**DEFAULT_PARAMS, **job["params"]}, job["case_dir"])
+
+    for i, row in zip(positions, schedule(jobs, core_budget, on_result=record) if jobs else []):
+        rows[i] = row
+    results = pd.DataFrame(rows)
+    results_path = os.path.join(work_dir, "results.csv")
+    results.to_csv(results_path, index=False)
+    print(f"Wrote {len(results)} results to {results_path}")
+    return results
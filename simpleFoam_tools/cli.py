@@ -0,0 +1,211 @@
+"""
+Command line interface: the workflow of run_porePermFoam.ipynb for batch job scripts.
+
+    porepermfoam prepare constant/geometry/channel1.vti case/ --template . --dp 1 --boundary Wall
+    porepermfoam mesh case/
+    porepermfoam solve case/
+    porepermfoam post case/          # prints {"porosity": ..., "permeability_m2": ..., ...}
+    porepermfoam run sample.vti case/ --config params.json --n-procs auto
+    porepermfoam preview sample.vti preview/ --factor 4   # coarse permeability and full-resolution cost
+
+`prepare` writes case/params.json; mesh, solve and post read it, so they need no
+flags and can run as separate jobs. Progress goes to stderr, the JSON result to
+stdout (and post/run also write it to case/result.json). Heavy modules are only
+imported by the commands that need them.
+"""
+import os
+import sys
+import json
+import argparse
+import contextlib
+
+# Command line flags that map directly onto run parameters (see batch.DEFAULT_PARAMS)
+_PARAM_FLAGS = {
+    "scale": float, "dp": float, "mu": float, "boundary": str, "refinement": int, "mesher": str,
+    "solver": str, "flow_axis": int, "io_profile": str, "fv_preset": str, "mesh_cache": str,
+    "memory_gb": float, "end_time": float, "dt": float, "write_interval": int, "throat_cells": float,
+    "throat_regions": str,
+}
+
+def _value(text):
+    """A --set value: JSON if it parses (numbers, lists, null, {...}), else the plain string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def _procs(text):
+    return text if text == "auto" else int(text)
+
+def _params(args) -> dict:
+    """Run parameters from --config, then the explicit flags, then --set KEY=VALUE."""
+    params = {}
+    if args.config:
+        with open(args.config) as f:
+            params.update(json.load(f))
+    for name in _PARAM_FLAGS:
+        if getattr(args, name) is not None:
+            params[name] = getattr(args, name)
+    if args.factor_mesh is not None:
+        params["factor_mesh"] = tuple(args.factor_mesh)
+    if args.n_procs is not None:
+        params["n_procs"] = args.n_procs
+    if args.potential_init:
+        params["potential_init"] = True
+    if args.monitor:
+        params["monitor"] = params.get("monitor") or {}
+    for item in args.set or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"--set expects KEY=VALUE, got {item!r}")
+        params[name] = _value(value)
+    return params
+
+def _case_params(case_dir) -> dict:
+    path = os.path.join(case_dir, "params.json")
+    if not os.path.exists(path):
+        raise ValueError(f"No {path}; run 'porepermfoam prepare' for this case first")
+    with open(path) as f:
+        return json.load(f)
+
+def _profiler(case_dir):
+    """A Profiler continuing the stages of an existing case/profile.json, so split phases add up."""
+    from .profiling import Profiler
+    profiler = Profiler(os.path.basename(os.path.abspath(case_dir)))
+    with contextlib.suppress(OSError, ValueError, KeyError):
+        with open(os.path.join(case_dir, "profile.json")) as f:
+            profiler.stages = json.load(f)["stages"]
+    return profiler
+
+def _run_phases(case_dir, phases, map_fields_from=None):
+    """run_simplefoam on a prepared case with its params.json."""
+    from .run_simplefoam import run_simplefoam
+    p = _case_params(case_dir)
+    if p["solver"] == "stokes":
+        raise ValueError("Stokes cases are solved by 'porepermfoam run' without OpenFOAM phases")
+    mesh_cache = None
+    if p.get("mesh_cache") and p.get("mesh_key"):
+        from .mesh_cache import MeshCache
+        mesh_cache = MeshCache(p["mesh_cache"])
+    monitor = None
+    if "solve" in phases and p.get("monitor") is not None:
+        from .convergence import ConvergenceMonitor
+        monitor = ConvergenceMonitor(case_dir, **p["monitor"])
+    run_simplefoam(case_dir, scale=p["scale"], mesher=p["mesher"], n_procs=p["n_procs"], shape=p["shape"],
+                   monitor=monitor, profiler=_profiler(case_dir), mesh_cache=mesh_cache,
+                   mesh_key=p.get("mesh_key"), map_fields_from=map_fields_from,
+                   potential_init=p.get("potential_init", False), phases=phases)
+    return p
+
+def _result(case_dir, p, k) -> dict:
+    from .permeability import M2_TO_MD
+    result = {"case": os.path.abspath(case_dir), "vti": p.get("vti"), "status": "done",
+              "porosity": p.get("porosity"), "permeability_m2": k, "permeability_mD": k * M2_TO_MD,
+              "flow_axis": p.get("flow_axis", 0)}
+    with open(os.path.join(case_dir, "result.json"), 'w') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+def _post(case_dir, p) -> dict:
+    from .permeability import darcy_permeability, read_final_flow_rate
+    k = darcy_permeability(read_final_flow_rate(case_dir, "inlet"), p["shape"], p["scale"], p["dp"], p["mu"],
+                           axis=p.get("flow_axis", 0))
+    return _result(case_dir, p, k)
+
+def cmd_prepare(args) -> dict:
+    from .batch import prepare_case, DEFAULT_PARAMS
+    p = {**DEFAULT_PARAMS, **_params(args)}
+    os.makedirs(args.case, exist_ok=True)
+    profiler = _profiler(args.case)
+    mesh_key = prepare_case(args.vti, args.case, p, template_dir=args.template or args.case, profiler=profiler)
+    profiler.write(args.case)
+    prepared = _case_params(args.case)
+    return {"case": os.path.abspath(args.case), "status": "prepared", "porosity": prepared["porosity"],
+            "n_procs": prepared["n_procs"], "mesh_key": mesh_key, "mesh_estimate": prepared["mesh_estimate"]}
+
+def cmd_mesh(args) -> dict:
+    _run_phases(args.case, ("mesh",))
+    return {"case": os.path.abspath(args.case), "status": "meshed"}
+
+def cmd_solve(args) -> dict:
+    _run_phases(args.case, ("solve",), map_fields_from=args.map_fields_from)
+    return {"case": os.path.abspath(args.case), "status": "solved"}
+
+def cmd_post(args) -> dict:
+    p = _run_phases(args.case, ("post",))
+    return _post(args.case, p)
+
+def cmd_run(args) -> dict:
+    from .batch import DEFAULT_PARAMS
+    p = {**DEFAULT_PARAMS, **_params(args)}
+    if p["solver"] == "stokes":
+        from .stokes import solve_stokes
+        os.makedirs(args.case, exist_ok=True)
+        profiler = _profiler(args.case)
+        solution = solve_stokes(args.vti, axis=p["flow_axis"], scale=p["scale"], dp=p["dp"], mu=p["mu"],
+                                boundary=p["boundary"], profiler=profiler)
+        profiler.write(args.case)
+        return _result(args.case, {**p, "vti": os.path.abspath(args.vti), "porosity": solution["porosity"]},
+                       solution["permeability_m2"])
+    cmd_prepare(args)
+    p = _run_phases(args.case, ("mesh", "solve", "post"), map_fields_from=args.map_fields_from)
+    return _post(args.case, p)
+
+def cmd_preview(args) -> dict:
+    from .pyramid import run_preview
+    return run_preview(args.vti, args.case, factor=args.factor, params=_params(args),
+                       template_dir=args.template or ".")
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="porepermfoam", description=__doc__.split("\n\n")[0].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def params_flags(sub):
+        sub.add_argument("vti", help="Voxel sample (.vti or .npy)")
+        sub.add_argument("case", nargs="?", default=".", help="Case directory (default: .)")
+        sub.add_argument("--template", help="Template case cloned into the case (default: the case itself)")
+        sub.add_argument("--config", help="JSON file of run parameters (see batch.DEFAULT_PARAMS)")
+        for name, kind in _PARAM_FLAGS.items():
+            sub.add_argument("--" + name.replace("_", "-"), type=kind, dest=name)
+        sub.add_argument("--factor-mesh", type=float, nargs=3, metavar=("FX", "FY", "FZ"))
+        sub.add_argument("--n-procs", type=_procs, help="Processes per case, or 'auto'")
+        sub.add_argument("--potential-init", action="store_true", help="Seed U and p with potentialFoam")
+        sub.add_argument("--monitor", action="store_true", help="Stop simpleFoam once the flux has settled")
+        sub.add_argument("--set", action="append", metavar="KEY=VALUE", help="Any other run parameter")
+
+    sub = commands.add_parser("prepare", help="Clone the template and generate STL/mesh dictionaries and fields")
+    params_flags(sub)
+    sub.set_defaults(func=cmd_prepare)
+    for name, func, text in (("mesh", cmd_mesh, "Build (or restore) and decompose the mesh"),
+                             ("solve", cmd_solve, "Initialise the fields and run simpleFoam"),
+                             ("post", cmd_post, "Collect fluxes and compute the permeability")):
+        sub = commands.add_parser(name, help=text)
+        sub.add_argument("case", nargs="?", default=".", help="Prepared case directory (default: .)")
+        if name == "solve":
+            sub.add_argument("--map-fields-from", help="Start from the solution of this case (mapFields)")
+        sub.set_defaults(func=func)
+    sub = commands.add_parser("run", help="prepare, mesh, solve and post in one go")
+    params_flags(sub)
+    sub.add_argument("--map-fields-from", help="Start from the solution of this case (mapFields)")
+    sub.set_defaults(func=cmd_run)
+    sub = commands.add_parser("preview", help="Solve a coarsened copy of the sample and predict the "
+                                              "full-resolution cost")
+    params_flags(sub)
+    sub.add_argument("--factor", type=int, default=4, help="Coarsening factor (default: 4)")
+    sub.set_defaults(func=cmd_preview)
+    return parser
+
+def main(argv=None) -> int:
+    """Entry point of the `porepermfoam` command; returns the exit status."""
+    args = _parser().parse_args(argv)
+    stdout = sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = args.func(args)
+        status = 0
+    except (Exception, SystemExit) as e:
+        result = {"case": os.path.abspath(args.case), "status": "failed", "error": str(e)}
+        status = 1
+    json.dump(result, stdout, indent=2)
+    stdout.write("\n")
+    return status
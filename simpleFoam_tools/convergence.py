@@ -0,0 +1,111 @@
+import os
+import re
+import collections
+
+_TIME = re.compile(r"^Time\s*=\s*([\dEe+\.-]+)")
+_RESIDUAL = re.compile(r"Solving for (\w+), Initial residual = ([\dEe+\.-]+)")
+_FLUX = re.compile(r"sum\((inlet|outlet)\) of phi\s*=\s*([\dEe+\.-]+)")
+
+def set_stop_at(basedir: str, stop_at: str = "writeNow") -> None:
+    """Change `stopAt` in system/controlDict; picked up by a running solver via runTimeModifiable."""
+    path = os.path.join(basedir, "system", "controlDict")
+    with open(path) as f:
+        text = f.read()
+    text = re.sub(r"^(\s*stopAt\s+)\w+;", rf"\g<1>{stop_at};", text, count=1, flags=re.MULTILINE)
+    with open(path, 'w') as f:
+        f.write(text)
+
+class ConvergenceMonitor:
+    """
+    Watch a running simpleFoam log and stop the solver once the flux has settled.
+
+    Feed it the solver output line by line (run_simplefoam(..., monitor=...) does
+    this). It records the initial residuals and the inlet/outlet flux of every
+    iteration, as printed by the flux function objects of
+    generate_controlDict(..., flux_functions=True). The run is converged when
+
+    - the flux imbalance |q_in + q_out| / max(|q_in|, |q_out|) is below `imbalance_tol`, and
+    - the relative change of the flux (hence of the permeability) over the last
+      `window` iterations is below `change_tol`,
+
+    after at least `min_iterations` (and, if `residual_tol` is set, once every
+    initial residual of the iteration is below it). The monitor then sets `stopAt writeNow` in
+    system/controlDict so the solver writes the current state and exits.
+
+    Parameters:
+        basedir (str): Case directory.
+        imbalance_tol (float): Tolerance on the relative inlet/outlet flux imbalance.
+        change_tol (float): Tolerance on the relative change of the flux over `window` iterations.
+        window (int): Number of iterations the change is measured over.
+        min_iterations (int): Never stop before this many iterations.
+        residual_tol (float): Optional tolerance on the initial residuals.
+    """
+
+    def __init__(self, basedir: str, imbalance_tol: float = 1e-3, change_tol: float = 1e-4,
+                 window: int = 10, min_iterations: int = 20, residual_tol: float = None):
+        self.basedir = basedir
+        self.imbalance_tol = imbalance_tol
+        self.change_tol = change_tol
+        self.window = window
+        self.min_iterations = min_iterations
+        self.residual_tol = residual_tol
+        # One dict per iteration (time, q_in, q_out, residuals); only the last window + 2
+        # are kept, so memory does not grow with the run length
+        self.history = collections.deque(maxlen=window + 2)
+        self.iterations = 0
+        self.converged = False
+        self._current = None
+
+    def __call__(self, line: str) -> None:
+        m = _TIME.match(line)
+        if m:
+            self._current = {"time": float(m.group(1)), "q_in": None, "q_out": None, "residuals": {}}
+            self.history.append(self._current)
+            self.iterations += 1
+            return
+        if self._current is None:
+            return
+        m = _RESIDUAL.search(line)
+        if m:
+            self._current["residuals"].setdefault(m.group(1), float(m.group(2)))
+            return
+        m = _FLUX.search(line)
+        if m:
+            self._current["q_in" if m.group(1) == "inlet" else "q_out"] = float(m.group(2))
+            if self._current["q_in"] is not None and self._current["q_out"] is not None:
+                self._check()
+
+    def _fluxes(self):
+        return [abs(h["q_out"]) for h in self.history if h["q_out"] is not None and h["q_in"] is not None]
+
+    @property
+    def imbalance(self):
+        """Relative inlet/outlet flux imbalance of the last complete iteration."""
+        h = self.history[-1] if self.history else None
+        if h is None or h["q_in"] is None or h["q_out"] is None:
+            return None
+        scale = max(abs(h["q_in"]), abs(h["q_out"]))
+        return abs(h["q_in"] + h["q_out"]) / scale if scale > 0 else None
+
+    @property
+    def change(self):
+        """Relative change of the flux over the last `window` iterations."""
+        q = self._fluxes()
+        if len(q) <= self.window or q[-1] == 0:
+            return None
+        return abs(q[-1] - q[-1 - self.window]) / q[-1]
+
+    def _check(self):
+        if self.converged or self.iterations < self.min_iterations:
+            return
+        imbalance, change = self.imbalance, self.change
+        if imbalance is None or change is None:
+            return
+        residuals = self.history[-1]["residuals"].values()
+        if self.residual_tol is not None and any(r >= self.residual_tol for r in residuals):
+            return
+        if imbalance < self.imbalance_tol and change < self.change_tol:
+            self.converged = True
+            print(f"\n*** Converged at t={self.history[-1]['time']:g}: flux imbalance {imbalance:.2e}, "
+                  f"change over {self.window} iterations {change:.2e}; stopping simpleFoam ***\n")
+            set_stop_at(self.basedir, "writeNow")
@@ -0,0 +1,473 @@
+import os
+import re
+import glob
+import gzip
+import mmap
+import numpy as np
+from functools import cached_property
+
+from .run_simplefoam import _function_object_flow_rates
+from .permeability import darcy_permeability, M2_TO_MD
+
+_COMPONENTS = {"scalar": 1, "label": 1, "vector": 3, "symmTensor": 6, "tensor": 9}
+_SKIP = re.compile(rb"(?:\s+|//[^\n]*|/\*.*?\*/)*", re.DOTALL)
+_WORD = re.compile(rb'"[^"]*"|[^\s{};()"]+')
+_NONUNIFORM = re.compile(rb"nonuniform\s+List<(\w+)>\s*(\d+)\s*")
+_LIST_START = re.compile(rb"(\d+)\s*(?=\()")
+_CHUNK = 1 << 24
+_PARENS = bytes.maketrans(b"()", b"  ")
+
+def _open_buffer(path):
+    """File contents as a buffer: memory-mapped if uncompressed (zero-copy), else decompressed bytes."""
+    if not os.path.exists(path) and os.path.exists(path + ".gz"):
+        path += ".gz"
+    if path.endswith(".gz"):
+        with gzip.open(path, 'rb') as f:
+            return f.read()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"Empty OpenFOAM file: {path}")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class _Parser:
+    """Minimal OpenFOAM dictionary/list parser over a (memory-mapped) buffer, skipping binary blocks."""
+
+    def __init__(self, path):
+        self.path = path
+        self.buf = _open_buffer(path)
+        self.pos = 0
+        self.binary = False
+        self.label = np.dtype("<i4")
+        self.scalar = np.dtype("<f8")
+        header = self.dictionary_entries().get("FoamFile", {})
+        self.header = header
+        self.binary = header.get("format", "ascii") == "binary"
+        arch = header.get("arch", "").strip('"')
+        order = ">" if arch.startswith("MSB") else "<"
+        label = re.search(r"label=(\d+)", arch)
+        scalar = re.search(r"scalar=(\d+)", arch)
+        self.label = np.dtype(f"{order}i{int(label.group(1)) // 8 if label else 4}")
+        self.scalar = np.dtype(f"{order}f{int(scalar.group(1)) // 8 if scalar else 8}")
+
+    def skip(self):
+        self.pos = _SKIP.match(self.buf, self.pos).end()
+
+    def peek(self):
+        self.skip()
+        return self.buf[self.pos:self.pos + 1]
+
+    def dictionary_entries(self, stop_after=1):
+        """Parse `key value;` / `key { ... }` entries until '}' (or `stop_after` top-level sub-dictionaries)."""
+        entries = {}
+        while True:
+            c = self.peek()
+            if not c:
+                return entries
+            if c == b"}":
+                self.pos += 1
+                return entries
+            if c == b"#":
+                self.pos = self.buf.find(b"\n", self.pos) + 1 or len(self.buf)
+                continue
+            m = _WORD.match(self.buf, self.pos)
+            if m is None:
+                # A top-level list (e.g. of a mesh file) follows the header
+                return entries
+            key = m.group().decode().strip('"')
+            if key.isdigit() and stop_after is not None:
+                return entries
+            self.pos = m.end()
+            if self.peek() == b"{":
+                self.pos += 1
+                entries[key] = self.dictionary_entries(stop_after=None)
+                if stop_after is not None:
+                    stop_after -= 1
+                    if stop_after == 0:
+                        return entries
+            else:
+                entries[key] = self.value()
+
+    def value(self):
+        """Parse an entry value up to its ';'."""
+        m = _NONUNIFORM.match(self.buf, self.pos)
+        if m:
+            kind, n = m.group(1).decode(), int(m.group(2))
+            self.pos = m.end()
+            values = self.list_values(n, kind)
+        else:
+            # Quoted strings (e.g. arch "LSB;label=32;scalar=64") may contain ';'
+            quote = self.buf.find(b'"', self.pos)
+            end = self.buf.find(b";", self.pos)
+            if 0 <= quote < end:
+                end = self.buf.find(b";", self.buf.find(b'"', quote + 1))
+            text = self.buf[self.pos:end].decode().strip()
+            self.pos = end
+            if text.startswith("uniform"):
+                numbers = np.array(text[len("uniform"):].replace("(", " ").replace(")", " ").split(), dtype=float)
+                values = ("uniform", numbers[0] if numbers.size == 1 else numbers)
+            else:
+                values = text
+        self.skip()
+        if self.buf[self.pos:self.pos + 1] == b";":
+            self.pos += 1
+        return values
+
+    def list_values(self, n, kind):
+        """Read `n` entries of `kind` from the '(' at the current position (memory-mapped if binary)."""
+        self.skip()
+        if self.buf[self.pos:self.pos + 1] != b"(":
+            raise ValueError(f"Expected a list in {self.path}")
+        k = _COMPONENTS[kind]
+        dtype = self.label if kind == "label" else self.scalar
+        start = self.pos + 1
+        if self.binary:
+            end = start + n * k * dtype.itemsize
+            values = np.frombuffer(self.buf, dtype=dtype, count=n * k, offset=start)
+            self.pos = self.buf.find(b")", end) + 1
+        else:
+            end = self._closing(start)
+            text = self.buf[start:end].translate(_PARENS).decode()
+            values = np.fromstring(text, dtype=dtype, sep=" ") if n else np.empty(0, dtype)
+            if values.size != n * k:
+                raise ValueError(f"Expected {n} {kind} values in {self.path}, found {values.size / k:g}")
+            self.pos = end + 1
+        return values.reshape(n, k) if k > 1 else values
+
+    def _closing(self, start):
+        """Index of the ')' closing the list opened just before `start`, found chunk-wise."""
+        depth = 0
+        for offset in range(start, len(self.buf), _CHUNK):
+            chunk = np.frombuffer(self.buf[offset:offset + _CHUNK], dtype=np.uint8)
+            level = depth + np.cumsum((chunk == ord("(")).astype(np.int64) - (chunk == ord(")")))
+            closed = np.flatnonzero(level < 0)
+            if closed.size:
+                return offset + int(closed[0])
+            depth = int(level[-1])
+        raise ValueError(f"Unterminated list in {self.path}")
+
+    def top_level_list(self, kind):
+        """Read the next top-level `N (...)` list of a mesh file."""
+        self.skip()
+        m = _LIST_START.match(self.buf, self.pos)
+        if m is None:
+            raise ValueError(f"Expected a list in {self.path}")
+        self.pos = m.end()
+        return self.list_values(int(m.group(1)), kind)
+
+def _read_faces(path):
+    """Faces as (offsets, indices) arrays: face i uses indices[offsets[i]:offsets[i + 1]]."""
+    parser = _Parser(path)
+    if parser.header.get("class") == "faceCompactList":
+        offsets = parser.top_level_list("label").astype(np.int64)
+        return offsets, parser.top_level_list("label")
+    # ascii faceList: "n(i0 i1 ...)" per face
+    parser.skip()
+    m = _LIST_START.match(parser.buf, parser.pos)
+    n = int(m.group(1))
+    start = m.end() + 1
+    end = parser._closing(start)
+    flat = np.fromstring(parser.buf[start:end].translate(_PARENS).decode(), dtype=np.int64, sep=" ")
+    size = int(flat[0]) if n else 0
+    if n and flat.size == n * (size + 1) and np.all(flat[::size + 1] == size):
+        # All faces have the same number of points (e.g. hex meshes)
+        offsets = np.arange(n + 1, dtype=np.int64) * size
+        return offsets, flat.reshape(n, size + 1)[:, 1:].ravel()
+    sizes = np.empty(n, dtype=np.int64)
+    pos = 0
+    for i in range(n):
+        sizes[i] = flat[pos]
+        pos += sizes[i] + 1
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    keep = np.ones(flat.size, dtype=bool)
+    keep[offsets[:-1] + np.arange(n)] = False
+    return offsets, flat[keep]
+
+def _read_boundary(path):
+    """Patches of a polyMesh/boundary file as {name: {"type", "nFaces", "startFace", ...}}."""
+    parser = _Parser(path)
+    parser.skip()
+    m = _LIST_START.match(parser.buf, parser.pos)
+    parser.pos = m.end() + 1
+    patches = parser.dictionary_entries(stop_after=None)
+    for patch in patches.values():
+        patch["nFaces"] = int(patch["nFaces"])
+        patch["startFace"] = int(patch["startFace"])
+    return patches
+
+class FoamMesh:
+    """
+    An OpenFOAM polyMesh read into NumPy arrays, ascii or binary (memory-mapped) and gzipped or not.
+
+    Parameters:
+        case_dir (str): OpenFOAM case directory; the mesh is read from constant/polyMesh.
+
+    Attributes:
+        points (np.ndarray): (n_points, 3) point coordinates.
+        face_offsets, face_points (np.ndarray): Faces in compressed form; face i has the
+            points face_points[face_offsets[i]:face_offsets[i + 1]].
+        owner (np.ndarray): Owner cell of every face.
+        neighbour (np.ndarray): Neighbour cell of every internal face.
+        boundary (dict): {patch: {"type", "nFaces", "startFace", ...}}.
+
+    Geometry (face_centres, face_areas, cell_centres, cell_volumes) is computed on
+    first use, vectorized, with OpenFOAM's triangle/pyramid decomposition.
+    """
+
+    def __init__(self, case_dir: str):
+        mesh_dir = os.path.join(case_dir, "constant", "polyMesh")
+        self.case_dir = case_dir
+        self.points = _Parser(os.path.join(mesh_dir, "points")).top_level_list("vector")
+        self.face_offsets, self.face_points = _read_faces(os.path.join(mesh_dir, "faces"))
+        self.owner = _Parser(os.path.join(mesh_dir, "owner")).top_level_list("label")
+        self.neighbour = _Parser(os.path.join(mesh_dir, "neighbour")).top_level_list("label")
+        self.boundary = _read_boundary(os.path.join(mesh_dir, "boundary"))
+        self.n_faces = len(self.owner)
+        self.n_internal_faces = len(self.neighbour)
+        self.n_cells = int(max(self.owner.max(initial=-1), self.neighbour.max(initial=-1))) + 1
+
+    def __repr__(self):
+        return (f"FoamMesh({self.case_dir!r}: {self.n_cells} cells, {self.n_faces} faces, "
+                f"{len(self.boundary)} patches)")
+
+    def patch_faces(self, patch: str) -> slice:
+        """Face index range of a boundary patch."""
+        p = self.boundary[patch]
+        return slice(p["startFace"], p["startFace"] + p["nFaces"])
+
+    @cached_property
+    def _face_geometry(self):
+        sizes = np.diff(self.face_offsets)
+        face_of = np.repeat(np.arange(self.n_faces), sizes)
+        p = self.points[self.face_points]
+        # Each face is split into triangles (edge, face average point)
+        average = np.add.reduceat(p, self.face_offsets[:-1], axis=0) / sizes[:, None]
+        following = np.arange(len(self.face_points)) + 1
+        last = self.face_offsets[1:] - 1
+        following[last] = self.face_offsets[:-1]
+        q = self.points[self.face_points[following]]
+        c = average[face_of]
+        n = np.cross(q - p, c - p)
+        centroids = (p + q + c) / 3
+        area_vectors = np.add.reduceat(n, self.face_offsets[:-1], axis=0) / 2
+        # Weight triangle centroids by their area projected on the face normal
+        weights = np.einsum('ij,ij->i', n, area_vectors[face_of])
+        total = np.bincount(face_of, weights, minlength=self.n_faces)
+        centres = np.stack([np.bincount(face_of, weights * centroids[:, d], minlength=self.n_faces)
+                            for d in range(3)], axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centres = np.where(np.abs(total)[:, None] > 0, centres / total[:, None], average)
+        return centres, area_vectors
+
+    @property
+    def face_centres(self) -> np.ndarray:
+        return self._face_geometry[0]
+
+    @property
+    def face_areas(self) -> np.ndarray:
+        """Face area vectors (normal to the face, pointing out of the owner cell)."""
+        return self._face_geometry[1]
+
+    @cached_property
+    def _cell_geometry(self):
+        cf, sf = self._face_geometry
+        internal = slice(0, self.n_internal_faces)
+        faces_per_cell = (np.bincount(self.owner, minlength=self.n_cells)
+                          + np.bincount(self.neighbour, minlength=self.n_cells))
+        estimate = np.zeros((self.n_cells, 3))
+        for d in range(3):
+            estimate[:, d] = (np.bincount(self.owner, cf[:, d], minlength=self.n_cells)
+                              + np.bincount(self.neighbour, cf[internal, d], minlength=self.n_cells))
+        estimate /= np.maximum(faces_per_cell, 1)[:, None]
+        # One pyramid per face and cell, apex at the estimated centre
+        volumes = np.zeros(self.n_cells)
+        centres = np.zeros((self.n_cells, 3))
+        for cells, faces, sign in ((self.owner, slice(None), 1.0), (self.neighbour, internal, -1.0)):
+            pyramid = np.maximum(sign * np.einsum('ij,ij->i', sf[faces], cf[faces] - estimate[cells]), 1e-300)
+            centroid = 0.75 * cf[faces] + 0.25 * estimate[cells]
+            volumes += np.bincount(cells, pyramid, minlength=self.n_cells)
+            for d in range(3):
+                centres[:, d] += np.bincount(cells, pyramid * centroid[:, d], minlength=self.n_cells)
+        centres /= volumes[:, None]
+        return centres, volumes / 3
+
+    @property
+    def cell_centres(self) -> np.ndarray:
+        return self._cell_geometry[0]
+
+    @property
+    def cell_volumes(self) -> np.ndarray:
+        return self._cell_geometry[1]
+
+    @property
+    def bounds(self) -> tuple:
+        """((xmin, ymin, zmin), (xmax, ymax, zmax)) of the mesh points."""
+        return tuple(self.points.min(axis=0)), tuple(self.points.max(axis=0))
+
+class FoamField:
+    """
+    A volume or surface field of one time directory.
+
+    Attributes:
+        name (str): Field name, e.g. 'U', 'p' or 'phi'.
+        time (str): Time directory it was read from.
+        internal: Array of cell (or internal face) values, or ("uniform", value).
+        boundary (dict): {patch: array of face values, ("uniform", value) or None without a value}.
+    """
+
+    def __init__(self, name, time, internal, boundary, header):
+        self.name = name
+        self.time = time
+        self.internal = internal
+        self.boundary = boundary
+        self.header = header
+
+    def __repr__(self):
+        return f"FoamField({self.name!r}, time={self.time}, class={self.header.get('class')})"
+
+    def values(self, n: int = None) -> np.ndarray:
+        """Internal values as an array, expanding a uniform field to `n` entries."""
+        return _expand(self.internal, n)
+
+    def patch_values(self, patch: str, n: int = None) -> np.ndarray:
+        """Values on a boundary patch, expanding uniform values to `n` faces (zeros without a value)."""
+        return _expand(self.boundary.get(patch), n)
+
+def _expand(values, n):
+    if isinstance(values, np.ndarray):
+        return values
+    if values is None or isinstance(values, str):
+        return np.zeros(n or 0)
+    value = np.asarray(values[1], dtype=float)
+    return np.broadcast_to(value, (n,) + value.shape) if n is not None else value
+
+def time_directories(case_dir: str) -> list:
+    """Names of the time directories of a case, in increasing time."""
+    names = []
+    for entry in os.listdir(case_dir):
+        try:
+            float(entry)
+        except ValueError:
+            continue
+        if os.path.isdir(os.path.join(case_dir, entry)):
+            names.append(entry)
+    return sorted(names, key=float)
+
+def read_field(case_dir: str, name: str, time: str = None) -> FoamField:
+    """
+    Read a field (e.g. 'U', 'p', 'phi') from a time directory, ascii or binary.
+
+    Parameters:
+        case_dir (str): OpenFOAM case directory.
+        name (str): Field name.
+        time (str): Time directory (default: the latest one holding the field).
+    """
+    if time is None:
+        candidates = [t for t in time_directories(case_dir)
+                      if glob.glob(os.path.join(case_dir, t, name)) or glob.glob(os.path.join(case_dir, t, name + ".gz"))]
+        if not candidates:
+            raise ValueError(f"No time directory with field '{name}' in {case_dir}")
+        time = candidates[-1]
+    parser = _Parser(os.path.join(case_dir, str(time), name))
+    entries = parser.dictionary_entries(stop_after=None)
+    boundary = {patch: values.get("value") for patch, values in entries.get("boundaryField", {}).items()
+                if isinstance(values, dict)}
+    return FoamField(name, str(time), entries.get("internalField"), boundary, parser.header)
+
+def plane_fluxes(case_dir: str, positions=None, axis: int = 0, time: str = None, n_planes: int = 10,
+                 mesh: FoamMesh = None):
+    """
+    Volumetric flow rate through planes normal to `axis`, from the face fluxes phi.
+
+    The flux through the plane at position x is the sum of phi over the internal faces
+    separating cells with centres below x from those above, so each value is exactly
+    mass-conservative and should equal the inlet/outlet flux of a converged run.
+
+    Parameters:
+        case_dir (str): OpenFOAM case directory.
+        positions (list): Plane positions [m] (default: `n_planes` equally spaced inside the mesh).
+        axis (int): Plane normal (0 = x, 1 = y, 2 = z).
+        time (str): Time directory (default: latest).
+        mesh (FoamMesh): Already loaded mesh of the case.
+
+    Returns:
+        pandas.DataFrame: position, flow_rate [m^3/s] (along +axis) and imbalance relative to
+            the inlet flow rate.
+    """
+    import pandas as pd
+
+    mesh = mesh or FoamMesh(case_dir)
+    phi = read_field(case_dir, "phi", time)
+    internal_phi = phi.values(mesh.n_internal_faces)
+    x = mesh.cell_centres[:, axis]
+    if positions is None:
+        lo, hi = mesh.bounds[0][axis], mesh.bounds[1][axis]
+        positions = lo + (hi - lo) * (np.arange(n_planes) + 0.5) / n_planes
+    owner_x = x[mesh.owner[:mesh.n_internal_faces]]
+    neighbour_x = x[mesh.neighbour]
+    flows = []
+    for position in positions:
+        below_owner = owner_x < position
+        crossing = below_owner != (neighbour_x < position)
+        flows.append(float(np.sum(np.where(below_owner[crossing], 1.0, -1.0) * internal_phi[crossing])))
+    table = pd.DataFrame({"position": positions, "flow_rate": flows})
+    if "inlet" in mesh.boundary:
+        inlet = -float(np.sum(phi.patch_values("inlet", mesh.boundary["inlet"]["nFaces"])))
+        table["imbalance"] = (table["flow_rate"] - inlet) / inlet if inlet else np.nan
+    return table
+
+def velocity_statistics(case_dir: str, axis: int = 0, time: str = None, mesh: FoamMesh = None) -> dict:
+    """
+    Volume-weighted velocity statistics of the pore space.
+
+    Returns:
+        dict: 'pore_volume' [m^3], 'mean_velocity' (vector), 'mean_speed', 'max_speed',
+            'speed_p50', 'speed_p90', 'speed_p99', 'mean_axial_velocity' and
+            'backflow_fraction' (volume fraction with negative axial velocity).
+    """
+    mesh = mesh or FoamMesh(case_dir)
+    U = read_field(case_dir, "U", time).values(mesh.n_cells)
+    volume = mesh.cell_volumes
+    total = volume.sum()
+    speed = np.linalg.norm(U, axis=1)
+    order = np.argsort(speed)
+    cumulative = np.cumsum(volume[order]) / total
+    percentile = lambda q: float(speed[order][min(np.searchsorted(cumulative, q), len(order) - 1)])
+    return {
+        "pore_volume": float(total),
+        "mean_velocity": (U * volume[:, None]).sum(axis=0) / total,
+        "mean_speed": float((speed * volume).sum() / total),
+        "max_speed": float(speed.max()),
+        "speed_p50": percentile(0.5),
+        "speed_p90": percentile(0.9),
+        "speed_p99": percentile(0.99),
+        "mean_axial_velocity": float((U[:, axis] * volume).sum() / total),
+        "backflow_fraction": float(volume[U[:, axis] < 0].sum() / total),
+    }
+
+def permeability_history(case_dir: str, shape: tuple, scale: float, dp: float, mu: float = 1e-3,
+                         axis: int = 0, patch: str = "inlet"):
+    """
+    Permeability after every iteration (or every written time) of a simpleFoam run.
+
+    Uses the per-iteration fluxes of the flowRate_* function objects
+    (generate_controlDict(..., flux_functions=True)) when present, otherwise sums
+    phi over the patch in every time directory.
+
+    Returns:
+        pandas.DataFrame: time, flow_rate [m^3/s], permeability_m2 and permeability_mD.
+    """
+    import pandas as pd
+
+    rates = _function_object_flow_rates(case_dir, patch)
+    if rates is not None:
+        series = rates[0]
+    else:
+        mesh = FoamMesh(case_dir)
+        n = mesh.boundary[patch]["nFaces"]
+        series = [(float(t), float(np.sum(read_field(case_dir, "phi", t).patch_values(patch, n))))
+                  for t in time_directories(case_dir)
+                  if os.path.exists(os.path.join(case_dir, t, "phi")) or os.path.exists(os.path.join(case_dir, t, "phi.gz"))]
+    table = pd.DataFrame(series, columns=["time", "flow_rate"])
+    table["permeability_m2"] = [darcy_permeability(q, shape, scale, dp, mu, axis=axis) for q in table["flow_rate"]]
+    table["permeability_mD"] = table["permeability_m2"] * M2_TO_MD
+    return table
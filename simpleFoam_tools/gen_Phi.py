@@ -0,0 +1,80 @@
+import os
+from textwrap import dedent
+
+def generate_potential_field(file_path: str, phi_inlet: float, boundary: str = "symmetryPlane") -> None:
+    """
+    Generate the 'Phi' velocity potential boundary conditions read by potentialFoam.
+
+    Phi is fixed to `phi_inlet` on the inlet and 0 on the outlet, so the potential
+    flow runs from inlet to outlet with a mean velocity of about phi_inlet / L
+    (L the sample length); the other patches follow the pressure field.
+    """
+    if boundary.lower() == "symmetryplane":
+        bc_type = "symmetryPlane"
+    elif boundary.lower() == "wall":
+        bc_type = "zeroGradient"
+    else:
+        raise ValueError(f"Unsupported boundary type: {boundary}")
+
+    Phi_dict = dedent(rf"""
+        /*--------------------------------*- C++ -*----------------------------------*\\
+          =========                 |
+          \\      /  F ield         | OpenFOAM: The Open Source CFD Toolbox
+           \\    /   O peration     | Website:  https://openfoam.org
+            \\  /    A nd           | Version:  7
+             \\/     M anipulation  |
+        \*---------------------------------------------------------------------------*/
+        FoamFile
+        {{
+            version     2.0;
+            format      ascii;
+            class       volScalarField;
+            location    "0";
+            object      Phi;
+        }}
+
+        dimensions      [0 2 -1 0 0 0 0];
+
+        internalField   uniform 0;
+
+        boundaryField
+        {{
+            #includeEtc "caseDicts/setConstraintTypes"
+
+            top
+            {{
+                type            {bc_type};
+            }}
+            inlet
+            {{
+                type            fixedValue;
+                value           uniform {phi_inlet:.6g};
+            }}
+            bottom
+            {{
+                type            {bc_type};
+            }}
+            outlet
+            {{
+                type            fixedValue;
+                value           uniform 0;
+            }}
+            solids
+            {{
+                type            zeroGradient;
+            }}
+            front
+            {{
+                type            {bc_type};
+            }}
+            back
+            {{
+                type            {bc_type};
+            }}
+        }}
+    """)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as f:
+        f.write(Phi_dict)
+    print(f"Generated Phi at: {file_path} with inlet potential {phi_inlet:.6g} m^2/s")
@@ -33,6 +33,8 @@ def generate_velocity_field(file_path: str, boundary: str = "symmetryPlane") ->
 
         boundaryField
         {{
+            #includeEtc "caseDicts/setConstraintTypes"
+
             top
             {{
                 type            {bc_type};
@@ -1,9 +1,32 @@
 import os
 from textwrap import dedent
 
-def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str, boundary: str="symmetryPlane") -> None:
-    """Generate blockMeshDict for a given geometry and cell size."""
-    nx, ny, nz = shape
+# Domain face (axis, side) of every patch for flow along x (0), y (1) or z (2)
+FLOW_PATCHES = {
+    0: {"top": (1, 1), "inlet": (0, 0), "bottom": (1, 0), "outlet": (0, 1), "front": (2, 0), "back": (2, 1)},
+    1: {"top": (0, 1), "inlet": (1, 0), "bottom": (0, 0), "outlet": (1, 1), "front": (2, 0), "back": (2, 1)},
+    2: {"top": (1, 1), "inlet": (2, 0), "bottom": (1, 0), "outlet": (2, 1), "front": (0, 0), "back": (0, 1)},
+}
+
+# Block vertices of each domain face (axis, side)
+_BLOCK_FACES = {
+    (0, 0): "(0 4 7 3)", (0, 1): "(1 2 6 5)",
+    (1, 0): "(1 5 4 0)", (1, 1): "(7 6 3 2)",
+    (2, 0): "(0 3 2 1)", (2, 1): "(4 5 6 7)",
+}
+
+def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str, boundary: str="symmetryPlane",
+                           flow_axis: int = 0) -> None:
+    """Generate blockMeshDict for a given geometry and cell size.
+
+    `shape` may be an (nx, ny, nz) tuple or a VoxelVolume. `flow_axis` (0 = x, 1 = y,
+    2 = z) selects the faces of the inlet/outlet patches; the other four faces become
+    top/bottom/front/back (see FLOW_PATCHES).
+    """
+    nx, ny, nz = getattr(shape, "shape", shape)
+    if flow_axis not in FLOW_PATCHES:
+        raise ValueError(f"Unsupported flow axis: {flow_axis}")
+    faces = {name: _BLOCK_FACES[face] for name, face in FLOW_PATCHES[flow_axis].items()}
     dx, dy, dz = mesh_resolution
     if boundary.lower() == "symmetryplane":
         bc_type = "symmetryPlane"
@@ -72,7 +95,7 @@ def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str,
                 type {bc_type};
                 faces
                 (
-                    (7 6 3 2)
+                    {faces['top']}
                 );
             }}
 
@@ -81,7 +104,7 @@ def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str,
                 type patch;
                 faces
                 (
-                    (0 4 7 3)
+                    {faces['inlet']}
                 );
             }}
 
@@ -90,7 +113,7 @@ def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str,
                 type {bc_type};
                 faces
                 (
-                    (1 5 4 0)
+                    {faces['bottom']}
                 );
             }}
 
@@ -99,7 +122,7 @@ def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str,
                 type patch;
                 faces
                 (
-                    (1 2 6 5)
+                    {faces['outlet']}
                 );
             }}
 
@@ -108,7 +131,7 @@ def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str,
                 type {bc_type};
                 faces
                 (
-                    (0 3 2 1)
+                    {faces['front']}
                 );
             }}
 
@@ -117,7 +140,7 @@ def generate_blockMeshDict(shape: tuple, mesh_resolution: tuple, file_path: str,
                 type {bc_type};
                 faces
                 (
-                    (4 5 6 7)
+                    {faces['back']}
                 );
             }}
         );
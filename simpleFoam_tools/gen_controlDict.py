@@ -1,8 +1,65 @@
 import os
-from textwrap import dedent
+import math
+from textwrap import dedent, indent
+
+# Output settings per I/O profile; see generate_controlDict
+IO_PROFILES = {
+    "ascii":  {"write_format": "ascii",  "write_compression": False, "purge_write": 0, "final_only": False},
+    "binary": {"write_format": "binary", "write_compression": False, "purge_write": 0, "final_only": False},
+    "lean":   {"write_format": "binary", "write_compression": True,  "purge_write": 1, "final_only": True},
+}
+
+def _flux_function(name: str, patch: str) -> str:
+    """Return a surfaceFieldValue function object summing phi over `patch` every iteration."""
+    return dedent(f"""
+        {name}
+        {{
+            type            surfaceFieldValue;
+            libs            ("libfieldFunctionObjects.so");
+            writeControl    timeStep;
+            writeInterval   1;
+            log             true;
+            writeFields     false;
+            regionType      patch;
+            name            {patch};
+            operation       sum;
+            fields          (phi);
+        }}
+    """)
+
+def generate_controlDict(file_path: str, end_time: int = 500, write_interval: int = 100, dt: float = 1.0e-6,
+                         flux_functions: bool = False, io_profile: str = "ascii", write_format: str = None,
+                         write_compression: bool = None, purge_write: int = None, final_only: bool = None) -> None:
+    """Generate controlDict for a given simulation.
+
+    With `flux_functions` the inlet and outlet fluxes are computed every iteration
+    by surfaceFieldValue function objects (flowRate_inlet, flowRate_outlet) and
+    printed to the solver log, as needed by ConvergenceMonitor. run_simplefoam then
+    reads them from postProcessing/flowRate_*/ instead of running postProcess, so
+    `write_interval` no longer has to produce intermediate time directories.
+
+    `io_profile` selects the output settings from IO_PROFILES ("ascii", "binary" or
+    "lean"); `write_format`, `write_compression`, `purge_write` (number of time
+    directories kept) and `final_only` (write only the last time step) override it.
+    The mesh utilities read the same controlDict, so generate it before meshing.
+    """
+    if io_profile not in IO_PROFILES:
+        raise ValueError(f"Unsupported I/O profile: {io_profile}")
+    io = dict(IO_PROFILES[io_profile])
+    for key, value in (("write_format", write_format), ("write_compression", write_compression),
+                       ("purge_write", purge_write), ("final_only", final_only)):
+        if value is not None:
+            io[key] = value
+    if io["write_format"] not in ("ascii", "binary"):
+        raise ValueError(f"Unsupported write format: {io['write_format']}")
+    if io["final_only"]:
+        write_interval = max(1, math.ceil(round(end_time / dt, 6)))
+
+    functions = ""
+    if flux_functions:
+        body = _flux_function("flowRate_inlet", "inlet") + _flux_function("flowRate_outlet", "outlet")
+        functions = "\nfunctions\n{" + indent(body, "    ") + "}\n"
 
-def generate_controlDict(file_path: str, end_time: int = 500, write_interval: int = 100, dt: float = 1.0e-6) -> None:
-    """Generate controlDict for a given simulation."""
     controlDict = dedent(rf"""
         /*--------------------------------*- C++ -*----------------------------------*\\
           =========                 |
@@ -35,20 +92,20 @@ def generate_controlDict(file_path: str, end_time: int = 500, write_interval: in
 
         writeInterval   {write_interval};
 
-        purgeWrite      0;
+        purgeWrite      {io["purge_write"]};
 
-        writeFormat     ascii;
+        writeFormat     {io["write_format"]};
 
         writePrecision  6;
 
-        writeCompression uncompressed;
+        writeCompression {"compressed" if io["write_compression"] else "uncompressed"};
 
         timeFormat      general;
 
         timePrecision   6;
 
         runTimeModifiable true;
-    """)
+    """) + functions
 
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
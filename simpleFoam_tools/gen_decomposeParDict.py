@@ -0,0 +1,86 @@
+import os
+from textwrap import dedent
+
+def _hierarchical_split(shape: tuple, n_procs: int) -> tuple:
+    """Return the (nx, ny, nz) processor split with the smallest inter-processor area."""
+    lx, ly, lz = shape
+    best, best_area = None, None
+    for a in range(1, n_procs + 1):
+        if n_procs % a:
+            continue
+        for b in range(1, n_procs // a + 1):
+            if (n_procs // a) % b:
+                continue
+            c = n_procs // (a * b)
+            area = (a - 1) * ly * lz + (b - 1) * lx * lz + (c - 1) * lx * ly
+            if best_area is None or area < best_area:
+                best, best_area = (a, b, c), area
+    return best
+
+def generate_decomposeParDict(file_path: str, n_procs: int, shape: tuple = None, method: str = None) -> None:
+    """
+    Generate decomposeParDict for running on `n_procs` processors.
+
+    If `method` is None it is chosen from the domain shape (nx, ny, nz), which may
+    also be a VoxelVolume: 'hierarchical' when the processor split with the least
+    inter-processor area gives sub-domains with an aspect ratio of at most 2,
+    'scotch' otherwise (or when no shape is given).
+    """
+    if n_procs < 1:
+        raise ValueError(f"n_procs must be at least 1, got {n_procs}")
+    shape = getattr(shape, "shape", shape)
+    split = _hierarchical_split(shape, n_procs) if shape is not None else None
+
+    if method is None:
+        method = "scotch"
+        if split is not None:
+            sub = [n / k for n, k in zip(shape, split)]
+            if max(sub) / min(sub) <= 2:
+                method = "hierarchical"
+    elif method.lower() not in ("scotch", "hierarchical"):
+        raise ValueError(f"Unsupported decomposition method: {method}")
+    method = method.lower()
+
+    if method == "hierarchical":
+        if split is None:
+            raise ValueError("The hierarchical method needs the domain shape")
+        nx, ny, nz = split
+        coeffs = dedent(f"""
+            hierarchicalCoeffs
+            {{
+                n           ({nx} {ny} {nz});
+                delta       0.001;
+                order       xyz;
+            }}
+        """)
+    else:
+        coeffs = ""
+
+    decomposeParDict = dedent(rf"""
+        /*--------------------------------*- C++ -*----------------------------------*\\
+          =========                 |
+          \\      /  F ield         | OpenFOAM: The Open Source CFD Toolbox
+           \\    /   O peration     | Website:  https://openfoam.org
+            \\  /    A nd           | Version:  7
+             \\/     M anipulation  |
+        \\*---------------------------------------------------------------------------*/
+        FoamFile
+        {{
+            version     2.0;
+            format      ascii;
+            class       dictionary;
+            object      decomposeParDict;
+        }}
+
+        // * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * //
+
+        numberOfSubdomains {n_procs};
+
+        method          {method};
+    """) + coeffs
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    with open(file_path, 'w') as f:
+        f.write(decomposeParDict)
+    print(f"Generated decomposeParDict at: {file_path} ({method}, {n_procs} subdomains)")
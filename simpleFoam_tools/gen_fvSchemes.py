@@ -0,0 +1,84 @@
+import os
+from textwrap import dedent
+
+# Discretisation per preset (same names as gen_fvSolution.SOLVER_PRESETS); see generate_fvSchemes
+SCHEME_PRESETS = {
+    # The schemes of the template case
+    "default": {"grad_U": "cellLimited Gauss linear 1", "div_U": "bounded Gauss linearUpwindV grad(U)",
+                "laplacian": "Gauss linear corrected", "sn_grad": "corrected"},
+    # Creeping flow: convection is negligible, so central differencing is accurate and stable
+    "stokes": {"grad_U": "Gauss linear", "div_U": "bounded Gauss linear",
+               "laplacian": "Gauss linear corrected", "sn_grad": "corrected"},
+    # First-order convection and limited non-orthogonal correction for poor snappyHexMesh cells
+    "robust": {"grad_U": "cellLimited Gauss linear 1", "div_U": "bounded Gauss upwind",
+               "laplacian": "Gauss linear limited 0.5", "sn_grad": "limited 0.5"},
+}
+
+def generate_fvSchemes(file_path: str, preset: str = "stokes") -> None:
+    """Generate fvSchemes for steady incompressible laminar flow from a preset in SCHEME_PRESETS.
+
+    The div(div(phi,U)) scheme needed by `potentialFoam -writep` is always included.
+    """
+    if preset not in SCHEME_PRESETS:
+        raise ValueError(f"Unsupported scheme preset: {preset}")
+    s = SCHEME_PRESETS[preset]
+
+    fvSchemes = dedent(rf"""
+        /*--------------------------------*- C++ -*----------------------------------*\\
+          =========                 |
+          \\      /  F ield         | OpenFOAM: The Open Source CFD Toolbox
+           \\    /   O peration     | Website:  https://openfoam.org
+            \\  /    A nd           | Version:  7
+             \\/     M anipulation  |
+        \\*---------------------------------------------------------------------------*/
+        FoamFile
+        {{
+            version     2.0;
+            format      ascii;
+            class       dictionary;
+            object      fvSchemes;
+        }}
+
+        // * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * //
+
+        ddtSchemes
+        {{
+            default         steadyState;
+        }}
+
+        gradSchemes
+        {{
+            default         Gauss linear;
+            grad(U)         {s["grad_U"]};
+        }}
+
+        divSchemes
+        {{
+            default         none;
+            div(phi,U)      {s["div_U"]};
+            div((nuEff*dev2(T(grad(U))))) Gauss linear;
+            div(div(phi,U)) Gauss linear;
+        }}
+
+        laplacianSchemes
+        {{
+            default         {s["laplacian"]};
+        }}
+
+        interpolationSchemes
+        {{
+            default         linear;
+        }}
+
+        snGradSchemes
+        {{
+            default         {s["sn_grad"]};
+        }}
+
+        // ************************************************************************* //
+    """)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as f:
+        f.write(fvSchemes)
+    print(f"Generated fvSchemes at: {file_path} with preset {preset}")
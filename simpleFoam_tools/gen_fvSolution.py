@@ -0,0 +1,153 @@
+import os
+from textwrap import dedent, indent
+
+# Linear solver, SIMPLE and relaxation settings per preset; see generate_fvSolution
+SOLVER_PRESETS = {
+    # The settings of the template case's system/fvSolution, without its k/omega entries
+    # (GAMG/GaussSeidel, U relaxed, no residual control)
+    "default": {
+        "p_smoother": "GaussSeidel", "p_tolerance": "1e-7", "p_rel_tol": 0.01, "p_tuned": False,
+        "U_solver": "smoothSolver", "U_smoother": "GaussSeidel", "U_rel_tol": 0.1, "consistent": True,
+        "n_non_orthogonal": 0, "potential_non_orthogonal": 10, "relax_p": None, "relax_U": 0.9,
+        "residual_p": None, "residual_U": None, "cache_grad_U": True,
+    },
+    # Creeping flow in pore space: the momentum equation is diffusion dominated, so
+    # SIMPLEC with (almost) no relaxation converges in few iterations, and GAMG
+    # smooths both p and U efficiently on the large, mostly orthogonal hex meshes
+    "stokes": {
+        "p_smoother": "DICGaussSeidel", "p_tolerance": "1e-8", "p_rel_tol": 0.01, "p_tuned": True,
+        "U_solver": "GAMG", "U_smoother": "GaussSeidel", "U_rel_tol": 0.1, "consistent": True,
+        "n_non_orthogonal": 0, "potential_non_orthogonal": 2, "relax_p": 1.0, "relax_U": 0.95,
+        "residual_p": 1e-6, "residual_U": 1e-7, "cache_grad_U": False,
+    },
+    # Plain SIMPLE with strong relaxation and a non-orthogonal corrector, for
+    # snappyHexMesh meshes with poor cells where "stokes" oscillates
+    "robust": {
+        "p_smoother": "GaussSeidel", "p_tolerance": "1e-8", "p_rel_tol": 0.05, "p_tuned": True,
+        "U_solver": "smoothSolver", "U_smoother": "symGaussSeidel", "U_rel_tol": 0.1, "consistent": False,
+        "n_non_orthogonal": 1, "potential_non_orthogonal": 2, "relax_p": 0.3, "relax_U": 0.7,
+        "residual_p": 1e-5, "residual_U": 1e-6, "cache_grad_U": False,
+    },
+}
+
+def _u_solver(solver: str, smoother: str, rel_tol: float) -> str:
+    """The body of the U solver entry."""
+    if solver == "GAMG":
+        return dedent(f"""\
+            solver          GAMG;
+            smoother        {smoother};
+            tolerance       1e-8;
+            relTol          {rel_tol};
+            nCellsInCoarsestLevel 50;
+        """)
+    return dedent(f"""\
+        solver          smoothSolver;
+        smoother        {smoother};
+        tolerance       1e-8;
+        relTol          {rel_tol};
+        nSweeps         1;
+    """)
+
+def generate_fvSolution(file_path: str, preset: str = "stokes", residual_p: float = None,
+                        residual_U: float = None, relax_p: float = None, relax_U: float = None) -> None:
+    """Generate fvSolution from a solver preset.
+
+    `preset` selects the settings from SOLVER_PRESETS ("default", "stokes" or
+    "robust"); `residual_p`/`residual_U` (residualControl of SIMPLE, stopping
+    simpleFoam once both initial residuals are below) and `relax_p`/`relax_U`
+    override it. The Phi solver and potentialFlow settings used by potentialFoam
+    (see run_simplefoam(..., potential_init=True)) are always included.
+    """
+    if preset not in SOLVER_PRESETS:
+        raise ValueError(f"Unsupported solver preset: {preset}")
+    s = dict(SOLVER_PRESETS[preset])
+    for key, value in (("residual_p", residual_p), ("residual_U", residual_U),
+                       ("relax_p", relax_p), ("relax_U", relax_U)):
+        if value is not None:
+            s[key] = value
+
+    residual_control = ""
+    if s["residual_p"] or s["residual_U"]:
+        entries = "".join(f"        {field:<15} {s[f'residual_{field}']};\n"
+                          for field in ("p", "U") if s[f"residual_{field}"])
+        residual_control = "\n    residualControl\n    {\n" + entries + "    }\n"
+    fields = f"    fields\n    {{\n        p               {s['relax_p']};\n    }}\n" if s["relax_p"] else ""
+    u_solver = indent(_u_solver(s["U_solver"], s["U_smoother"], s["U_rel_tol"]), "        ")
+    # "stokes"/"robust" agglomerate by face area, only post-smooth and solve Phi tightly;
+    # "default" keeps the template's plain GAMG and Phi { $p; }
+    p_tuning = phi_tuning = cache = ""
+    if s["p_tuned"]:
+        p_tuning = "".join(f"\n                {line}" for line in (
+            "nPreSweeps      0;", "nPostSweeps     2;", "cacheAgglomeration true;",
+            "agglomerator    faceAreaPair;", "nCellsInCoarsestLevel 50;", "mergeLevels     1;"))
+        phi_tuning = "\n                relTol          0;\n                tolerance       1e-6;"
+    if s["cache_grad_U"]:
+        cache = "\n\n        cache\n        {\n            grad(U);\n        }"
+
+    fvSolution = dedent(rf"""
+        /*--------------------------------*- C++ -*----------------------------------*\\
+          =========                 |
+          \\      /  F ield         | OpenFOAM: The Open Source CFD Toolbox
+           \\    /   O peration     | Website:  https://openfoam.org
+            \\  /    A nd           | Version:  7
+             \\/     M anipulation  |
+        \\*---------------------------------------------------------------------------*/
+        FoamFile
+        {{
+            version     2.0;
+            format      ascii;
+            class       dictionary;
+            object      fvSolution;
+        }}
+
+        // * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * //
+
+        solvers
+        {{
+            p
+            {{
+                solver          GAMG;
+                smoother        {s["p_smoother"]};
+                tolerance       {s["p_tolerance"]};
+                relTol          {s["p_rel_tol"]};{p_tuning}
+            }}
+
+            Phi
+            {{
+                $p;{phi_tuning}
+            }}
+
+            U
+            {{
+    """) + u_solver + dedent(f"""\
+            }}
+        }}
+
+        SIMPLE
+        {{
+            nNonOrthogonalCorrectors {s["n_non_orthogonal"]};
+            consistent      {"yes" if s["consistent"] else "no"};
+        """) + residual_control + dedent(f"""\
+        }}
+
+        potentialFlow
+        {{
+            nNonOrthogonalCorrectors {max(s["potential_non_orthogonal"], s["n_non_orthogonal"])};
+        }}
+
+        relaxationFactors
+        {{
+        """) + fields + dedent(f"""\
+            equations
+            {{
+                U               {s["relax_U"]};
+            }}
+        }}{cache}
+
+        // ************************************************************************* //
+    """)
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as f:
+        f.write(fvSolution)
+    print(f"Generated fvSolution at: {file_path} with preset {preset}")
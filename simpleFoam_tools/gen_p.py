@@ -33,6 +33,8 @@ def generate_pressure_field(file_path: str, dp: float = 1e-3, boundary: str = "s
 
         boundaryField
         {{
+            #includeEtc "caseDicts/setConstraintTypes"
+
             top
             {{
                 type            {bc_type};
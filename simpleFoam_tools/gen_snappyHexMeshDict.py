@@ -1,8 +1,36 @@
 import os
-from textwrap import dedent
+from textwrap import dedent, indent
 
-def generate_snappyHexMeshDict(location_in_mesh: tuple, stl_file: str, file_path: str, refinement: int = 0) -> None:
-    """Generate snappyHexMeshDict for a given STL geometry and mesh location."""
+def _region_entries(regions):
+    """The geometry and refinementRegions entries of local refinement regions."""
+    geometry, refinement_regions = "", ""
+    for r in regions:
+        if r["type"] == "box":
+            geometry += (f"{r['name']}\n{{\n    type searchableBox;\n"
+                         f"    min ({' '.join(str(c) for c in r['min'])});\n"
+                         f"    max ({' '.join(str(c) for c in r['max'])});\n}}\n")
+        elif r["type"] == "stl":
+            geometry += f"{r['file']}\n{{\n    type triSurfaceMesh;\n    name {r['name']};\n}}\n"
+        else:
+            raise ValueError(f"Unsupported refinement region type: {r['type']}")
+        refinement_regions += f"{r['name']}\n{{\n    mode inside;\n    levels ((1E15 {r['level']}));\n}}\n"
+    return indent(geometry, " " * 12), indent(refinement_regions, " " * 16)
+
+def generate_snappyHexMeshDict(location_in_mesh: tuple, stl_file: str, file_path: str, refinement: int = 0,
+                               max_local_cells: int = 100000, max_global_cells: int = 2000000,
+                               regions: list = None) -> None:
+    """Generate snappyHexMeshDict for a given STL geometry and mesh location.
+
+    `location_in_mesh` may be an (x, y, z) point or a VoxelVolume, in which
+    case a pore voxel near the domain centre is used. `max_local_cells` and
+    `max_global_cells` are the castellated mesh limits (see mesh_estimate.predict_mesh).
+    `regions` adds local refinement inside boxes or closed STL surfaces, e.g. the
+    narrow throats of throats.write_throat_regions.
+    """
+    region_geometry, refinement_regions = _region_entries(regions or [])
+    if hasattr(location_in_mesh, "array"):
+        from .porosity_comp import find_pore_location
+        location_in_mesh = find_pore_location(location_in_mesh)
     x, y, z = location_in_mesh
 
     snappy_dict = dedent(rf"""
@@ -33,12 +61,12 @@ def generate_snappyHexMeshDict(location_in_mesh: tuple, stl_file: str, file_path
                 type triSurfaceMesh;
                 name solids;
             }}
-        }};
+{region_geometry}        }};
 
         castellatedMeshControls
         {{
-            maxLocalCells        100000;
-            maxGlobalCells       2000000;
+            maxLocalCells        {max_local_cells};
+            maxGlobalCells       {max_global_cells};
             minRefinementCells   10;
             maxLoadUnbalance     0.10;
             nCellsBetweenLevels  3;
@@ -51,7 +79,9 @@ def generate_snappyHexMeshDict(location_in_mesh: tuple, stl_file: str, file_path
                 }}
             }}
             resolveFeatureAngle  30;
-            refinementRegions    {{}}
+            refinementRegions
+            {{
+{refinement_regions}            }}
             locationInMesh       ({x} {y} {z});
             allowFreeStandingZoneFaces false;
         }}
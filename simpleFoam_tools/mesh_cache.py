@@ -0,0 +1,166 @@
+import os
+import json
+import stat
+import time
+import shutil
+import hashlib
+
+from .voxel_volume import as_volume
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "porePermFoam", "meshes")
+
+# Case sub-directories stored per mesh: the finished polyMesh and the STL it was cut from
+_ARTIFACTS = (os.path.join("constant", "polyMesh"), os.path.join("constant", "triSurface"))
+
+class MeshCache:
+    """
+    Content-addressed store of finished meshes, so parameter sweeps on the same sample mesh once.
+
+    A mesh is keyed by the SHA-256 of the voxel volume plus every parameter that
+    changes the mesh (shape, mesh_resolution, refinement, boundary,
+    location_in_mesh, scale, mesher). Each entry holds constant/polyMesh and
+    constant/triSurface of the case that built it. Entries are restored by
+    hardlink (read-only, so no run can modify the cache in place) or by copy
+    across file systems, and the least recently used ones are evicted once the
+    cache exceeds `max_bytes`.
+
+    Example:
+        cache = MeshCache()
+        key = cache.key(volume, shape=shape, mesh_resolution=mesh_resolution, refinement=refinement,
+                        boundary=boundary_type, location_in_mesh=location_in_mesh, scale=scale)
+        if key not in cache:
+            vti_to_stl(volume, stl_path)
+        run_simplefoam(".", scale=scale, mesh_cache=cache, mesh_key=key)
+
+    Parameters:
+        root (str): Cache directory (default: $POREPERMFOAM_MESH_CACHE or ~/.cache/porePermFoam/meshes).
+        max_bytes (int): Size cap of the cache; least recently used meshes are evicted beyond it.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = 20 * 2**30):
+        self.root = os.path.abspath(root or os.environ.get("POREPERMFOAM_MESH_CACHE", DEFAULT_CACHE_DIR))
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def __repr__(self):
+        return f"MeshCache({self.root!r}, max_bytes={self.max_bytes})"
+
+    def key(self, volume, mesher: str = "snappy", **params) -> str:
+        """
+        Return the cache key of a mesh of `volume` built with `params`.
+
+        Pass every mesh-affecting parameter, e.g. shape, mesh_resolution, refinement,
+        boundary, location_in_mesh and scale; solver settings such as dp or end_time
+        must be left out so they share the mesh.
+        """
+        content = {"volume": as_volume(volume).content_hash, "mesher": mesher.lower()}
+        content.update({name: list(value) if isinstance(value, tuple) else value for name, value in params.items()})
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def __contains__(self, key):
+        return os.path.exists(os.path.join(self._entry(key), "meta.json"))
+
+    def entries(self) -> list:
+        """Return the metadata of all cached meshes, most recently used first."""
+        entries = []
+        for key in os.listdir(self.root):
+            meta_path = os.path.join(self._entry(key), "meta.json")
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                meta["last_used"] = os.stat(meta_path).st_mtime
+            except (OSError, ValueError):
+                continue
+            entries.append(meta)
+        return sorted(entries, key=lambda m: -m["last_used"])
+
+    def restore(self, key: str, case_dir: str, link: bool = True) -> bool:
+        """
+        Put a cached mesh into `case_dir`, replacing its constant/polyMesh.
+
+        Returns:
+            bool: True if the mesh was restored, False if it is not (or no longer) cached.
+        """
+        entry = self._entry(key)
+        if key not in self:
+            return False
+        try:
+            for artifact in _ARTIFACTS:
+                src = os.path.join(entry, artifact)
+                if not os.path.isdir(src):
+                    continue
+                dst = os.path.join(case_dir, artifact)
+                if artifact.endswith("polyMesh") and os.path.isdir(dst):
+                    shutil.rmtree(dst)
+                for dirpath, _, filenames in os.walk(src):
+                    target_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+                    os.makedirs(target_dir, exist_ok=True)
+                    for name in filenames:
+                        target = os.path.join(target_dir, name)
+                        if os.path.lexists(target):
+                            os.remove(target)
+                        _link_or_copy(os.path.join(dirpath, name), target, link)
+            os.utime(os.path.join(entry, "meta.json"))
+        except FileNotFoundError:
+            # Evicted by another process while restoring
+            return False
+        print(f"Restored cached mesh {key[:12]} into {case_dir}")
+        return True
+
+    def store(self, key: str, case_dir: str, params: dict = None) -> None:
+        """Copy the finished constant/polyMesh (and constant/triSurface) of `case_dir` into the cache."""
+        if key in self:
+            os.utime(os.path.join(self._entry(key), "meta.json"))
+            return
+        if not os.path.isdir(os.path.join(case_dir, _ARTIFACTS[0])):
+            raise ValueError(f"No constant/polyMesh to cache in {case_dir}")
+        tmp = f"{self._entry(key)}.{os.getpid()}.tmp"
+        size = 0
+        for artifact in _ARTIFACTS:
+            src = os.path.join(case_dir, artifact)
+            if os.path.isdir(src):
+                shutil.copytree(src, os.path.join(tmp, artifact))
+        for dirpath, _, filenames in os.walk(tmp):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                size += os.path.getsize(path)
+                # Restored files are hardlinks: make them read-only so a run cannot alter the cache
+                os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        with open(os.path.join(tmp, "meta.json"), 'w') as f:
+            json.dump({"key": key, "bytes": size, "created": time.time(), "params": params or {}},
+                      f, indent=2, default=str)
+        try:
+            os.rename(tmp, self._entry(key))
+        except OSError:
+            # Stored concurrently by another process
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        print(f"Cached mesh {key[:12]} ({size / 2**20:.1f} MB) in {self.root}")
+        self.evict()
+
+    def evict(self) -> list:
+        """Remove least recently used meshes until the cache fits in max_bytes; return their keys."""
+        entries = self.entries()
+        total = sum(e["bytes"] for e in entries)
+        removed = []
+        while entries and total > self.max_bytes:
+            oldest = entries.pop()
+            shutil.rmtree(self._entry(oldest["key"]), ignore_errors=True)
+            total -= oldest["bytes"]
+            removed.append(oldest["key"])
+        if removed:
+            print(f"Evicted {len(removed)} cached meshes from {self.root}")
+        return removed
+
+def _link_or_copy(src, dst, link=True):
+    """Hardlink `src` to `dst`, falling back to a copy (e.g. across file systems)."""
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
@@ -0,0 +1,170 @@
+import os
+import math
+import numpy as np
+from scipy import ndimage
+
+from .voxel_volume import as_volume
+from .porosity_comp import vti_phi, find_pore_location
+from .descriptors import interface_faces
+
+# Rules of thumb for OpenFOAM 7 on hex-dominant meshes (incompressible, GAMG)
+SOLVER_BYTES_PER_CELL = 1.0e3       # simpleFoam
+SNAPPY_BYTES_PER_CELL = 2.5e3       # snappyHexMesh, per cell before the solid part is removed
+PROCESS_BYTES = 150 * 2**20         # fixed cost of every (MPI) process
+CELLS_PER_PROC = 100_000            # parallel efficiency drops below this many cells per process
+LIMIT_HEADROOM = 1.5                # castellated limits above the predicted peak cell count
+MIN_LOCAL_CELLS = 100_000
+N_CELLS_BETWEEN_LEVELS = 3          # as in generate_snappyHexMeshDict
+
+def node_memory() -> int:
+    """Total memory of this machine [bytes] (MemTotal of /proc/meminfo, or the physical pages)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+def predict_mesh(shape: tuple, mesh_resolution: tuple, porosity: float, interface_faces: int,
+                 refinement: int = 0, mesher: str = "snappy", n_procs: int = 1, regions: list = None) -> dict:
+    """
+    Predict mesh size and memory of a case from voxel statistics, before any OpenFOAM tool runs.
+
+    With mesher="voxel" every pore voxel becomes fx*fy*fz cells. With snappy, the
+    background cells inside the pore region around locationInMesh are kept (pass
+    the statistics of that region, see connected_pore), and `refinement` levels
+    at the pore/solid surface add bands of N_CELLS_BETWEEN_LEVELS + 1 cells per
+    level, each level halving the cell size; the surface area comes from the
+    voxel interface face count. Estimates are meant to be within a factor of ~1.5.
+
+    Parameters:
+        shape (tuple): Domain dimensions (nx, ny, nz) in voxels.
+        mesh_resolution (tuple): Background cells along (x, y, z).
+        porosity (float): Pore fraction of the volume that is meshed (snappy: of the
+            cluster around locationInMesh, see connected_pore).
+        interface_faces (int): Number of pore/solid voxel faces of that pore space
+            (see descriptors.interface_faces).
+        refinement (int): Surface refinement level of snappyHexMesh.
+        mesher (str): "snappy" or "voxel".
+        n_procs (int): Processes the case runs on.
+        regions (list): (pore voxels, region voxels, level) of local refinement regions
+            (see throats.throat_region_cells); snappy only.
+
+    Returns:
+        dict: 'background_cells', 'cells', 'faces', 'peak_cells' (snappyHexMesh, before
+            removing solid cells), 'solver_memory_bytes', 'mesher_memory_bytes',
+            'memory_bytes' (the larger), 'recommended_procs', 'max_global_cells' and
+            'max_local_cells'.
+    """
+    background = math.prod(int(m) for m in mesh_resolution)
+    cells_per_voxel = background / math.prod(shape)
+    # Background cells cut by the surface: surface area over the cell face area
+    surface_cells = interface_faces * cells_per_voxel ** (2 / 3)
+
+    if mesher == "voxel":
+        cells = porosity * background
+        peak = cells
+    elif mesher == "snappy":
+        # The solid surface runs through the centres of the solid voxels next to the pore
+        # space (see voxel_stl), half a voxel beyond every interface face, and the block
+        # mesh spans the voxel centres, n - 1 voxels along each axis. Checked against
+        # run_porePermFoam.ipynb: channel1 with factor_mesh (0.5, 4, 4) predicts 99,000
+        # cells, snappyHexMesh kept 96,800.
+        kept = (porosity * math.prod(shape) + 0.5 * interface_faces) * background / math.prod(
+            max(n - 1, 1) for n in shape)
+        kept = min(kept, background)
+        # Volume (in background cells) of the pore-side band refined to at least level l
+        band = [0.5 * surface_cells * (N_CELLS_BETWEEN_LEVELS + 1) / 2**l for l in range(1, refinement + 1)] + [0.0]
+        cells = kept - band[0] if refinement else kept
+        for l in range(1, refinement + 1):
+            cells += (band[l - 1] - band[l]) * 8**l
+        # Both sides of the surface are refined before the solid cells are removed
+        peak = background + 2 * (cells - kept) if refinement else background
+        # Every background cell inside a region is split into 8**level cells
+        for pore_voxels, region_voxels, level in regions or []:
+            cells += pore_voxels * cells_per_voxel * (8**level - 1)
+            peak += region_voxels * cells_per_voxel * (8**level - 1)
+    else:
+        raise ValueError(f"Unsupported mesher: {mesher}")
+
+    cells = max(cells, 1.0)
+    faces = 3 * cells + 2 * surface_cells * (4 ** refinement if mesher == "snappy" else 1)
+    solver = cells * SOLVER_BYTES_PER_CELL + n_procs * PROCESS_BYTES
+    meshing = peak * SNAPPY_BYTES_PER_CELL + n_procs * PROCESS_BYTES if mesher == "snappy" else solver
+    max_global = int(math.ceil(LIMIT_HEADROOM * peak))
+    return {
+        "background_cells": background,
+        "cells": int(round(cells)),
+        "faces": int(round(faces)),
+        "peak_cells": int(round(peak)),
+        "solver_memory_bytes": int(solver),
+        "mesher_memory_bytes": int(meshing),
+        "memory_bytes": int(max(solver, meshing)),
+        "recommended_procs": max(1, int(math.ceil(cells / CELLS_PER_PROC))),
+        "max_global_cells": max_global,
+        "max_local_cells": max(MIN_LOCAL_CELLS, int(math.ceil(max_global / n_procs))),
+    }
+
+def connected_pore(vti_path, location_in_mesh: tuple = None) -> tuple:
+    """
+    Pore fraction and pore/solid interface faces of the pore region snappyHexMesh keeps.
+
+    snappyHexMesh only keeps the mesh region containing locationInMesh, so pores not
+    connected to it are never meshed. Pore voxels touching at an edge or corner
+    share a cell of the voxel surface (see voxel_stl), so the region is the
+    26-connected pore cluster containing `location_in_mesh` (default: find_pore_location).
+
+    Returns:
+        tuple: (fraction of the volume, interface faces) of that cluster.
+    """
+    volume = as_volume(vti_path)
+    if location_in_mesh is None:
+        location_in_mesh = find_pore_location(volume)
+    x, y, z = (int(round(c)) for c in location_in_mesh)
+    labels = ndimage.label(volume.array > 0, structure=np.ones((3, 3, 3), dtype=bool))[0]
+    cluster = labels == labels[z, y, x]
+    del labels
+    faces = sum(int(np.count_nonzero(np.diff(cluster, axis=d))) for d in range(3))
+    return float(np.count_nonzero(cluster)) / cluster.size, faces
+
+def estimate_mesh(vti_path, mesh_resolution: tuple, refinement: int = 0, mesher: str = "snappy",
+                  n_procs: int = 1) -> dict:
+    """
+    predict_mesh() for a voxel sample; porosity and interface faces are counted slab by
+    slab (voxel), or for the pore cluster around the default locationInMesh (snappy).
+
+    Parameters:
+        vti_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
+        mesh_resolution (tuple): Background cells along (x, y, z).
+        refinement (int): Surface refinement level of snappyHexMesh.
+        mesher (str): "snappy" or "voxel".
+        n_procs (int): Processes the case runs on.
+    """
+    volume = as_volume(vti_path)
+    if mesher == "snappy":
+        porosity, faces = connected_pore(volume)
+    else:
+        porosity, faces = vti_phi(volume), interface_faces(volume)
+    return predict_mesh(volume.shape, mesh_resolution, porosity, faces,
+                        refinement=refinement, mesher=mesher, n_procs=n_procs)
+
+def check_memory(estimate: dict, memory_bytes: int = None) -> None:
+    """
+    Compare the predicted meshing and solver memory with the memory available.
+
+    Raises MemoryError if it exceeds an explicit `memory_bytes`. Without one it is
+    compared with this node's memory and only a warning is printed: the bytes per
+    cell are rules of thumb, not calibrated limits.
+    """
+    limit = memory_bytes or node_memory()
+    if estimate["memory_bytes"] <= limit:
+        return
+    message = (f"Predicted {estimate['cells']:,} cells need {estimate['memory_bytes'] / 2**30:.1f} GB "
+               f"(meshing {estimate['mesher_memory_bytes'] / 2**30:.1f} GB, solver "
+               f"{estimate['solver_memory_bytes'] / 2**30:.1f} GB), more than the "
+               f"{limit / 2**30:.1f} GB available")
+    if memory_bytes:
+        raise MemoryError(message + "; reduce factor_mesh/refinement or crop the sample")
+    print(f"Warning: {message} on this node; set memory_gb to reject such cases")
@@ -0,0 +1,57 @@
+import numpy as np
+from scipy import ndimage
+from .voxel_volume import VoxelVolume, as_volume
+
+def percolating_volume(vti_path, axis: int = 0, require_percolation: bool = True):
+    """
+    Remove pore clusters that do not connect the inlet face to the outlet face.
+
+    Pore voxels (value > 0) are labelled into face-connected (6-neighbour)
+    clusters; only clusters touching both the inlet and outlet faces along
+    `axis` are kept, so isolated pockets and clusters that reach only one face
+    are neither meshed nor solved.
+
+    Parameters:
+        vti_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
+        axis (int): Flow direction (0 = x, 1 = y, 2 = z); inlet/outlet are its first and last slices.
+        require_percolation (bool): If True, raise ValueError when no cluster spans inlet to outlet.
+
+    Returns:
+        tuple: (VoxelVolume, dict) with the cleaned in-memory volume (removed voxels set to 0)
+            and a report with keys 'percolates', 'n_clusters', 'n_percolating_clusters',
+            'pore_voxels', 'removed_voxels' and 'removed_fraction'.
+    """
+    volume = as_volume(vti_path)
+    voxel_values = volume.array
+    pore = voxel_values > 0
+
+    labels, n_clusters = ndimage.label(pore)
+    d = 2 - axis  # array axes are (z, y, x)
+    inlet = np.unique(labels.take(0, axis=d))
+    outlet = np.unique(labels.take(-1, axis=d))
+    spanning = np.intersect1d(inlet, outlet)
+    spanning = spanning[spanning > 0]
+
+    keep = np.zeros(n_clusters + 1, dtype=bool)
+    keep[spanning] = True
+    connected = keep[labels]
+    del labels
+
+    pore_voxels = int(np.count_nonzero(pore))
+    removed_voxels = pore_voxels - int(np.count_nonzero(connected))
+    report = {
+        "percolates": bool(len(spanning)),
+        "n_clusters": int(n_clusters),
+        "n_percolating_clusters": int(len(spanning)),
+        "pore_voxels": pore_voxels,
+        "removed_voxels": removed_voxels,
+        "removed_fraction": removed_voxels / pore_voxels if pore_voxels else 0.0,
+    }
+    print(f"Percolation along {'xyz'[axis]}: {report['percolates']} "
+          f"({report['n_percolating_clusters']} of {n_clusters} clusters kept, "
+          f"{report['removed_fraction']:.2%} of pore volume removed)")
+    if require_percolation and not report["percolates"]:
+        raise ValueError(f"Pore space does not percolate from inlet to outlet along {'xyz'[axis]}.")
+
+    cleaned = np.where(connected, voxel_values, np.zeros((), dtype=voxel_values.dtype))
+    return VoxelVolume.from_array(cleaned, spacing=volume.spacing, origin=volume.origin), report
@@ -0,0 +1,34 @@
+import os
+import csv
+
+M2_TO_MD = 1.01324997e15  # m^2 -> millidarcy
+
+def darcy_permeability(flow_rate: float, shape: tuple, scale: float, dp: float, mu: float = 1e-3,
+                       axis: int = 0) -> float:
+    """
+    Permeability from Darcy's law for flow along `axis` through the whole voxel domain.
+
+    Parameters:
+        flow_rate (float): Volumetric flow rate through the inlet or outlet [m^3/s].
+        shape (tuple): Domain dimensions (nx, ny, nz) in voxels, or a VoxelVolume.
+        scale (float): Voxel size [m].
+        dp (float): Pressure difference between inlet and outlet [Pa].
+        mu (float): Dynamic viscosity [Pa s].
+        axis (int): Flow direction (0 = x, 1 = y, 2 = z).
+
+    Returns:
+        float: Permeability [m^2].
+    """
+    n = list(getattr(shape, "shape", shape))
+    L = n.pop(axis) * scale  # length [m]
+    A = n[0] * n[1] * scale**2  # cross-sectional area [m^2]
+    return abs(flow_rate) * mu * L / (A * dp)
+
+def read_final_flow_rate(basedir: str, patch: str = "inlet") -> float:
+    """Return the last flow rate written by run_simplefoam to q_in.csv or q_out.csv."""
+    file_name = {"inlet": "q_in.csv", "outlet": "q_out.csv"}[patch]
+    with open(os.path.join(basedir, file_name), newline='') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f"No flow rates found in {file_name}")
+    return float(rows[-1]["flowRate_phi"])
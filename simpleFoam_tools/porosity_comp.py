@@ -1,30 +1,24 @@
-import vtk
 import numpy as np
-from vtk.util.numpy_support import vtk_to_numpy
+from .voxel_volume import as_volume
 
-def vti_phi(vti_file_path, invert=False):
+def vti_phi(vti_file_path, invert=False, chunk=64):
     """
     Reads a binary .vti file and calculates porosity (fraction of pore voxels).
 
     Parameters:
-        vti_file_path (str): Path to the binary VTI file (e.g., 0 = grain, 1 or 255 = pore).
+        vti_file_path (str or VoxelVolume): Path to the binary VTI file (e.g., 0 = grain, 1 or 255 = pore),
+            or an already loaded VoxelVolume.
         invert (bool): If True, inverts binary mask (e.g., if pores are stored as 0).
+        chunk (int): Number of z-slices counted at a time, so no full-size copy of the volume is made.
 
     Returns:
         float: Porosity (0-1)
     """
-    reader = vtk.vtkXMLImageDataReader()
-    reader.SetFileName(vti_file_path)
-    reader.Update()
-    image_data = reader.GetOutput()
+    volume = as_volume(vti_file_path)
 
-    array = image_data.GetPointData().GetArray(0)
-    voxel_values = vtk_to_numpy(array)
+    pores = sum(int(np.count_nonzero(slab > 0)) for _, slab in volume.slabs(chunk))
+    porosity = pores / volume.size
 
-    binary = (voxel_values > 0).astype(int)
-
-    porosity = np.sum(binary) / len(binary)
-    
     if invert:
         porosity = 1 - porosity
 
@@ -35,48 +29,57 @@ def vti_shape(vti_file_path):
     Reads a .vti file and returns its shape as a set.
 
     Parameters:
-        vti_file_path (str): Path to the .vti file.
+        vti_file_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
 
     Returns:
         set: Shape of the domain {nx, ny, nz}.
     """
-    reader = vtk.vtkXMLImageDataReader()
-    reader.SetFileName(vti_file_path)
-    reader.Update()
-    image_data = reader.GetOutput()
-    
-    dims = image_data.GetDimensions()  # (nx, ny, nz)
-    return tuple(dims)
+    return as_volume(vti_file_path).shape
 
-def find_pore_location(vti_path):
+def find_pore_location(vti_path, chunk=64):
     """
     Reads a binary .vti file and returns the coordinates of a voxel
     located inside the pore space (value > 0).
 
+    The search grows a box around the domain center (doubling its half-width)
+    and scans it slab by slab, so memory stays bounded by one slab of the box.
+
+    Parameters:
+        vti_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
+        chunk (int): Number of z-slices scanned at a time.
+
     Returns:
         tuple: (x, y, z) voxel indices for pore location.
     """
-    reader = vtk.vtkXMLImageDataReader()
-    reader.SetFileName(vti_path)
-    reader.Update()
-    image_data = reader.GetOutput()
-
-    dims = image_data.GetDimensions()  # (nx, ny, nz)
-
-    # Extract voxel values as a NumPy array
-    array = image_data.GetPointData().GetArray(0)
-    voxel_values = vtk_to_numpy(array).reshape(dims[::-1])  # VTK uses z, y, x order
-
-    # Find pore voxels (value > 0)
-    pore_indices = np.argwhere(voxel_values > 0)
-
-    if len(pore_indices) == 0:
-        raise ValueError("No pore voxels found in the given VTI file.")
+    volume = as_volume(vti_path)
+    dims = np.array(volume.shape[::-1])  # (nz, ny, nx)
+    voxel_values = volume.array  # (z, y, x) order
 
     # Pick the pore voxel closest to the center
-    center = np.array(dims[::-1]) / 2
-    distances = np.linalg.norm(pore_indices - center, axis=1)
-    closest_idx = pore_indices[np.argmin(distances)]
+    center = dims / 2
+    half = 8
+    while True:
+        lo = np.maximum(np.floor(center).astype(int) - half, 0)
+        hi = np.minimum(np.floor(center).astype(int) + half + 1, dims)
+        best, best_distance = None, np.inf
+        for z0 in range(lo[0], hi[0], chunk):
+            z1 = min(z0 + chunk, hi[0])
+            pore = voxel_values[z0:z1, lo[1]:hi[1], lo[2]:hi[2]] > 0
+            if not pore.any():
+                continue
+            z, y, x = np.ogrid[z0:z1, lo[1]:hi[1], lo[2]:hi[2]]
+            distance = np.where(pore, (z - center[0])**2 + (y - center[1])**2 + (x - center[2])**2, np.inf)
+            i = np.argmin(distance)
+            if distance.flat[i] < best_distance:
+                best_distance = distance.flat[i]
+                best = np.add(np.unravel_index(i, distance.shape), (z0, lo[1], lo[2]))
+        whole = np.all(lo == 0) and np.all(hi == dims)
+        # Voxels outside the box are more than half - 1 away, so a closer hit is the global nearest
+        if best is not None and (whole or np.sqrt(best_distance) <= half - 1):
+            break
+        if whole:
+            raise ValueError("No pore voxels found in the given VTI file.")
+        half *= 2
 
     # Convert from (z, y, x) to (x, y, z)
-    return (int(closest_idx[2]), int(closest_idx[1]), int(closest_idx[0]))
\ No newline at end of file
+    return (int(best[2]), int(best[1]), int(best[0]))
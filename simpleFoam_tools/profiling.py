@@ -0,0 +1,217 @@
+import os
+import re
+import csv
+import glob
+import gzip
+import json
+import time
+import socket
+import resource
+import threading
+import contextlib
+from datetime import datetime
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _rss_bytes(pid):
+    """Resident set size of a process from /proc, or 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+def _descendants(pid):
+    """Return the pids of all live descendants of `pid`, read from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Field 4 (after the parenthesised command name) is the parent pid
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    result, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            result.append(child)
+            stack.append(child)
+    return result
+
+class _RSSSampler(threading.Thread):
+    """Background thread sampling the RSS of this process and of its whole child process tree."""
+
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_self = 0
+        self.peak_children = 0
+        self.available = os.path.isdir("/proc")
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        pid = os.getpid()
+        self.peak_self = max(self.peak_self, _rss_bytes(pid))
+        self.peak_children = max(self.peak_children, sum(_rss_bytes(p) for p in _descendants(pid)))
+
+    def run(self):
+        while self.available and not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def mesh_size(basedir):
+    """
+    Return (cells, faces) of the case mesh from the 'note' in polyMesh/owner, or (None, None).
+
+    Decomposed cases (processor*/) are summed, as the master mesh may be stale during a parallel run.
+    """
+    owners = glob.glob(os.path.join(basedir, "processor*", "constant", "polyMesh", "owner*"))
+    if not owners:
+        owners = glob.glob(os.path.join(basedir, "constant", "polyMesh", "owner*"))
+    cells = faces = 0
+    for path in owners:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, 'rb') as f:
+            header = f.read(2048).decode(errors="replace")
+        m = re.search(r"nCells:\s*(\d+)\s+nFaces:\s*(\d+)", header)
+        if not m:
+            return None, None
+        cells += int(m.group(1))
+        faces += int(m.group(2))
+    return (cells, faces) if owners else (None, None)
+
+class IterationCounter:
+    """Count solver iterations ('Time = ...' lines) in a streamed log."""
+
+    def __init__(self):
+        self.iterations = 0
+
+    def __call__(self, line):
+        if line.startswith("Time ="):
+            self.iterations += 1
+
+class Profiler:
+    """
+    Record wall time, CPU time, peak memory and throughput of every pipeline stage.
+
+    Use `stage()` as a context manager around each step; counts such as voxels,
+    cells or iterations can be passed up front or set on the yielded record, and
+    are turned into voxels/s, cells/s, iterations/s and cell-iterations/s.
+
+    Example:
+        profiler = Profiler("channel1")
+        with profiler.stage("vti_to_stl", voxels=volume.size):
+            vti_to_stl(volume, stl_path)
+        run_simplefoam(".", scale=scale, profiler=profiler)  # adds the OpenFOAM stages
+
+    Attributes:
+        stages (list): One dict per finished stage.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **counts):
+        record = {"stage": name, **counts}
+        sampler = _RSSSampler()
+        sampler.start()
+        children0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self0 = time.process_time()
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - t0
+            cpu_self = time.process_time() - self0
+            children1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+            sampler.stop()
+            sampler.sample()
+            cpu_children = (children1.ru_utime + children1.ru_stime) - (children0.ru_utime + children0.ru_stime)
+            peak_children = sampler.peak_children
+            if not sampler.available:
+                # Lifetime peak of the largest waited-for child (kB on Linux)
+                peak_children = children1.ru_maxrss * 1024
+
+            record.update({
+                "wall_s": wall,
+                "cpu_s": cpu_self + cpu_children,
+                "cpu_self_s": cpu_self,
+                "cpu_children_s": cpu_children,
+                "peak_rss_self_mb": sampler.peak_self / 2**20,
+                "peak_rss_children_mb": peak_children / 2**20,
+            })
+            if wall > 0:
+                if record.get("voxels"):
+                    record["voxels_per_s"] = record["voxels"] / wall
+                if record.get("cells") and not record.get("iterations"):
+                    record["cells_per_s"] = record["cells"] / wall
+                if record.get("iterations"):
+                    record["iterations_per_s"] = record["iterations"] / wall
+                    if record.get("cells"):
+                        record["cell_iterations_per_s"] = record["cells"] * record["iterations"] / wall
+            self.stages.append(record)
+            print(f"[profile] {name}: wall {wall:.2f} s, cpu {record['cpu_s']:.2f} s, "
+                  f"peak RSS {max(record['peak_rss_self_mb'], record['peak_rss_children_mb']):.0f} MB")
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "host": socket.gethostname(),
+            "started": self.started,
+            "stages": self.stages,
+        }
+
+    def write(self, basedir: str) -> None:
+        """Write profile.json and profile.csv to `basedir`."""
+        with open(os.path.join(basedir, "profile.json"), 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        fields = []
+        for record in self.stages:
+            fields += [k for k in record if k not in fields]
+        with open(os.path.join(basedir, "profile.csv"), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.stages)
+        print(f"Wrote profile of {len(self.stages)} stages to {os.path.join(basedir, 'profile.json')}")
+
+def aggregate_profiles(profiles, report_path: str = None):
+    """
+    Combine profile.json files of many runs into per-run and per-stage tables.
+
+    Parameters:
+        profiles: A glob pattern (e.g. "runs/*/profile.json") or a list of profile.json paths.
+        report_path (str): Optional CSV path for the per-stage summary.
+
+    Returns:
+        tuple: (runs, summary) pandas DataFrames; `runs` has one row per stage per run,
+            `summary` the count/mean/min/max of every metric per stage.
+    """
+    import pandas as pd
+
+    paths = sorted(glob.glob(profiles)) if isinstance(profiles, str) else list(profiles)
+    rows = []
+    for path in paths:
+        with open(path) as f:
+            profile = json.load(f)
+        for record in profile["stages"]:
+            rows.append({"run": profile.get("name") or os.path.dirname(path), "host": profile.get("host"), **record})
+    runs = pd.DataFrame(rows)
+    if runs.empty:
+        return runs, runs
+    metrics = [c for c in runs.columns if c not in ("run", "host", "stage")]
+    summary = runs.groupby("stage")[metrics].agg(["count", "mean", "min", "max"])
+    if report_path:
+        summary.to_csv(report_path)
+        print(f"Wrote profile report for {len(paths)} runs to {report_path}")
+    return runs, summary
@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import numpy as np
+from scipy import ndimage, sparse
+from scipy.sparse import csgraph
+
+from .voxel_volume import VoxelVolume, as_volume
+
+PYRAMID_FACTORS = (2, 4, 8)
+PYRAMID_VERSION = 2    # bump when _coarsen changes, so cached levels are rebuilt
+POROSITY_TOLERANCE = 0.1  # relative porosity drift of a level that is warned about
+COST_EXPONENT = 4 / 3  # solver work ~ cells x SIMPLE iterations, iterations ~ cells along the flow
+
+def _blocks(a, factor):
+    """Regroup a (nz, ny, nx) array into (nz/f, ny/f, nx/f, f**3) blocks; trailing voxels are cropped."""
+    nz, ny, nx = (n // factor for n in a.shape)
+    a = a[:nz * factor, :ny * factor, :nx * factor].reshape(nz, factor, ny, factor, nx, factor)
+    return a.transpose(0, 2, 4, 1, 3, 5).reshape(nz, ny, nx, factor**3)
+
+def _percolates(labels) -> list:
+    """Whether a labelled pore space connects the two opposite faces, per axis (x, y, z)."""
+    spans = []
+    for axis in range(3):
+        d = 2 - axis  # array axes are (z, y, x)
+        spanning = np.intersect1d(labels.take(0, axis=d), labels.take(-1, axis=d))
+        spans.append(bool(np.any(spanning > 0)))
+    return spans
+
+def _centred_chords(pore) -> np.ndarray:
+    """
+    Length of the pore chord that a voxel halves, minimised over the x, y and z chords.
+
+    Along every axis the pore chord through a voxel runs from solid to solid; the
+    voxel is its centre if it is at most one voxel off the middle. Centres of short
+    chords trace the centre lines of throats (and of thin slits), but not the edges
+    and corners of wide pores. Chords reaching the domain boundary never count.
+    """
+    big = np.iinfo(np.int32).max // 4
+    chords = np.full(pore.shape, big, dtype=np.int32)
+    for d in range(3):
+        shape = [1, 1, 1]
+        shape[d] = pore.shape[d]
+        index = np.arange(pore.shape[d], dtype=np.int32).reshape(shape)
+        before = index - np.maximum.accumulate(np.where(pore, -big, index), axis=d)
+        after = np.flip(np.minimum.accumulate(np.flip(np.where(pore, big, index), axis=d), axis=d), axis=d) - index
+        centred = pore & (np.abs(before - after) <= 1)
+        np.minimum(chords, np.where(centred, before + after - 1, big), out=chords)
+        del before, after, centred
+    return chords
+
+class _FineAnalysis:
+    """Pore mask, distance transform, clusters and throat centre lines of the full-resolution volume."""
+
+    def __init__(self, volume):
+        self.pore = volume.array > 0
+        self.distance = ndimage.distance_transform_edt(self.pore).astype(np.float32)
+        self.labels, self.n_clusters = ndimage.label(self.pore)
+        self.chords = _centred_chords(self.pore)
+        self.porosity = float(np.count_nonzero(self.pore)) / self.pore.size
+        self.percolates = _percolates(self.labels)
+
+def _bridges(coarse, candidates) -> np.ndarray:
+    """
+    Shortest face-connected paths of `candidates` voxels that join coarse pores.
+
+    The coarse pore clusters and the six domain faces are terminals. Every candidate
+    voxel is assigned to its nearest terminal (by path length through candidates);
+    where the regions of two terminals meet inside a candidate cluster, the shortest
+    path between them through that meeting point is opened, once per terminal pair
+    and candidate cluster. Candidate clusters touching a single terminal stay closed.
+    """
+    n = int(np.count_nonzero(candidates))
+    if n == 0:
+        return np.zeros_like(candidates)
+    node = np.full(candidates.shape, -1, dtype=np.int64)
+    node[candidates] = np.arange(n)
+    coarse_labels, n_coarse = ndimage.label(coarse)
+    terminal = np.where(coarse_labels > 0, n + coarse_labels - 1, -1).astype(np.int64)
+    del coarse_labels
+
+    edges = []
+    for d in range(3):
+        head = tuple(slice(None, -1) if ax == d else slice(None) for ax in range(3))
+        tail = tuple(slice(1, None) if ax == d else slice(None) for ax in range(3))
+        for a, b in ((node[head], node[tail]), (node[head], terminal[tail]), (terminal[head], node[tail])):
+            joined = (a >= 0) & (b >= 0)
+            edges.append(np.stack([a[joined], b[joined]], axis=1))
+        for face, index in ((2 * d, 0), (2 * d + 1, -1)):
+            on_face = node.take(index, axis=d)
+            on_face = on_face[on_face >= 0]
+            edges.append(np.stack([on_face, np.full_like(on_face, n + n_coarse + face)], axis=1))
+    del terminal
+    # Sorted pairs put the candidate voxel first (terminal nodes are numbered after the voxels)
+    edges = np.unique(np.sort(np.concatenate(edges), axis=1), axis=0)
+    size = n + n_coarse + 6
+    graph = sparse.coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(size, size)).tocsr()
+
+    distance, predecessors, sources = csgraph.dijkstra(graph, directed=False, indices=np.arange(n, size),
+                                                       min_only=True, return_predecessors=True)
+    del graph
+    # Edges between two Voronoi regions; the cheapest per (candidate cluster, terminal pair) is opened
+    a, b = edges[:, 0], edges[:, 1]
+    source_a, source_b = sources[a], sources[b]
+    meeting = (source_a >= 0) & (source_b >= 0) & (source_a != source_b)
+    a, b, source_a, source_b = a[meeting], b[meeting], source_a[meeting], source_b[meeting]
+    cluster_labels = ndimage.label(candidates)[0][candidates]
+    key = np.stack([cluster_labels[a], np.minimum(source_a, source_b), np.maximum(source_a, source_b)], axis=1)
+    order = np.lexsort((distance[a] + distance[b], key[:, 2], key[:, 1], key[:, 0]))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = np.any(np.diff(key[order], axis=0) != 0, axis=1)
+    chosen = order[first]
+
+    opened = np.zeros(n, dtype=bool)
+    path = np.concatenate([a[chosen], b[chosen]])
+    while path.size:
+        path = path[(path >= 0) & (path < n)]
+        opened[path] = True
+        path = predecessors[path]
+    bridges = np.zeros_like(candidates)
+    bridges[candidates] = opened
+    return bridges
+
+def _coarsen(fine, factor):
+    """Topology-preserving downsampling of a _FineAnalysis by `factor`; returns (coarse pore mask, report)."""
+    fraction = _blocks(fine.pore, factor).mean(axis=3)
+    coarse = fraction >= 0.5
+
+    # Throats don't close: the shortest paths along the centre lines of throats narrower
+    # than two blocks that join two coarse pores (or a pore and a domain face) are opened
+    candidates = (_blocks(fine.chords, factor).min(axis=3) <= 2 * factor) & ~coarse
+    coarse |= _bridges(coarse, candidates)
+    del candidates
+
+    # Pockets don't open: every coarse voxel belongs to the fine cluster of its deepest
+    # voxel, and of two touching coarse voxels of different clusters the emptier one is solid
+    deepest = _blocks(fine.distance, factor).argmax(axis=3)
+    cluster = np.take_along_axis(_blocks(fine.labels, factor), deepest[..., None], axis=3)[..., 0]
+    cluster[~coarse] = 0
+    del deepest
+    while True:
+        conflicts = 0
+        for d in range(3):
+            head = tuple(slice(None, -1) if ax == d else slice(None) for ax in range(3))
+            tail = tuple(slice(1, None) if ax == d else slice(None) for ax in range(3))
+            a, b = cluster[head], cluster[tail]
+            conflict = (a > 0) & (b > 0) & (a != b)
+            if conflict.any():
+                conflicts += int(np.count_nonzero(conflict))
+                emptier = fraction[head] < fraction[tail]
+                a[conflict & emptier] = 0
+                b[conflict & ~emptier] = 0
+        if not conflicts:
+            break
+    coarse = cluster > 0
+
+    labels, n_clusters = ndimage.label(coarse)
+    report = {
+        "factor": factor,
+        "shape": list(coarse.shape[::-1]),
+        "porosity": float(np.count_nonzero(coarse)) / coarse.size,
+        "fine_porosity": fine.porosity,
+        "clusters": int(n_clusters),
+        "fine_clusters": int(fine.n_clusters),
+        "percolates": _percolates(labels),
+        "fine_percolates": fine.percolates,
+    }
+    return coarse, report
+
+def _print_report(report):
+    print(f"Pyramid level x{report['factor']}: shape {tuple(report['shape'])}, porosity "
+          f"{report['porosity']:.4f} (full {report['fine_porosity']:.4f}), {report['clusters']} clusters "
+          f"(full {report['fine_clusters']}), percolates x/y/z {report['percolates']}")
+    drift = report["porosity"] / report["fine_porosity"] - 1 if report["fine_porosity"] else 0.0
+    if abs(drift) > POROSITY_TOLERANCE:
+        print(f"Warning: porosity differs from the full resolution by {drift:+.0%} at x{report['factor']}; "
+              f"use a smaller factor")
+    if report["percolates"] != report["fine_percolates"]:
+        print(f"Warning: percolation differs from the full resolution {report['fine_percolates']} "
+              f"at x{report['factor']}; use a smaller factor")
+
+def pyramid_path(vti_path, factor: int) -> str:
+    """Cache path of the `factor`x coarsened volume, next to the original (<file>.x<factor>.npy)."""
+    return f"{as_volume(vti_path).path}.x{factor}.npy"
+
+def build_pyramid(vti_path, factors=PYRAMID_FACTORS, cache: bool = True) -> tuple:
+    """
+    Coarsen a voxel volume by 2x, 4x, 8x (`factors`) with topology-preserving downsampling.
+
+    A coarse voxel is pore if at least half of its block is pore. To keep throats
+    open, the shortest path of blocks on the centre line of a narrow throat (the
+    middle of a short pore chord) between the two coarse pores it joins, or a pore
+    and a domain face, is opened too. To keep separate pore clusters (e.g. isolated
+    pockets) from merging, each coarse voxel takes the fine cluster of its deepest
+    voxel and touching voxels of different clusters are separated. Every level is
+    computed from the full resolution, trailing voxels that do not fill a block are
+    cropped, and the porosity, cluster count and percolation of each level are
+    reported against the original, with a warning when the porosity drifts by more
+    than POROSITY_TOLERANCE or the percolation changes.
+
+    Levels are cached next to the original as <file>.x<factor>.npy with a .json
+    sidecar and reused while the source and PYRAMID_VERSION are unchanged. They are
+    plain volumes, so they can replace the original in vti_shape, find_pore_location,
+    vti_to_stl, the generate_* dictionaries and run_case, with the voxel `scale`
+    multiplied by the factor.
+
+    Parameters:
+        vti_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
+        factors (tuple): Coarsening factors.
+        cache (bool): Read and write the cached levels (in-memory volumes are never cached).
+
+    Returns:
+        tuple: ({factor: VoxelVolume}, {factor: report}) with the coarsened volumes (pore = 1,
+            solid = 0) and per level 'factor', 'shape', 'porosity', 'clusters' and
+            'percolates' (per axis), each next to the full-resolution value ('fine_...').
+    """
+    volume = as_volume(vti_path)
+    cache = cache and volume.path is not None
+    pyramid, reports, missing = {}, {}, []
+    for factor in factors:
+        if min(volume.shape) < 2 * factor:
+            raise ValueError(f"Volume {volume.shape} is too small to coarsen by {factor}")
+        path = pyramid_path(volume, factor) if cache else None
+        meta = None
+        if cache and os.path.exists(path) and os.path.exists(path + ".json"):
+            with open(path + ".json") as f:
+                meta = json.load(f)
+        if meta and meta.get("source_sha256") == volume.content_hash and meta.get("version") == PYRAMID_VERSION:
+            pyramid[factor], reports[factor] = VoxelVolume(path), meta["report"]
+            _print_report(meta["report"])
+        else:
+            missing.append(factor)
+
+    if missing:
+        fine = _FineAnalysis(volume)
+        for factor in missing:
+            coarse, report = _coarsen(fine, factor)
+            array = coarse.astype(np.uint8)
+            if cache:
+                path = pyramid_path(volume, factor)
+                np.save(path, array)
+                with open(path + ".json", 'w') as f:
+                    json.dump({"source": volume.path, "source_sha256": volume.content_hash,
+                               "version": PYRAMID_VERSION, "factor": factor, "report": report}, f, indent=2)
+                pyramid[factor] = VoxelVolume(path)
+            else:
+                pyramid[factor] = VoxelVolume.from_array(array, spacing=tuple(s * factor for s in volume.spacing),
+                                                         origin=volume.origin)
+            reports[factor] = report
+            _print_report(report)
+        del fine
+    return {factor: pyramid[factor] for factor in factors}, {factor: reports[factor] for factor in factors}
+
+def run_preview(vti_path, work_dir: str, factor: int = 4, params: dict = None, template_dir: str = ".") -> dict:
+    """
+    Rough permeability from a coarsened volume, next to the predicted cost of the full-resolution run.
+
+    The `factor`x pyramid level (see build_pyramid) runs through run_case with the
+    voxel scale multiplied by `factor` and otherwise the same parameters. The cost of
+    the full-resolution run is predicted with mesh_estimate.predict_mesh (cells,
+    memory, process count) and its solve time extrapolated from the measured preview
+    as core-seconds x (cell ratio)**COST_EXPONENT. The report is written to
+    work_dir/preview.json.
+
+    Parameters:
+        vti_path (str or VoxelVolume): The full-resolution sample.
+        work_dir (str): Directory receiving the preview case (preview_x<factor>) and preview.json.
+        factor (int): Coarsening factor of the preview.
+        params (dict): Run parameters of the full-resolution run (see batch.DEFAULT_PARAMS).
+        template_dir (str): Case whose system/, constant/ and 0/ are cloned for the preview.
+
+    Returns:
+        dict: Preview permeability, porosity and wall time, and the full-resolution
+            cells, memory, recommended processes, estimated wall time and core hours.
+    """
+    from .batch import DEFAULT_PARAMS, run_case, _plan_mesh
+
+    volume = as_volume(vti_path)
+    work_dir = os.path.abspath(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    levels, reports = build_pyramid(volume, (factor,))
+    coarse, topology = levels[factor], reports[factor]
+    coarse_p = {**p, "scale": p["scale"] * factor}
+
+    start = time.perf_counter()
+    row = run_case(coarse, os.path.join(work_dir, f"preview_x{factor}"), coarse_p,
+                   template_dir=os.path.abspath(template_dir))
+    wall = time.perf_counter() - start
+
+    # The built-in Stokes solver works on the pore voxels, like the voxel mesher
+    plan = {**p, "mesher": "voxel", "factor_mesh": (1, 1, 1)} if p["solver"] == "stokes" else p
+    full = _plan_mesh(volume, plan)
+    preview = _plan_mesh(coarse, {**plan, "n_procs": row["n_procs"]})
+    core_seconds = wall * preview["n_procs"] * (full["cells"] / preview["cells"]) ** COST_EXPONENT
+    procs = full["n_procs"] if p["solver"] != "stokes" else 1
+
+    report = {
+        "vti": str(getattr(vti_path, "path", vti_path)), "factor": factor, "status": row["status"],
+        "error": row["error"], "preview_scale": coarse_p["scale"], "preview_shape": list(coarse.shape),
+        "preview_porosity": row["porosity"], "porosity": topology["fine_porosity"],
+        "preview_percolates": topology["percolates"], "percolates": topology["fine_percolates"],
+        "preview_permeability_m2": row["permeability_m2"], "preview_permeability_mD": row["permeability_mD"],
+        "preview_cells": preview["cells"], "preview_wall_s": wall,
+        "full_cells": full["cells"], "full_memory_gb": full["memory_bytes"] / 2**30,
+        "full_recommended_procs": full["recommended_procs"], "full_n_procs": procs,
+        "full_wall_s_estimate": core_seconds / procs, "full_core_hours_estimate": core_seconds / 3600,
+    }
+    with open(os.path.join(work_dir, "preview.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    k = report["preview_permeability_mD"]
+    print(f"Preview x{factor}: k = {k:.4g} mD, porosity {report['preview_porosity']:.4f} "
+          f"(full {report['porosity']:.4f}), {preview['cells']:,} cells in {wall:.1f} s" if k is not None
+          else f"Preview x{factor} failed: {row['error']}")
+    print(f"Full resolution: {full['cells']:,} cells, {report['full_memory_gb']:.1f} GB, "
+          f"~{report['full_wall_s_estimate'] / 60:.1f} min on {procs} processes "
+          f"({report['full_core_hours_estimate']:.2f} core hours)")
+    return report
@@ -1,14 +1,14 @@
 import os
+import glob
 import shutil
 
 def remove_run_files(basedir):
     """Remove all files and directories related to the 'run' directory."""
-    cellLevel = os.path.join(basedir, "0/cellLevel")
-    os.remove(cellLevel) if os.path.exists(cellLevel) else None
-    pointLevel = os.path.join(basedir, "0/pointLevel")
-    os.remove(pointLevel) if os.path.exists(pointLevel) else None
+    for level in ("0/cellLevel", "0/pointLevel", "0/cellLevel.gz", "0/pointLevel.gz"):
+        level = os.path.join(basedir, level)
+        os.remove(level) if os.path.exists(level) else None
     for dir in os.listdir(basedir):
-        if dir[0].isdigit() and dir != '0':
+        if (dir[0].isdigit() and dir != '0') or dir.startswith("processor"):
             shutil.rmtree(os.path.join(basedir, dir))
             
     msh_path = os.path.join(basedir, "constant", "polyMesh")
@@ -17,5 +17,9 @@ def remove_run_files(basedir):
     postProc_path = os.path.join(basedir, "postProcessing")
     if os.path.exists(postProc_path):
         shutil.rmtree(postProc_path)
+    for log in glob.glob(os.path.join(basedir, "log.*.gz")):
+        os.remove(log)
+    for name in ("profile.json", "profile.csv"):
+        os.remove(os.path.join(basedir, name)) if os.path.exists(os.path.join(basedir, name)) else None
     os.remove(os.path.join(basedir, "q_in.csv")) if os.path.exists(os.path.join(basedir, "q_in.csv")) else None
     os.remove(os.path.join(basedir, "q_out.csv")) if os.path.exists(os.path.join(basedir, "q_out.csv")) else None
\ No newline at end of file
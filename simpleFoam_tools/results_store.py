@@ -0,0 +1,207 @@
+import os
+import csv
+import json
+import socket
+import sqlite3
+import hashlib
+import contextlib
+from datetime import datetime
+
+# Parameters that change how a run executes but not its result
+_EXECUTION_PARAMS = {"n_procs", "mesh_cache", "io_profile", "memory_gb"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_key          TEXT PRIMARY KEY,
+    geometry_hash    TEXT NOT NULL,
+    vti              TEXT,
+    "case"           TEXT,
+    params           TEXT NOT NULL,
+    openfoam_version TEXT,
+    status           TEXT,
+    porosity         REAL,
+    permeability_m2  REAL,
+    permeability_mD  REAL,
+    error            TEXT,
+    host             TEXT,
+    created          TEXT
+);
+CREATE TABLE IF NOT EXISTS fluxes (
+    run_key   TEXT NOT NULL REFERENCES runs(run_key) ON DELETE CASCADE,
+    patch     TEXT NOT NULL,
+    time      REAL NOT NULL,
+    flow_rate REAL NOT NULL,
+    area      REAL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_key TEXT NOT NULL REFERENCES runs(run_key) ON DELETE CASCADE,
+    stage   TEXT NOT NULL,
+    wall_s  REAL,
+    cpu_s   REAL,
+    peak_rss_mb REAL,
+    record  TEXT
+);
+CREATE INDEX IF NOT EXISTS fluxes_run ON fluxes(run_key);
+CREATE INDEX IF NOT EXISTS stages_run ON stages(run_key);
+CREATE INDEX IF NOT EXISTS runs_geometry ON runs(geometry_hash);
+"""
+
+def openfoam_version():
+    """OpenFOAM version of the sourced environment (e.g. 'OpenFOAM-7'), or None."""
+    version = os.environ.get("WM_PROJECT_VERSION")
+    return f"{os.environ.get('WM_PROJECT', 'OpenFOAM')}-{version}" if version else None
+
+class ResultsStore:
+    """
+    SQLite store of finished permeability runs, so campaigns only compute what is missing.
+
+    Each run is keyed by the geometry hash (VoxelVolume.content_hash) and all
+    result-affecting parameters, and holds the parameters, OpenFOAM version,
+    inlet/outlet flux time series, porosity, permeability and stage timings.
+
+    Example:
+        store = ResultsStore("results.sqlite")
+        run_batch("samples/", "runs/", grid={"dp": [0.5, 1.0]}, store=store)  # skips finished runs
+        store.runs(dp=1.0)                                                   # query as a DataFrame
+
+    Parameters:
+        path (str): SQLite database file, created if missing.
+    """
+
+    def __init__(self, path: str = "results.sqlite"):
+        self.path = os.path.abspath(path)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return f"ResultsStore({self.path!r})"
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """A connection that commits (or rolls back on error) and is closed on exit."""
+        db = sqlite3.connect(self.path, timeout=60)
+        try:
+            db.execute("PRAGMA foreign_keys = ON")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def key(geometry_hash: str, params: dict) -> str:
+        """Run key from the geometry hash and every parameter that affects the result."""
+        relevant = {k: v for k, v in params.items() if k not in _EXECUTION_PARAMS}
+        content = json.dumps({"geometry": geometry_hash, "params": relevant}, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def __contains__(self, key):
+        """True if the run finished successfully (failed runs are computed again)."""
+        with self._connect() as db:
+            row = db.execute("SELECT 1 FROM runs WHERE run_key = ? AND status = 'done'", (key,)).fetchone()
+        return row is not None
+
+    def get(self, key: str) -> dict:
+        """Return a stored run as a run_case() result row, or None."""
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM runs WHERE run_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"case": row["case"], "vti": row["vti"], **json.loads(row["params"]),
+                "status": row["status"], "porosity": row["porosity"], "permeability_m2": row["permeability_m2"],
+                "permeability_mD": row["permeability_mD"], "error": row["error"] or ""}
+
+    def record(self, key: str, geometry_hash: str, row: dict, params: dict,
+               fluxes: dict = None, stages: list = None) -> None:
+        """
+        Store (or replace) one run.
+
+        Parameters:
+            key (str): Run key, see ResultsStore.key.
+            geometry_hash (str): Content hash of the voxel volume.
+            row (dict): Result row with 'case', 'vti', 'status', 'porosity', 'permeability_m2',
+                'permeability_mD' and 'error', as returned by run_case.
+            params (dict): All run parameters.
+            fluxes (dict): {patch: [(time, flow_rate, area), ...]}.
+            stages (list): Profiler stage records (see Profiler.stages).
+        """
+        with self._connect() as db:
+            db.execute("DELETE FROM runs WHERE run_key = ?", (key,))
+            db.execute(
+                'INSERT INTO runs (run_key, geometry_hash, vti, "case", params, openfoam_version, status, porosity, '
+                'permeability_m2, permeability_mD, error, host, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, geometry_hash, row.get("vti"), row.get("case"), json.dumps(params, default=str),
+                 openfoam_version(), row.get("status"), row.get("porosity"), row.get("permeability_m2"),
+                 row.get("permeability_mD"), row.get("error"), socket.gethostname(),
+                 datetime.now().isoformat(timespec="seconds")))
+            for patch, series in (fluxes or {}).items():
+                db.executemany("INSERT INTO fluxes (run_key, patch, time, flow_rate, area) VALUES (?, ?, ?, ?, ?)",
+                               [(key, patch, t, q, area) for t, q, area in series])
+            db.executemany("INSERT INTO stages (run_key, stage, wall_s, cpu_s, peak_rss_mb, record) "
+                           "VALUES (?, ?, ?, ?, ?, ?)",
+                           [(key, s["stage"], s.get("wall_s"), s.get("cpu_s"),
+                             max(s.get("peak_rss_self_mb", 0), s.get("peak_rss_children_mb", 0)),
+                             json.dumps(s, default=str)) for s in stages or []])
+
+    def record_case(self, key: str, geometry_hash: str, row: dict, params: dict, case_dir: str) -> None:
+        """Store a run together with the q_in.csv/q_out.csv fluxes and profile.json timings of its case directory."""
+        fluxes = {}
+        for patch, name in (("inlet", "q_in.csv"), ("outlet", "q_out.csv")):
+            path = os.path.join(case_dir, name)
+            if os.path.exists(path):
+                with open(path, newline='') as f:
+                    fluxes[patch] = [(float(r["time"]), float(r["flowRate_phi"]), float(r["area"]))
+                                     for r in csv.DictReader(f)]
+        stages = []
+        profile = os.path.join(case_dir, "profile.json")
+        if os.path.exists(profile):
+            with open(profile) as f:
+                stages = json.load(f)["stages"]
+        self.record(key, geometry_hash, row, params, fluxes=fluxes, stages=stages)
+
+    def runs(self, status: str = None, geometry_hash: str = None, **params):
+        """
+        Query stored runs, filtering on status, geometry hash and parameter values.
+
+        Example:
+            store.runs(status="done", boundary="Wall", dp=1.0)
+
+        Returns:
+            pandas.DataFrame: One row per run, with its parameters as columns.
+        """
+        import pandas as pd
+
+        where, args = [], []
+        if status is not None:
+            where.append("status = ?")
+            args.append(status)
+        if geometry_hash is not None:
+            where.append("geometry_hash = ?")
+            args.append(geometry_hash)
+        sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY created"
+        with self._connect() as db:
+            table = pd.read_sql_query(sql, db, params=args)
+        if table.empty:
+            return table
+        expanded = pd.DataFrame([json.loads(p) for p in table.pop("params")], index=table.index)
+        table = table.join(expanded.drop(columns=[c for c in expanded if c in table]))
+        for name, value in params.items():
+            value = list(value) if isinstance(value, tuple) else value
+            table = table[table[name].apply(lambda v: v == value)]
+        return table.reset_index(drop=True)
+
+    def fluxes(self, key: str):
+        """Flux time series of one run as a DataFrame (patch, time, flow_rate, area)."""
+        import pandas as pd
+
+        with self._connect() as db:
+            return pd.read_sql_query("SELECT patch, time, flow_rate, area FROM fluxes WHERE run_key = ? "
+                                     "ORDER BY patch, time", db, params=(key,))
+
+    def stages(self, key: str):
+        """Stage timings of one run as a DataFrame."""
+        import pandas as pd
+
+        with self._connect() as db:
+            return pd.read_sql_query("SELECT stage, wall_s, cpu_s, peak_rss_mb FROM stages WHERE run_key = ?",
+                                     db, params=(key,))
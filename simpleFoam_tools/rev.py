@@ -0,0 +1,173 @@
+import os
+import numpy as np
+import pandas as pd
+
+from .voxel_volume import as_volume, VoxelVolume
+from .percolation import percolating_volume
+from .batch import run_case, schedule, DEFAULT_PARAMS
+
+def _cube(size):
+    """(nx, ny, nz) from an int edge length or a 3-tuple."""
+    size = tuple(int(s) for s in np.broadcast_to(size, 3))
+    if min(size) < 1:
+        raise ValueError(f"Invalid subvolume size {size}")
+    return size
+
+def tile_boxes(shape: tuple, size, stride=None) -> list:
+    """
+    Split a domain into a regular grid of (optionally overlapping) subvolumes.
+
+    Parameters:
+        shape (tuple): Domain dimensions (nx, ny, nz).
+        size (int or tuple): Tile size (nx, ny, nz) in voxels, or one int for cubes.
+        stride (int or tuple): Offset between tiles (default: `size`, i.e. no overlap).
+
+    Returns:
+        list: (index, origin, size) per tile, with index the (i, j, k) tile position and
+            origin the (x0, y0, z0) voxel offset.
+    """
+    size = _cube(size)
+    stride = size if stride is None else _cube(stride)
+    if any(s > n for s, n in zip(size, shape)):
+        raise ValueError(f"Tile size {size} exceeds the domain {tuple(shape)}")
+    starts = [range(0, n - s + 1, st) for n, s, st in zip(shape, size, stride)]
+    return [((i, j, k), (x0, y0, z0), size)
+            for k, z0 in enumerate(starts[2]) for j, y0 in enumerate(starts[1]) for i, x0 in enumerate(starts[0])]
+
+def concentric_boxes(shape: tuple, sizes=None) -> list:
+    """
+    Growing cubes centred in the domain, for REV curves.
+
+    Parameters:
+        shape (tuple): Domain dimensions (nx, ny, nz).
+        sizes (list): Cube edge lengths in voxels (default: 32, 64, ... up to the smallest dimension).
+
+    Returns:
+        list: (index, origin, size) per cube, with index (n, 0, 0) for the n-th size.
+    """
+    smallest = min(shape)
+    if sizes is None:
+        sizes = [s for s in 2 ** np.arange(5, 16) if s < smallest] + [smallest]
+    boxes = []
+    for n, edge in enumerate(sorted(int(s) for s in sizes)):
+        if edge > smallest:
+            raise ValueError(f"Cube size {edge} exceeds the smallest domain dimension {smallest}")
+        origin = tuple((d - edge) // 2 for d in shape)
+        boxes.append(((n, 0, 0), origin, (edge, edge, edge)))
+    return boxes
+
+def _rev_table(tiles: pd.DataFrame) -> pd.DataFrame:
+    """Porosity and permeability statistics per subvolume size, with the change from the previous size."""
+    rows = []
+    for (_, size), group in tiles.groupby(["voxels", "size"], sort=True):
+        k = group["permeability_m2"].astype(float)
+        phi = group["porosity"].astype(float)
+        rows.append({
+            "size": size,
+            "n_tiles": len(group),
+            "n_solved": int(k.notna().sum()),
+            "porosity_mean": phi.mean(),
+            "porosity_std": phi.std(),
+            "permeability_mean_m2": k.mean(),
+            "permeability_std_m2": k.std(),
+            "permeability_cv": k.std() / k.mean() if k.mean() else np.nan,
+        })
+    table = pd.DataFrame(rows)
+    if not table.empty:
+        table["porosity_change"] = table["porosity_mean"].pct_change().abs()
+        table["permeability_change"] = table["permeability_mean_m2"].pct_change().abs()
+    return table
+
+def _field_map(group: pd.DataFrame, column: str) -> np.ndarray:
+    """Tile values arranged as a (nk, nj, ni) array, matching the (z, y, x) voxel order."""
+    ni, nj, nk = (group[c].max() + 1 for c in ("i", "j", "k"))
+    field = np.full((nk, nj, ni), np.nan)
+    field[group["k"], group["j"], group["i"]] = group[column].astype(float)
+    return field
+
+def run_rev(vti_path, work_dir: str, sizes=None, mode: str = "tiles", stride=None, core_budget: int = None,
+            template_dir: str = ".", params: dict = None) -> dict:
+    """
+    Solve many subvolumes of a large sample in parallel and build field maps and an REV table.
+
+    Every subvolume is written to its own case directory as tile.npy and runs
+    through run_case (STL, generate_* dictionaries and the solve) on a
+    core-budgeted process pool, exactly like run_batch. Tiles that do not
+    percolate along the flow axis (params['flow_axis']) are not solved and get
+    zero permeability.
+
+    Parameters:
+        vti_path (str or VoxelVolume): The full sample.
+        work_dir (str): Directory receiving one case per subvolume, rev_tiles.csv,
+            rev_table.csv and rev_field_maps.npz.
+        sizes: Tile size(s) in voxels; an int, a (nx, ny, nz) tuple or a list of them. In
+            "concentric" mode, the cube edge lengths (default: doubling from 32).
+        mode (str): "tiles" for a grid of subvolumes per size, "concentric" for growing
+            cubes around the domain centre.
+        stride (int or tuple): Offset between tiles in "tiles" mode (default: no overlap).
+        core_budget (int): Total cores to use at once (default: all cores).
+        template_dir (str): Case whose system/, constant/ and 0/ are cloned for every tile.
+        params (dict): Parameters for every tile (see batch.DEFAULT_PARAMS), e.g. {"solver": "stokes"}.
+
+    Returns:
+        dict: 'tiles' (DataFrame, one row per subvolume), 'rev' (DataFrame, one row per size)
+            and 'field_maps' ({size: {"porosity": array, "permeability_m2": array}}, tiles mode only).
+    """
+    if mode not in ("tiles", "concentric"):
+        raise ValueError(f"Unsupported REV mode: {mode}")
+    volume = as_volume(vti_path)
+    core_budget = core_budget or os.cpu_count()
+    work_dir = os.path.abspath(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    stem = os.path.splitext(os.path.basename(volume.path or "volume"))[0]
+
+    if mode == "concentric":
+        boxes = concentric_boxes(volume.shape, sizes)
+    else:
+        if sizes is None:
+            raise ValueError("Tiles mode needs the tile size(s)")
+        if not isinstance(sizes, list):
+            sizes = [sizes]
+        boxes = [box for size in sizes for box in tile_boxes(volume.shape, size, stride)]
+
+    rows, solved, jobs = [], [], []
+    for index, origin, size in boxes:
+        (x0, y0, z0), (nx, ny, nz) = origin, size
+        label = "x".join(map(str, size)) if len(set(size)) > 1 else str(size[0])
+        case_dir = os.path.join(work_dir, f"{stem}_{label}_{index[0]:03d}_{index[1]:03d}_{index[2]:03d}")
+        os.makedirs(case_dir, exist_ok=True)
+        tile = np.ascontiguousarray(volume.array[z0:z0 + nz, y0:y0 + ny, x0:x0 + nx])
+        tile_path = os.path.join(case_dir, "tile.npy")
+        np.save(tile_path, tile)
+        row = {"case": os.path.basename(case_dir), "size": label, "voxels": nx * ny * nz,
+               "i": index[0], "j": index[1], "k": index[2], "x0": x0, "y0": y0, "z0": z0, "nx": nx, "ny": ny, "nz": nz}
+        rows.append(row)
+        _, report = percolating_volume(VoxelVolume.from_array(tile), axis=params["flow_axis"],
+                                       require_percolation=False)
+        if report["percolates"]:
+            solved.append(row)
+            jobs.append({"vti_path": tile_path, "case_dir": case_dir, "params": params,
+                         "template_dir": os.path.abspath(template_dir)})
+        else:
+            row.update(status="no_percolation", porosity=float(np.count_nonzero(tile > 0)) / tile.size,
+                       permeability_m2=0.0, permeability_mD=0.0)
+        del tile
+    print(f"REV ({mode}): {len(boxes)} subvolumes, {len(jobs)} percolating, solving on {core_budget} cores")
+
+    for row, result in zip(solved, schedule(jobs, core_budget, worker=run_case) if jobs else []):
+        row.update({k: v for k, v in result.items() if k not in row})
+    tiles = pd.DataFrame(rows)
+
+    rev = _rev_table(tiles)
+    field_maps = {}
+    if mode == "tiles":
+        for size, group in tiles.groupby("size"):
+            field_maps[size] = {c: _field_map(group, c) for c in ("porosity", "permeability_m2")}
+        np.savez(os.path.join(work_dir, "rev_field_maps.npz"),
+                 **{f"{c}_{size}": field for size, maps in field_maps.items() for c, field in maps.items()})
+
+    tiles.to_csv(os.path.join(work_dir, "rev_tiles.csv"), index=False)
+    rev.to_csv(os.path.join(work_dir, "rev_table.csv"), index=False)
+    print(f"Wrote REV results for {len(tiles)} subvolumes to {work_dir}")
+    return {"tiles": tiles, "rev": rev, "field_maps": field_maps}
@@ -1,48 +1,167 @@
+import os
+import glob
+import shutil
 import subprocess
 import re
 import csv
 import sys
+import gzip
+import time
+import contextlib
+import collections
+from .gen_decomposeParDict import generate_decomposeParDict
+from .convergence import set_stop_at
+from .profiling import Profiler, IterationCounter, mesh_size
 
-def _run(cmd, cwd=None):
-    """Run a shell command, streaming its output to stdout/stderr and return combined output."""
-    print(f"\n>>> {cmd}\n")
+_TIME = re.compile(r"^Time\s*=\s*([\dEe+\.-]+)")
+_AREA = re.compile(r"total area\s*=\s*([\dEe+\.-]+)")
+
+# Console echo of subprocess output: the first lines in full, then at most one line per interval
+CONSOLE_HEAD_LINES = 40
+CONSOLE_INTERVAL = 10.0  # [s]
+TAIL_LINES = 100         # last output lines kept in memory (printed when a command fails)
+
+# Phases of run_simplefoam, in order
+PHASES = ("mesh", "solve", "post")
+
+class _Console:
+    """Echo streamed output: the first `head` lines, then at most one line every `interval` seconds."""
+
+    def __init__(self, head: int = CONSOLE_HEAD_LINES, interval: float = CONSOLE_INTERVAL):
+        self.head = head
+        self.interval = interval
+        self.lines = 0
+        self.skipped = 0
+        self._next = 0.0
+
+    def __call__(self, line):
+        self.lines += 1
+        now = time.monotonic()
+        if self.lines > self.head and now < self._next:
+            self.skipped += 1
+            return
+        if self.skipped:
+            print(f"[... {self.skipped} lines ...]")
+            self.skipped = 0
+        print(line, end='')
+        if self.lines > self.head:
+            self._next = now + self.interval
+
+def _run(cmd, cwd=None, on_line=None, log_path=None, tail: int = TAIL_LINES):
+    """Run a shell command, streaming its output, and return the last `tail` lines.
+
+    Memory stays bounded however long the command runs: the full output goes
+    line by line to the gzipped `log_path` (if given), the console echo is
+    throttled (see _Console), and only the last `tail` lines are kept, which are
+    printed if the command fails. If given, `on_line` is called with every
+    output line as it arrives, e.g. to parse values incrementally.
+    """
+    print(f"\n>>> {cmd}\n" + (f"    (full output: {log_path})\n" if log_path else ""))
     p = subprocess.Popen(cmd, shell=True,
                          cwd=cwd,
                          stdout=subprocess.PIPE,
                          stderr=subprocess.STDOUT,
-                         text=True,)
-    output = []
-    for line in p.stdout:
-        print(line, end='')
-        output.append(line)
+                         text=True, errors='replace')
+    console = _Console()
+    last = collections.deque(maxlen=tail)
+    # Fast compression: the logs are written at solver speed and rarely read
+    log = gzip.open(log_path, 'wt', compresslevel=1) if log_path else contextlib.nullcontext()
+    with log:
+        for line in p.stdout:
+            if log_path:
+                log.write(line)
+            console(line)
+            last.append(line)
+            if on_line is not None:
+                on_line(line)
     p.wait()
     if p.returncode != 0:
+        if console.skipped:
+            print(f"[... {console.skipped} lines ...]")
+        print("".join(last), end='')
         sys.exit(f"Command failed (code {p.returncode}): {cmd}")
-    return ''.join(output)
+    return ''.join(last)
 
-def _extract_flow_rates(text, patch_name):
+class _FlowRateParser:
     """
-    Parse postProcess output for flowRatePatch(name=patch_name),
-    returning list of (time, flowRate) across all time steps.
+    Parse streamed postProcess output of flowRatePatch(name=patch_name) line by line.
+
+    Attributes:
+        rates (list): (time, flowRate) for every time step.
+        area (float): The first 'total area = <value>' of the patch's
+            flowRatePatch block (at T=0), or None.
     """
-    times = re.findall(r"^Time\s*=\s*([\dEe+\.-]+)", text, re.MULTILINE)
-    pattern = rf"sum\({re.escape(patch_name)}\) of phi\s*=\s*([\dEe+\.-]+)"
-    rates  = re.findall(pattern, text)
-    if len(times) != len(rates):
-        print(f"Warning: {len(times)} times vs {len(rates)} rates for '{patch_name}'")
-    n = min(len(times), len(rates))
-    return [(float(times[i]), float(rates[i])) for i in range(n)]
-
-def _extract_patch_area_from_flow(text, patch_name):
+
+    def __init__(self, patch_name):
+        self.rates = []
+        self.area = None
+        self._time = None
+        self._in_block = False
+        self._header = re.compile(rf"surfaceFieldValue\s+flowRatePatch\(name={re.escape(patch_name)}\)")
+        self._rate = re.compile(rf"sum\({re.escape(patch_name)}\) of phi\s*=\s*([\dEe+\.-]+)")
+        self.patch_name = patch_name
+
+    def __call__(self, line):
+        m = _TIME.match(line)
+        if m:
+            self._time = float(m.group(1))
+            return
+        if self.area is None:
+            if self._header.search(line):
+                self._in_block = True
+            elif self._in_block:
+                m = _AREA.search(line)
+                if m:
+                    self.area = float(m.group(1))
+        m = self._rate.search(line)
+        if m:
+            if self._time is None:
+                print(f"Warning: flow rate for '{self.patch_name}' before the first time step")
+                return
+            self.rates.append((self._time, float(m.group(1))))
+
+    def result(self):
+        """(rates, area), exiting if the patch area was not found."""
+        if self.area is None:
+            sys.exit(f"Could not parse 'total area' for patch '{self.patch_name}'")
+        return self.rates, self.area
+
+def read_surface_field_value(file_path):
     """
-    Parse the flowRatePatch output block for this patch, grabbing
-    the first 'total area    = <value>' line (at T=0).
+    Read a surfaceFieldValue.dat file written by a function object.
+
+    Returns:
+        tuple: (data, area) with data as a list of (time, value) and the patch area
+            from the '# Area' header line (None if the header has no area).
     """
-    pattern = rf"surfaceFieldValue\s+flowRatePatch\(name={re.escape(patch_name)}\)[\s\S]*?total area\s*=\s*([\dEe+\.-]+)"
-    m = re.search(pattern, text)
-    if not m:
-        sys.exit(f"Could not parse 'total area' for patch '{patch_name}'")
-    return float(m.group(1))
+    data, area = [], None
+    with open(file_path) as f:
+        for line in f:
+            if line.startswith("#"):
+                m = re.match(r"#\s*Area\s*:\s*([\dEe+\.-]+)", line)
+                if m:
+                    area = float(m.group(1))
+                continue
+            fields = line.split()
+            if len(fields) >= 2:  # the first row of a postProcess run has no value yet
+                data.append((float(fields[0]), float(fields[1])))
+    return data, area
+
+def _function_object_flow_rates(basedir, patch_name):
+    """
+    Collect (time, flowRate) and the patch area from postProcessing/flowRate_<patch>/,
+    across restarts (one sub-directory per start time). Returns None if the case
+    was run without flux function objects.
+    """
+    files = glob.glob(os.path.join(basedir, "postProcessing", f"flowRate_{patch_name}", "*", "surfaceFieldValue*.dat"))
+    if not files:
+        return None
+    data, area = {}, None
+    for path in sorted(files, key=lambda p: float(os.path.basename(os.path.dirname(p)))):
+        rows, file_area = read_surface_field_value(path)
+        data.update(rows)
+        area = file_area if file_area is not None else area
+    return sorted(data.items()), area
 
 def _write_csv(filename, data, area):
     """Write list of (time, rate) to CSV file with an area column."""
@@ -53,23 +172,210 @@ def _write_csv(filename, data, area):
             writer.writerow([t, q, area])
     print(f"Wrote {len(data)} records with area={area:g} to {filename}")
 
-def run_simplefoam(basedir, scale: float = 1e-6):
-    _run("blockMesh", cwd=basedir)
-    _run("snappyHexMesh -overwrite", cwd=basedir)
-    _run(f'transformPoints -scale "({scale} {scale} {scale})"', cwd=basedir)
+def _restore_initial_fields(basedir):
+    """Copy the generated 0/ fields over processor*/0, replacing fields mapped from the background mesh."""
+    src = os.path.join(basedir, "0")
+    for proc in sorted(glob.glob(os.path.join(basedir, "processor*"))):
+        for field in ("U", "p", "Phi"):
+            if os.path.exists(os.path.join(src, field)):
+                shutil.copy(os.path.join(src, field), os.path.join(proc, "0", field))
+
+def seed_pressure_from_potential(basedir):
+    """
+    Replace the uniform internal field of 0/p by the potential Phi written by
+    `potentialFoam -writePhi`, scaled so that it matches the fixed inlet pressure.
+
+    Phi is harmonic with fixed values on inlet and outlet and zero gradient on the
+    walls, i.e. the pressure of a Darcy-like flow through the pore space, which is
+    much closer to the Stokes pressure than a uniform field. Returns False (and
+    leaves p alone) if p has no uniform internal field or cannot be rewritten as ascii.
+    """
+    import numpy as np
+    from .foam_reader import read_field
+    p_path = os.path.join(basedir, "0", "p")
+    if os.path.exists(p_path + ".gz"):
+        with gzip.open(p_path + ".gz", 'rt', errors='replace') as f:
+            text = f.read()
+    else:
+        with open(p_path) as f:
+            text = f.read()
+    binary = re.search(r"format\s+binary\s*;", text) is not None
+    if not re.search(r"internalField\s+uniform\s+[^;]*;", text) or (binary and "nonuniform" in text):
+        print("Pressure not seeded from the potential: 0/p has no plain uniform internal field")
+        return False
+
+    Phi = read_field(basedir, "Phi", time="0")
+    phi_inlet = float(np.mean(Phi.patch_values("inlet", 1)))
+    p_inlet = float(np.mean(read_field(basedir, "p", time="0").patch_values("inlet", 1)))
+    if phi_inlet == 0:
+        print("Pressure not seeded from the potential: Phi is 0 on the inlet")
+        return False
+    values = Phi.values() * (p_inlet / phi_inlet)
+    field = f"internalField   nonuniform List<scalar>\n{len(values)}\n(\n" + \
+        "\n".join(f"{v:.6g}" for v in values) + "\n)\n;"
+    text = re.sub(r"internalField\s+uniform\s+[^;]*;", lambda m: field, text, count=1)
+    text = re.sub(r"format\s+binary\s*;", "format      ascii;", text, count=1)
+    with open(p_path, 'w') as f:
+        f.write(text)
+    if os.path.exists(p_path + ".gz"):
+        os.remove(p_path + ".gz")
+    print(f"Seeded p from the potential flow: {len(values)} cells, {values.min():.4g} to {values.max():.4g}")
+    return True
+
+def _tee(*callbacks):
+    """Combine line callbacks, skipping None."""
+    callbacks = [c for c in callbacks if c is not None]
+    def on_line(line):
+        for c in callbacks:
+            c(line)
+    return on_line
+
+def run_simplefoam(basedir, scale: float = 1e-6, mesher: str = "snappy", n_procs: int = 1, shape: tuple = None,
+                   monitor=None, profiler=None, mesh_cache=None, mesh_key: str = None, map_fields_from: str = None,
+                   potential_init: bool = False, phases=PHASES):
+    """
+    Mesh the case, run simpleFoam and write inlet/outlet fluxes to q_in.csv/q_out.csv.
+
+    `phases` selects a subset of "mesh" (meshing, decomposition and mesh cache),
+    "solve" (field initialisation and simpleFoam) and "post" (fluxes, reconstruction
+    and the q_*.csv files), e.g. to run them as separate cluster jobs; later phases
+    expect the earlier ones to have run on the case with the same arguments.
+
+    With mesher="snappy" the mesh is built by blockMesh + snappyHexMesh and scaled
+    by transformPoints. With mesher="voxel" the meshing stages are skipped and the
+    constant/polyMesh written by write_voxel_polyMesh (already scaled) is used.
+
+    With n_procs > 1 a decomposeParDict is generated (method chosen from `shape`,
+    see generate_decomposeParDict), snappyHexMesh, transformPoints, simpleFoam and
+    the flux post-processing run under `mpirun -np n_procs ... -parallel`, and only
+    the mesh (right after meshing) and the final time are reconstructed.
+
+    A ConvergenceMonitor passed as `monitor` watches the simpleFoam log and stops
+    the solver early once the flux has converged.
+
+    If the controlDict has the flux function objects (generate_controlDict with
+    flux_functions=True), the fluxes are read from postProcessing/flowRate_*/
+    and the two postProcess passes are skipped.
+
+    With a MeshCache and the key of this mesh (see MeshCache.key), a cached mesh is
+    restored and all meshing stages are skipped; otherwise the finished mesh is
+    stored in the cache for the next run with the same volume and mesh parameters.
+
+    With `map_fields_from` (a finished case of the same geometry, e.g. on a coarser
+    mesh), its latest p and U are interpolated onto this mesh by mapFields after
+    meshing, so simpleFoam starts from that solution instead of the 0/ fields.
+    Otherwise, with `potential_init`, potentialFoam seeds U (and phi) with a
+    potential-flow solution driven by the 0/Phi boundary values (see
+    generate_potential_field) and, in serial runs, p from the same potential (see
+    seed_pressure_from_potential); the fvSolution needs a Phi solver and a
+    potentialFlow dictionary (generate_fvSolution writes both).
+
+    The output of every OpenFOAM command is written to a gzipped log per stage
+    (log.blockMesh.gz, log.simpleFoam.gz, ...) and parsed as it streams; the
+    console only gets a throttled echo (see _run), so memory stays flat on long runs.
+
+    Every stage is timed by a Profiler (pass one to include earlier stages such as
+    vti_to_stl); the profile is written to profile.json/profile.csv in `basedir`.
+    """
+    if not phases or set(phases) - set(PHASES):
+        raise ValueError(f"Unsupported phases: {phases}")
+    parallel = n_procs > 1
+    mpi = f"mpirun -np {n_procs} " if parallel else ""
+    par = " -parallel" if parallel else ""
+    if profiler is None:
+        profiler = Profiler(os.path.basename(os.path.abspath(basedir)))
+
+    def step(name, cmd, on_line=None, meshing=False):
+        with profiler.stage(name) as record:
+            output = _run(cmd, cwd=basedir, on_line=on_line, log_path=os.path.join(basedir, f"log.{name}.gz"))
+            if meshing:
+                record["cells"] = mesh_size(basedir)[0]
+        return output
+
+    def store_mesh():
+        if mesh_cache is not None and mesh_key is not None:
+            mesh_cache.store(mesh_key, basedir, params={"mesher": mesher, "scale": scale, "case": os.path.abspath(basedir)})
+
+    try:
+        if parallel:
+            generate_decomposeParDict(os.path.join(basedir, "system", "decomposeParDict"), n_procs, shape=shape)
+
+        if "mesh" in phases:
+            cached = False
+            if mesh_cache is not None and mesh_key is not None:
+                with profiler.stage("mesh_cache_restore") as record:
+                    cached = mesh_cache.restore(mesh_key, basedir)
+                    record["hit"] = cached
+
+            if cached:
+                if parallel:
+                    step("decomposePar", "decomposePar -force")
+            elif mesher.lower() == "snappy":
+                step("blockMesh", "blockMesh", meshing=True)
+                if parallel:
+                    step("decomposePar", "decomposePar -force")
+                step("snappyHexMesh", f"{mpi}snappyHexMesh -overwrite{par}", meshing=True)
+                step("transformPoints", f'{mpi}transformPoints{par} -scale "({scale} {scale} {scale})"')
+                if parallel:
+                    _restore_initial_fields(basedir)
+                    step("reconstructParMesh", "reconstructParMesh -constant")
+                store_mesh()
+            elif mesher.lower() == "voxel":
+                if not glob.glob(os.path.join(basedir, "constant", "polyMesh", "faces*")):
+                    sys.exit("No constant/polyMesh found; "
+                             "call write_voxel_polyMesh before run_simplefoam(mesher='voxel')")
+                store_mesh()
+                if parallel:
+                    step("decomposePar", "decomposePar -force")
+            else:
+                raise ValueError(f"Unsupported mesher: {mesher}")
+
+        if "solve" in phases:
+            if map_fields_from is not None:
+                target = " -parallelTarget" if parallel else ""
+                step("mapFields",
+                     f"mapFields {os.path.abspath(map_fields_from)} -consistent -sourceTime latestTime{target}")
+            elif potential_init:
+                if not os.path.exists(os.path.join(basedir, "0", "Phi")):
+                    sys.exit("No 0/Phi found; call generate_potential_field before run_simplefoam(potential_init=True)")
+                step("potentialFoam", f"{mpi}potentialFoam{par} -writePhi")
+                if not parallel:
+                    seed_pressure_from_potential(basedir)
+
+            counter = IterationCounter()
+            with profiler.stage("simpleFoam") as record:
+                _run(f"{mpi}simpleFoam{par}", cwd=basedir, on_line=_tee(counter, monitor),
+                     log_path=os.path.join(basedir, "log.simpleFoam.gz"))
+                record["iterations"] = counter.iterations
+                record["cells"] = mesh_size(basedir)[0]
+            if monitor is not None and monitor.converged:
+                set_stop_at(basedir, "endTime")
+
+        if "post" not in phases:
+            return
 
-    _run("simpleFoam", cwd=basedir)
+        # Fluxes from the flowRate_* function objects of generate_controlDict(flux_functions=True)
+        # are already on disk; otherwise re-read every time directory with postProcess
+        inlet = _function_object_flow_rates(basedir, "inlet")
+        outlet = _function_object_flow_rates(basedir, "outlet")
+        if inlet is None or outlet is None:
+            parse_in, parse_out = _FlowRateParser("inlet"), _FlowRateParser("outlet")
+            step("postProcess_inlet", f"{mpi}postProcess{par} -func 'flowRatePatch(name=inlet)'", on_line=parse_in)
+            step("postProcess_outlet", f"{mpi}postProcess{par} -func 'flowRatePatch(name=outlet)'", on_line=parse_out)
+            inlet, outlet = parse_in.result(), parse_out.result()
+        elif inlet[1] is None or outlet[1] is None:
+            sys.exit("Could not read patch areas from the flowRate_* surfaceFieldValue headers")
 
-    out_in  = _run("postProcess -func 'flowRatePatch(name=inlet)'",  cwd=basedir)
-    out_out = _run("postProcess -func 'flowRatePatch(name=outlet)'", cwd=basedir)
+        if parallel:
+            step("reconstructPar", "reconstructPar -latestTime")
+    finally:
+        profiler.write(basedir)
 
-    inlet_data   = _extract_flow_rates(out_in,  'inlet')
-    outlet_data  = _extract_flow_rates(out_out, 'outlet')
-    area_inlet   = _extract_patch_area_from_flow(out_in,  'inlet')
-    area_outlet  = _extract_patch_area_from_flow(out_out, 'outlet')
+    inlet_data, area_inlet = inlet
+    outlet_data, area_outlet = outlet
 
-    _write_csv("q_in.csv",  inlet_data,  area_inlet)
-    _write_csv("q_out.csv", outlet_data, area_outlet)
+    _write_csv(os.path.join(basedir, "q_in.csv"),  inlet_data,  area_inlet)
+    _write_csv(os.path.join(basedir, "q_out.csv"), outlet_data, area_outlet)
 
     print("\n--- inlet fluxes ---")
     for t, q in inlet_data:
@@ -0,0 +1,245 @@
+import time
+import inspect
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from .percolation import percolating_volume
+from .permeability import darcy_permeability, M2_TO_MD
+from .voxel_volume import as_volume
+from .profiling import Profiler
+
+# Marker for face positions outside the domain in the padded face-index grids
+_OUTSIDE = -2
+# SciPy < 1.12 calls the relative tolerance of its Krylov solvers `tol`
+_RTOL = "rtol" if "rtol" in inspect.signature(spla.minres).parameters else "tol"
+
+def _shifted(array, d, lo):
+    """View of a (padded along d) array for the low (lo=True) or high cell of every face along array axis d."""
+    sl = [slice(None)] * 3
+    n = array.shape[d] - 1
+    sl[d] = slice(0, n) if lo else slice(1, n + 1)
+    return array[tuple(sl)]
+
+def _assemble(pore, axis=0, wall_sides=False):
+    """
+    Assemble the staggered-grid Stokes system on the pore voxels (nondimensional: h = mu = 1, dp = 1).
+
+    Velocities live on the voxel faces, pressures at the pore voxel centres. The
+    system [[A, G], [G^T, 0]] [u, p] = [b, 0] is symmetric: A is the (SPD) viscous
+    operator, G the pressure gradient and G^T the continuity equation, all
+    integrated over the control volumes. Inlet/outlet faces use a half control
+    volume, so the fixed pressure sits exactly on the boundary and velocity is
+    zeroGradient there, as in the OpenFOAM case.
+
+    Returns:
+        tuple: (A, G, b, faces, cell_id) where `faces` lists, per velocity component,
+            (face_index_grid, offset) and 'inlet'/'outlet' hold the indices of the
+            boundary faces of the flow axis.
+    """
+    n_cells = int(np.count_nonzero(pore))
+    cell_id = np.full(pore.shape, -1, dtype=np.int64)
+    cell_id[pore] = np.arange(n_cells)
+    flow_d = 2 - axis  # array axes are (z, y, x)
+
+    rows, cols, vals = [], [], []
+    g_rows, g_cols, g_vals = [], [], []
+    b_parts = []
+    faces = {"grids": [], "inlet": None, "outlet": None}
+    offset = 0
+    for component in range(3):
+        d = 2 - component  # faces normal to this component are planes along array axis d
+        n = pore.shape[d]
+        pad = [(0, 0)] * 3
+        pad[d] = (1, 1)
+        padded_pore = np.pad(pore, pad)
+        padded_cell = np.pad(cell_id, pad, constant_values=-1)
+        low, high = _shifted(padded_pore, d, True), _shifted(padded_pore, d, False)
+        plane = np.arange(n + 1).reshape([-1 if a == d else 1 for a in range(3)])
+        boundary = np.broadcast_to((plane == 0) | (plane == n), low.shape)
+
+        # Faces between two pore voxels carry a velocity; so do the inlet/outlet faces of a
+        # pore voxel. Faces touching a solid voxel or a side of the domain have u = 0.
+        active = low & high
+        if d == flow_d:
+            active |= boundary & (low | high)
+        all_solid = ~(low | high)
+
+        n_active = int(np.count_nonzero(active))
+        face_id = np.full(active.shape, -1, dtype=np.int64)
+        face_id[active] = np.arange(n_active) + offset
+        faces["grids"].append((face_id, offset))
+        index = np.argwhere(active)
+        ids = face_id[active]
+        on_boundary = boundary[active]
+
+        padded_id = np.pad(face_id, 1, constant_values=_OUTSIDE)
+        padded_solid = np.pad(all_solid, 1, constant_values=False)
+        diag = np.zeros(n_active)
+        for e in range(3):
+            # Inlet/outlet faces own half a control volume, so their transverse fluxes are halved
+            weight = np.ones(n_active) if e == d else np.where(on_boundary, 0.5, 1.0)
+            for step in (-1, 1):
+                nb = index + 1
+                nb[:, e] += step
+                nb_id = padded_id[nb[:, 0], nb[:, 1], nb[:, 2]]
+                coupled = nb_id >= 0
+                diag += weight * coupled
+                rows.append(ids[coupled])
+                cols.append(nb_id[coupled])
+                vals.append(-weight[coupled])
+                inactive = nb_id == -1
+                if e == d:
+                    # Blocked face one spacing away (u = 0); zeroGradient beyond inlet/outlet
+                    diag += weight * inactive
+                else:
+                    # Solid voxel half a spacing away (ghost value -u), or a blocked face one spacing away
+                    nb_solid = padded_solid[nb[:, 0], nb[:, 1], nb[:, 2]]
+                    diag += weight * inactive * np.where(nb_solid, 2, 1)
+                    if wall_sides and e != flow_d:
+                        diag += 2 * weight * (nb_id == _OUTSIDE)
+        rows.append(ids)
+        cols.append(ids)
+        vals.append(diag)
+
+        # Pressure gradient across each face (and its transpose, the continuity equation)
+        low_cell = _shifted(padded_cell, d, True)[active]
+        high_cell = _shifted(padded_cell, d, False)[active]
+        for cell, sign in ((low_cell, -1.0), (high_cell, 1.0)):
+            has = cell >= 0
+            g_rows.append(ids[has])
+            g_cols.append(cell[has])
+            g_vals.append(np.full(int(np.count_nonzero(has)), sign))
+        b = np.zeros(n_active)
+        if d == flow_d:
+            inlet = index[:, d] == 0
+            b[inlet] = 1.0  # p = 1 on the inlet, p = 0 on the outlet
+            faces["inlet"] = ids[inlet]
+            faces["outlet"] = ids[index[:, d] == n]
+        b_parts.append(b)
+        offset += n_active
+
+    A = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(offset, offset))
+    G = sp.csr_matrix((np.concatenate(g_vals), (np.concatenate(g_rows), np.concatenate(g_cols))),
+                      shape=(offset, n_cells))
+    return A, G, np.concatenate(b_parts), faces, cell_id
+
+def _preconditioner(A, G):
+    """
+    Block-diagonal SPD preconditioner for MINRES: Jacobi on the velocity block and
+    an approximate inverse of the pressure Schur complement G^T diag(A)^-1 G.
+
+    The pressure block uses an algebraic multigrid V-cycle when pyamg is installed
+    (iteration counts then barely grow with sample length) and Jacobi otherwise.
+    """
+    inv_diag = 1.0 / A.diagonal()
+    schur = (G.T @ sp.diags(inv_diag) @ G).tocsr()
+    try:
+        import pyamg
+        schur_inv = pyamg.smoothed_aggregation_solver(schur, symmetry='symmetric').aspreconditioner(cycle='V')
+        kind = "AMG"
+    except ImportError:
+        schur_inv = sp.diags(1.0 / schur.diagonal())
+        kind = "Jacobi (install pyamg for faster convergence)"
+    n_u = A.shape[0]
+
+    def apply(x):
+        return np.concatenate([inv_diag * x[:n_u], schur_inv @ x[n_u:]])
+
+    return spla.LinearOperator((n_u + G.shape[1],) * 2, matvec=apply), kind
+
+def solve_stokes(vti_path, axis: int = 0, scale: float = 1e-6, dp: float = 1.0, mu: float = 1e-3,
+                 boundary: str = "symmetryPlane", rtol: float = 1e-6, maxiter: int = 20000,
+                 fields: bool = False, profiler=None) -> dict:
+    """
+    Solve steady Stokes flow on the pore voxels and return flux and permeability, without OpenFOAM.
+
+    A finite-volume discretisation on a staggered (MAC) grid with one cell per
+    voxel, matching write_voxel_polyMesh: fixed pressure `dp` on the inlet and 0
+    on the outlet with zeroGradient velocity, no-slip on solid voxels, and
+    symmetryPlane or wall (noSlip) side patches as in generate_pressure_field /
+    generate_velocity_field. Pore clusters that do not connect inlet and outlet
+    are removed first. The saddle-point system is solved with preconditioned MINRES.
+
+    Parameters:
+        vti_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
+        axis (int): Flow direction (0 = x, 1 = y, 2 = z).
+        scale (float): Voxel size [m].
+        dp (float): Pressure difference between inlet and outlet [Pa].
+        mu (float): Dynamic viscosity [Pa s].
+        boundary (str): "symmetryPlane" or "Wall" for the side patches.
+        rtol (float): Relative residual tolerance of MINRES.
+        maxiter (int): Maximum number of MINRES iterations.
+        fields (bool): If True, also return cell-centred pressure 'p' (nz, ny, nx) and
+            velocity 'U' (nz, ny, nx, 3), NaN in solid and removed voxels.
+        profiler (Profiler): Optional profiler receiving the 'stokes_assemble' and 'stokes_solve' stages.
+
+    Returns:
+        dict: 'flow_rate' [m^3/s] through the outlet, 'flow_rate_inlet', 'permeability_m2',
+            'permeability_mD', 'porosity', 'pore_cells', 'unknowns', 'iterations' and 'converged'.
+    """
+    if boundary.lower() == "symmetryplane":
+        wall_sides = False
+    elif boundary.lower() == "wall":
+        wall_sides = True
+    else:
+        raise ValueError(f"Unsupported boundary type: {boundary}")
+    profiler = profiler or Profiler()
+    volume = as_volume(vti_path)
+    shape = volume.shape
+
+    with profiler.stage("stokes_assemble", voxels=volume.size) as record:
+        connected, _ = percolating_volume(volume, axis=axis)
+        pore = np.asarray(connected.array) > 0
+        del connected
+        A, G, b, faces, cell_id = _assemble(pore, axis=axis, wall_sides=wall_sides)
+        n_u, n_p = G.shape
+        K = sp.bmat([[A, G], [G.T, None]], format='csr')
+        M, kind = _preconditioner(A, G)
+        record["cells"] = n_p
+
+    print(f"Stokes system: {n_p} pore cells, {n_u} face velocities, {kind} preconditioner")
+    iterations = [0]
+
+    def count(_):
+        iterations[0] += 1
+        if iterations[0] % 100 == 0:
+            print(f"MINRES iteration {iterations[0]}")
+
+    with profiler.stage("stokes_solve", cells=n_p) as record:
+        t0 = time.perf_counter()
+        x, info = spla.minres(K, np.concatenate([b, np.zeros(n_p)]), M=M, maxiter=maxiter, callback=count,
+                              **{_RTOL: rtol})
+        record["iterations"] = iterations[0]
+    if info != 0:
+        print(f"Warning: MINRES did not reach rtol={rtol} in {iterations[0]} iterations")
+
+    # Back to physical units: u = u* dp h / mu, p = p* dp, Q = Q* dp h^3 / mu
+    u_scale = dp * scale / mu
+    q_out = x[faces["outlet"]].sum() * u_scale * scale**2
+    q_in = x[faces["inlet"]].sum() * u_scale * scale**2
+    k = darcy_permeability(q_out, shape, scale, dp, mu, axis=axis)
+    result = {
+        "flow_rate": q_out,
+        "flow_rate_inlet": q_in,
+        "permeability_m2": k,
+        "permeability_mD": k * M2_TO_MD,
+        "porosity": float(np.count_nonzero(np.asarray(volume.array) > 0)) / volume.size,
+        "pore_cells": n_p,
+        "unknowns": n_u + n_p,
+        "iterations": iterations[0],
+        "converged": info == 0,
+    }
+    print(f"Stokes solve: {iterations[0]} iterations in {time.perf_counter() - t0:.1f} s, "
+          f"Q = {q_out:.6e} m^3/s, k = {k:.6e} m^2 ({result['permeability_mD']:.4g} mD)")
+
+    if fields:
+        p = np.full(pore.shape, np.nan)
+        p[pore] = x[n_u:][cell_id[pore]] * dp
+        U = np.full(pore.shape + (3,), np.nan)
+        for component, (face_id, _) in enumerate(faces["grids"]):
+            u_face = np.where(face_id >= 0, x[np.maximum(face_id, 0)], 0.0) * u_scale
+            d = 2 - component
+            U[..., component][pore] = (0.5 * (_shifted(u_face, d, True) + _shifted(u_face, d, False)))[pore]
+        result.update(p=p, U=U)
+    return result
@@ -0,0 +1,96 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from .voxel_volume import as_volume
+from .vti2stl import vti_to_stl
+from .permeability import M2_TO_MD
+from .batch import run_case, schedule, _plan_mesh, DEFAULT_PARAMS
+
+AXES = "xyz"
+
+def anisotropy_ratios(k: dict) -> dict:
+    """Ratios of the diagonal permeabilities {"x": k_xx, "y": k_yy, "z": k_zz}, NaN where undefined."""
+    def ratio(a, b):
+        return k[a] / k[b] if k.get(a) is not None and k.get(b) else float("nan")
+    values = [v for v in k.values() if v is not None]
+    return {
+        "ky/kx": ratio("y", "x"),
+        "kz/kx": ratio("z", "x"),
+        "kz/ky": ratio("z", "y"),
+        "kmax/kmin": max(values) / min(values) if values and min(values) > 0 else float("nan"),
+    }
+
+def run_tensor(vti_path, work_dir: str, params: dict = None, core_budget: int = None,
+               template_dir: str = ".", axes: str = AXES) -> dict:
+    """
+    Diagonal permeability tensor: one case per flow direction, all solved concurrently.
+
+    The voxel volume is loaded once and, for the snappy mesher with
+    params['percolation'] off, the surface is extracted once to work_dir/sample.stl
+    and linked into every case (otherwise each direction meshes the clusters that
+    percolate along it, so every case extracts its own surface). Each case
+    puts its inlet/outlet patches on the faces normal to its direction
+    (params['flow_axis'], see generate_blockMeshDict) and runs through run_case
+    on a core-budgeted process pool, exactly like run_batch.
+
+    Parameters:
+        vti_path (str or VoxelVolume): The sample.
+        work_dir (str): Directory receiving one case per direction (<stem>_x, ...),
+            tensor.csv and permeability_tensor.json.
+        params (dict): Parameters for every direction (see batch.DEFAULT_PARAMS), e.g.
+            {"n_procs": 4}, {"n_procs": "auto"} or {"solver": "stokes"}.
+        core_budget (int): Total cores to use at once (default: all cores).
+        template_dir (str): Case whose system/, constant/ and 0/ are cloned for every direction.
+        axes (str): Flow directions to solve, a subset of "xyz".
+
+    Returns:
+        dict: 'cases' (DataFrame, one row per direction), 'k_xx', 'k_yy', 'k_zz' [m^2]
+            (None if a direction failed), the same in mD, and 'anisotropy' (see anisotropy_ratios).
+    """
+    if not axes or set(axes) - set(AXES):
+        raise ValueError(f"Unsupported flow directions: {axes}")
+    volume = as_volume(vti_path)  # build the voxel cache once, before the workers share it
+    core_budget = core_budget or os.cpu_count()
+    work_dir = os.path.abspath(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    stem = os.path.splitext(os.path.basename(volume.path or "volume"))[0]
+    vti_file = volume.path
+    if vti_file is None:
+        vti_file = os.path.join(work_dir, "volume.npy")
+        np.save(vti_file, np.asarray(volume.array))
+
+    if params["n_procs"] == "auto":
+        params["n_procs"] = 1 if params["solver"] == "stokes" else \
+            _plan_mesh(volume, params, max_procs=max(1, core_budget // len(axes)))["n_procs"]
+
+    stl_path = None
+    if params["solver"] != "stokes" and params["mesher"] != "voxel" and not params["percolation"]:
+        stl_path = os.path.join(work_dir, "sample.stl")
+        vti_to_stl(volume, stl_path)
+
+    jobs = [{"vti_path": vti_file, "case_dir": os.path.join(work_dir, f"{stem}_{axis}"),
+             "params": {**params, "flow_axis": AXES.index(axis)}, "template_dir": os.path.abspath(template_dir),
+             "stl_path": stl_path} for axis in axes]
+    print(f"Permeability tensor: {len(jobs)} flow directions on {core_budget} cores in {work_dir}")
+    cases = pd.DataFrame(schedule(jobs, core_budget, worker=run_case))
+    cases.insert(1, "direction", list(axes))
+
+    k = {axis: (row["permeability_m2"] if row["status"] == "done" else None)
+         for axis, (_, row) in zip(axes, cases.iterrows())}
+    result = {"cases": cases}
+    for axis in AXES:
+        result[f"k_{axis}{axis}"] = k.get(axis)
+        result[f"k_{axis}{axis}_mD"] = k[axis] * M2_TO_MD if k.get(axis) is not None else None
+    result["anisotropy"] = anisotropy_ratios(k)
+
+    cases.to_csv(os.path.join(work_dir, "tensor.csv"), index=False)
+    with open(os.path.join(work_dir, "permeability_tensor.json"), 'w') as f:
+        json.dump({name: value for name, value in result.items() if name != "cases"}, f, indent=2)
+    for axis in axes:
+        value = result[f"k_{axis}{axis}_mD"]
+        print(f"k_{axis}{axis} = " + (f"{value:.5g} mD" if value is not None else "failed"))
+    print("Anisotropy: " + ", ".join(f"{name} = {value:.3g}" for name, value in result["anisotropy"].items()))
+    return result
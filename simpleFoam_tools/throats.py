@@ -0,0 +1,181 @@
+import os
+import math
+import numpy as np
+from scipy import ndimage
+
+from .voxel_volume import VoxelVolume, as_volume
+from .voxel_stl import extract_surface, write_binary_stl
+
+MAX_THROAT_LEVEL = 3   # deepest refinement level of a throat region
+MAX_BOXES = 100        # snappyHexMesh slows down with many searchableBox regions; use STL regions instead
+
+def _cell_size(factor_mesh) -> float:
+    """Edge of the coarsest background cell, in voxels."""
+    return max(1.0 / f for f in factor_mesh)
+
+def throat_mask(vti_path, min_cells: float = 4, factor_mesh: tuple = (1, 1, 1)):
+    """
+    Find the pore voxels narrower than `min_cells` background cells.
+
+    A pore voxel lies in a wide pore if a ball of diameter min_cells times the
+    background cell size, entirely inside the pore space, covers it (an exact
+    morphological opening from two Euclidean distance transforms); all other pore
+    voxels are narrow. The domain boundary is treated as open pore space.
+
+    Returns:
+        tuple: (narrow, wide, distance) with the (z, y, x) masks and the pore distance transform in voxels.
+    """
+    pore = as_volume(vti_path).array > 0
+    distance = ndimage.distance_transform_edt(pore).astype(np.float32)
+    radius = min_cells * _cell_size(factor_mesh) / 2
+    centres = distance > radius
+    if centres.any():
+        wide = ndimage.distance_transform_edt(~centres) <= radius
+    else:
+        wide = np.zeros_like(pore)
+    del centres
+    return pore & ~wide, wide, distance
+
+def _connections(labels, wide_labels, n_labels) -> np.ndarray:
+    """Number of distinct wide pores each narrow cluster touches (face neighbours)."""
+    pairs = [np.empty((0, 2), dtype=labels.dtype)]
+    for d in range(3):
+        head = [slice(None)] * 3
+        tail = [slice(None)] * 3
+        head[d], tail[d] = slice(None, -1), slice(1, None)
+        for a, b in ((labels[tuple(head)], wide_labels[tuple(tail)]),
+                     (labels[tuple(tail)], wide_labels[tuple(head)])):
+            touching = (a > 0) & (b > 0)
+            pairs.append(np.stack([a[touching], b[touching]], axis=1))
+    pairs = np.unique(np.concatenate(pairs), axis=0)
+    return np.bincount(pairs[:, 0], minlength=n_labels + 1)
+
+def find_throats(vti_path, min_cells: float = 4, factor_mesh: tuple = (1, 1, 1),
+                 max_level: int = MAX_THROAT_LEVEL, min_voxels: int = 8, flow_axis: int = 0):
+    """
+    Locate pore throats resolved by fewer than `min_cells` background cells across.
+
+    Narrow voxels (see throat_mask) are grouped into face-connected clusters. Clusters
+    touching exactly one wide pore are dead ends (wall roughness, the corners of
+    wide pores) and are not refined; throats join two or more wide pores. A cluster
+    touching no wide pore is a throat only if it is a fully narrow channel from the
+    inlet to the outlet face along `flow_axis`; otherwise it is a sealed pocket,
+    which snappyHexMesh drops anyway. Each throat gets the refinement level that gives
+    it about `min_cells` cells across its width (from its largest inscribed radius).
+
+    Parameters:
+        vti_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
+        min_cells (float): Cells wanted across every throat.
+        factor_mesh (tuple): (factor_mesh_x, factor_mesh_y, factor_mesh_z) of the background mesh.
+        max_level (int): Deepest refinement level assigned to a throat.
+        min_voxels (int): Smaller clusters are ignored.
+        flow_axis (int): Flow direction (0 = x, 1 = y, 2 = z) of the inlet and outlet faces.
+
+    Returns:
+        tuple: (throats, labels) with one dict per throat ('label', 'level', 'width' in
+            voxels, 'voxels', 'min' and 'max' voxel corners (x, y, z)) and the (z, y, x)
+            label array of the throats (0 elsewhere).
+    """
+    volume = as_volume(vti_path)
+    narrow, wide, distance = throat_mask(volume, min_cells, factor_mesh)
+    labels, n_labels = ndimage.label(narrow)
+    wide_labels = ndimage.label(wide)[0]
+    del narrow, wide
+    if n_labels == 0:
+        print(f"Throats narrower than {min_cells} cells: none")
+        return [], labels
+
+    connections = _connections(labels, wide_labels, n_labels)
+    del wide_labels
+    # Clusters without wide pores count only if they span inlet to outlet
+    d = 2 - flow_axis  # array axes are (z, y, x)
+    channels = np.zeros(n_labels + 1, dtype=bool)
+    channels[np.intersect1d(labels.take(0, axis=d), labels.take(-1, axis=d))] = True
+    channels[0] = False
+    index = np.arange(1, n_labels + 1)
+    voxels = ndimage.sum_labels(np.ones_like(labels, dtype=np.int32), labels, index).astype(int)
+    # The distance transform is measured from pore voxel centres to solid voxel centres,
+    # so the solid walls of a throat of largest distance r are 2 r apart
+    widths = 2 * ndimage.maximum(distance, labels, index)
+    h = _cell_size(factor_mesh)
+
+    throats = []
+    keep = np.zeros(n_labels + 1, dtype=bool)
+    for label, box in enumerate(ndimage.find_objects(labels), start=1):
+        if box is None or voxels[label - 1] < min_voxels:
+            continue
+        if connections[label] == 1 or (connections[label] == 0 and not channels[label]):
+            continue
+        width = float(widths[label - 1])
+        level = min(max(1, math.ceil(math.log2(min_cells * h / width))), max_level)
+        keep[label] = True
+        throats.append({"label": label, "level": level, "width": width, "voxels": int(voxels[label - 1]),
+                        "min": tuple(int(s.start) for s in box[::-1]),
+                        "max": tuple(int(s.stop) - 1 for s in box[::-1])})
+    labels[~keep[labels]] = 0
+
+    pore_voxels = int(np.count_nonzero(distance))
+    throat_voxels = sum(t["voxels"] for t in throats)
+    levels = sorted({t["level"] for t in throats})
+    print(f"Throats narrower than {min_cells} cells: {len(throats)} of {n_labels} narrow clusters, "
+          f"{throat_voxels / max(pore_voxels, 1):.2%} of pore space, levels {levels}")
+    return throats, labels
+
+def _padded_box(throat, pad, shape):
+    """Throat bounding box grown by `pad` voxels and clipped to the blockMesh domain [0, n-1]."""
+    lo = tuple(max(0, c - pad) for c in throat["min"])
+    hi = tuple(min(n - 1, c + pad) for c, n in zip(throat["max"], shape))
+    return lo, hi
+
+def throat_region_cells(throats, shape, factor_mesh: tuple = (1, 1, 1)) -> list:
+    """(pore voxels, region voxels, level) per throat, as taken by mesh_estimate.predict_mesh(regions=...)."""
+    pad = math.ceil(_cell_size(factor_mesh))
+    cells = []
+    for throat in throats:
+        lo, hi = _padded_box(throat, pad, shape)
+        cells.append((throat["voxels"], math.prod(b - a + 1 for a, b in zip(lo, hi)), throat["level"]))
+    return cells
+
+def write_throat_regions(throats, labels, case_dir: str, mode: str = "stl",
+                         factor_mesh: tuple = (1, 1, 1)) -> list:
+    """
+    Write the refinement regions of `throats` for generate_snappyHexMeshDict(..., regions=...).
+
+    With mode="stl" the throats of every level are dilated by one background cell
+    and written as a closed voxel surface, constant/triSurface/throats_level<L>.stl,
+    refined `inside`; mode="box" gives one padded searchableBox per throat (at most
+    MAX_BOXES). Coordinates are in voxel index units, like generate_blockMeshDict.
+
+    Returns:
+        list: Region dicts ('name', 'type' "stl" or "box", 'level', and 'file' or 'min'/'max').
+    """
+    shape = labels.shape[::-1]
+    pad = math.ceil(_cell_size(factor_mesh))
+    if mode == "box":
+        if len(throats) > MAX_BOXES:
+            raise ValueError(f"{len(throats)} throats are too many searchableBox regions "
+                             f"(at most {MAX_BOXES}); use throat regions mode 'stl'")
+        regions = []
+        for i, throat in enumerate(throats):
+            lo, hi = _padded_box(throat, pad, shape)
+            regions.append({"name": f"throat{i}", "type": "box", "level": throat["level"], "min": lo, "max": hi})
+        return regions
+    if mode != "stl":
+        raise ValueError(f"Unsupported throat regions mode: {mode}")
+
+    level_of = np.zeros(labels.max() + 1 if labels.size else 1, dtype=np.int8)
+    for throat in throats:
+        level_of[throat["label"]] = throat["level"]
+    regions = []
+    for level in sorted({t["level"] for t in throats}):
+        mask = ndimage.binary_dilation(level_of[labels] == level, structure=np.ones((3, 3, 3), dtype=bool),
+                                       iterations=pad)
+        # extract_surface meshes the cells whose corner voxels are all 0
+        triangles, normals = extract_surface(VoxelVolume.from_array(np.where(mask, 0, 1).astype(np.uint8)))
+        del mask
+        name = f"throats_level{level}"
+        write_binary_stl(os.path.join(case_dir, "constant", "triSurface", name + ".stl"), triangles, normals,
+                         solid_name=name)
+        regions.append({"name": name, "type": "stl", "level": level, "file": name + ".stl"})
+    print(f"Wrote {len(regions)} throat refinement surfaces to {os.path.join(case_dir, 'constant', 'triSurface')}")
+    return regions
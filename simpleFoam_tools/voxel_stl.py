@@ -0,0 +1,122 @@
+import os
+import numpy as np
+from .voxel_volume import as_volume
+
+_STL_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attr', '<u2'),
+])
+
+def _solid_cells(voxel_values):
+    """
+    Return the (nz-1, ny-1, nx-1) mask of cells whose eight corner voxels are all solid (value == 0).
+
+    This reproduces the ParaView Threshold(0, 0) on point data used by paraview_stl.py.
+    """
+    solid = voxel_values == 0
+    cells = solid[:-1, :-1, :-1] & solid[1:, :-1, :-1]
+    cells &= solid[:-1, 1:, :-1]
+    cells &= solid[1:, 1:, :-1]
+    cells &= solid[:-1, :-1, 1:]
+    cells &= solid[1:, :-1, 1:]
+    cells &= solid[:-1, 1:, 1:]
+    cells &= solid[1:, 1:, 1:]
+    return cells
+
+def _rectangles(face_mask):
+    """
+    Merge the faces of a stack of 2D masks (planes, a, b) into axis-aligned rectangles.
+
+    Faces are first joined into runs along b, then runs with identical extent
+    in consecutive rows a are joined.
+
+    Returns:
+        tuple: (plane, a0, a1, b0, b1) integer arrays, with [a0, a1) x [b0, b1) per rectangle.
+    """
+    padded = np.zeros(face_mask.shape[:2] + (face_mask.shape[2] + 2,), dtype=np.int8)
+    padded[:, :, 1:-1] = face_mask
+    edges = np.diff(padded, axis=2)
+    plane, a, b0 = np.nonzero(edges == 1)
+    b1 = np.nonzero(edges == -1)[2]
+    del padded, edges
+
+    order = np.lexsort((a, b1, b0, plane))
+    plane, a, b0, b1 = plane[order], a[order], b0[order], b1[order]
+
+    new_rect = np.ones(len(a), dtype=bool)
+    new_rect[1:] = ((plane[1:] != plane[:-1]) | (b0[1:] != b0[:-1])
+                    | (b1[1:] != b1[:-1]) | (a[1:] != a[:-1] + 1))
+    first = np.flatnonzero(new_rect)
+    last = np.append(first[1:], len(a)) - 1
+    return plane[first], a[first], a[last] + 1, b0[first], b1[first]
+
+def extract_surface(vti_path):
+    """
+    Extract the solid/pore interface of a voxel image as triangles.
+
+    Coplanar voxel faces are merged into rectangles (two triangles each), so
+    flat walls produce a handful of triangles instead of two per voxel face.
+    Coordinates are in voxel index units, matching generate_blockMeshDict;
+    normals point out of the solid.
+
+    Parameters:
+        vti_path (str or VoxelVolume): Path to the .vti file, or an already loaded VoxelVolume.
+
+    Returns:
+        tuple: (triangles, normals) as float32 arrays of shape (n, 3, 3) and (n, 3).
+    """
+    cells = _solid_cells(as_volume(vti_path).array)
+
+    quads = []
+    normals = []
+    # Array axes are (z, y, x); coordinate axis of array axis d is 2 - d
+    for d in range(3):
+        a_axis, b_axis = [ax for ax in range(3) if ax != d]
+        padded = np.moveaxis(np.pad(cells, [(1, 1) if ax == d else (0, 0) for ax in range(3)]), d, 0)
+        for sign, face_mask in ((1, padded[:-1] & ~padded[1:]), (-1, ~padded[:-1] & padded[1:])):
+            plane, a0, a1, b0, b1 = _rectangles(face_mask)
+            if len(plane) == 0:
+                continue
+            corners = np.empty((len(plane), 4, 3), dtype=np.float32)
+            corners[:, :, 2 - d] = plane[:, None]
+            corners[:, :, 2 - a_axis] = np.stack([a0, a1, a1, a0], axis=1)
+            corners[:, :, 2 - b_axis] = np.stack([b0, b0, b1, b1], axis=1)
+            normal = np.zeros(3, dtype=np.float32)
+            normal[2 - d] = sign
+            quads.append(corners)
+            normals.append(np.broadcast_to(normal, (len(plane), 3)))
+        del padded
+
+    if not quads:
+        return np.empty((0, 3, 3), dtype=np.float32), np.empty((0, 3), dtype=np.float32)
+    quads = np.concatenate(quads)
+    normals = np.concatenate(normals)
+
+    triangles = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+    normals = np.concatenate([normals, normals])
+
+    # Fix the winding so the right-hand normal matches the outward normal
+    winding = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    flip = np.einsum('ij,ij->i', winding, normals) < 0
+    triangles[flip, 1], triangles[flip, 2] = triangles[flip, 2], triangles[flip, 1]
+    return triangles, normals
+
+def write_binary_stl(stl_path, triangles, normals, solid_name="solids"):
+    """Write triangles and their normals to a binary STL file."""
+    records = np.zeros(len(triangles), dtype=_STL_DTYPE)
+    records['normal'] = normals
+    records['vertices'] = triangles
+
+    header = f"binary STL {solid_name} written by simpleFoam_tools".encode()[:80].ljust(80, b' ')
+    os.makedirs(os.path.dirname(os.path.abspath(stl_path)), exist_ok=True)
+    with open(stl_path, 'wb') as f:
+        f.write(header)
+        f.write(np.uint32(len(records)).tobytes())
+        records.tofile(f)
+
+def voxel_to_stl(vti_path, stl_path):
+    """Convert a voxel image to a binary STL of its solid surface, without ParaView."""
+    triangles, normals = extract_surface(vti_path)
+    write_binary_stl(stl_path, triangles, normals)
+    print(f"Wrote binary STL: {stl_path} ({len(triangles)} triangles)")
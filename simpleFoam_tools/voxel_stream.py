@@ -0,0 +1,211 @@
+import re
+import zlib
+import binascii
+import numpy as np
+
+_VTK_TYPES = {
+    "Int8": "i1", "UInt8": "u1", "Int16": "i2", "UInt16": "u2", "Int32": "i4", "UInt32": "u4",
+    "Int64": "i8", "UInt64": "u8", "Float32": "f4", "Float64": "f8",
+}
+_ATTRIBUTE = re.compile(rb'([\w:]+)\s*=\s*"([^"]*)"')
+_BLOCK = 1 << 20
+
+def _attributes(tag):
+    return {k.decode(): v.decode() for k, v in _ATTRIBUTE.findall(tag)}
+
+class _RawBytes:
+    """Sequential reads from a file position."""
+
+    def __init__(self, f, start):
+        self.f = f
+        self.f.seek(start)
+
+    def read(self, n):
+        data = self.f.read(n)
+        if len(data) < n:
+            raise ValueError("Unexpected end of VTI data")
+        return data
+
+class _Base64Bytes:
+    """Sequential reads of base64-encoded bytes, decoded in 4-character groups and skipping whitespace."""
+
+    def __init__(self, f, start):
+        self.f = f
+        self.f.seek(start)
+        self.text = b""
+        self.decoded = bytearray()
+        self.done = False
+
+    def read(self, n):
+        while len(self.decoded) < n:
+            block = self.f.read(_BLOCK) if not self.done else b""
+            if not block:
+                raise ValueError("Unexpected end of base64 VTI data")
+            if b"<" in block:
+                block = block.split(b"<", 1)[0]
+                self.done = True
+            self.text += re.sub(rb"\s+", b"", block)
+            usable = len(self.text) // 4 * 4
+            chunk, self.text = self.text[:usable], self.text[usable:]
+            # VTK encodes header and data as separately padded streams, so decode up to each padding
+            while chunk:
+                pad = chunk.find(b"=")
+                end = len(chunk) if pad < 0 else (pad // 4 + 1) * 4
+                self.decoded += binascii.a2b_base64(chunk[:end])
+                chunk = chunk[end:]
+        data, self.decoded = bytes(self.decoded[:n]), self.decoded[n:]
+        return data
+
+class _DataBytes:
+    """The uncompressed bytes of one VTK binary DataArray (raw or zlib block-compressed)."""
+
+    def __init__(self, stream, header_dtype, compressed):
+        self.stream = stream
+        size = header_dtype.itemsize
+        if compressed:
+            n_blocks, self.block_size, last_size = np.frombuffer(stream.read(3 * size), header_dtype).tolist()
+            self.compressed_sizes = np.frombuffer(stream.read(n_blocks * size), header_dtype).tolist()
+        else:
+            self.compressed_sizes = None
+            self.remaining = int(np.frombuffer(stream.read(size), header_dtype)[0])
+        self.buffer = bytearray()
+
+    def read(self, n):
+        while len(self.buffer) < n:
+            if self.compressed_sizes is None:
+                take = min(max(n - len(self.buffer), _BLOCK), self.remaining)
+                if take == 0:
+                    raise ValueError("VTI data array is shorter than its extent")
+                self.buffer += self.stream.read(take)
+                self.remaining -= take
+            else:
+                if not self.compressed_sizes:
+                    raise ValueError("VTI data array is shorter than its extent")
+                self.buffer += zlib.decompress(self.stream.read(self.compressed_sizes.pop(0)))
+        data, self.buffer = bytes(self.buffer[:n]), self.buffer[n:]
+        return data
+
+class _BinaryValues:
+    """Typed values read from a _DataBytes stream."""
+
+    def __init__(self, data, dtype):
+        self.data = data
+        self.dtype = dtype
+
+    def read(self, n):
+        return np.frombuffer(self.data.read(n * self.dtype.itemsize), self.dtype)
+
+class _AsciiValues:
+    """Whitespace-separated numbers of an ascii DataArray, read up to its closing tag."""
+
+    def __init__(self, f, start, dtype):
+        self.f = f
+        self.f.seek(start)
+        self.dtype = dtype
+        self.tail = b""
+        self.values = np.empty(0, dtype)
+        self.done = False
+
+    def read(self, n):
+        parts = [self.values]
+        have = len(self.values)
+        while have < n and not self.done:
+            block = self.f.read(_BLOCK)
+            if b"<" in block or not block:
+                block = block.split(b"<", 1)[0]
+                self.done = True
+            text = self.tail + block
+            if not self.done and text and not text[-1:].isspace():
+                # Keep a number split over two blocks for the next read
+                cut = max(text.rfind(b" "), text.rfind(b"\n"), text.rfind(b"\t"))
+                text, self.tail = text[:cut + 1], text[cut + 1:]
+            else:
+                self.tail = b""
+            values = np.array(text.split(), dtype=float).astype(self.dtype)
+            parts.append(values)
+            have += len(values)
+        values = np.concatenate(parts)
+        if len(values) < n:
+            raise ValueError("VTI data array is shorter than its extent")
+        self.values = values[n:]
+        return values[:n]
+
+class VTIStream:
+    """
+    Read the voxel array of a .vti file slab by slab, without decoding the whole image.
+
+    Supports the layouts written by VTK/ParaView: ascii, inline base64 ('binary')
+    and appended raw or base64 data, uncompressed or zlib-compressed, with 32- or
+    64-bit headers and either byte order. Only the first PointData array is read.
+
+    Parameters:
+        vti_file_path (str): Path to the .vti file.
+
+    Attributes:
+        shape (tuple): Domain dimensions (nx, ny, nz).
+        spacing (tuple): Voxel spacing (dx, dy, dz).
+        origin (tuple): Origin (x0, y0, z0).
+        dtype (np.dtype): Voxel data type.
+
+    Example:
+        for z0, slab in VTIStream("sample.vti").slabs(64):
+            pores += np.count_nonzero(slab > 0)
+    """
+
+    def __init__(self, vti_file_path):
+        self.path = vti_file_path
+        with open(vti_file_path, 'rb') as f:
+            head = b""
+            while True:
+                block = f.read(_BLOCK)
+                head += block
+                array_tag = re.search(rb"<PointData[^>]*>\s*<DataArray([^>]*)>", head)
+                if array_tag or not block:
+                    break
+            if not array_tag:
+                raise ValueError(f"No PointData array found in {vti_file_path}")
+
+            vtk_file = _attributes(re.search(rb"<VTKFile([^>]*)>", head).group(1))
+            image = _attributes(re.search(rb"<ImageData([^>]*)>", head).group(1))
+            array = _attributes(array_tag.group(1))
+
+            extent = [int(v) for v in image["WholeExtent"].split()]
+            self.shape = tuple(extent[2 * i + 1] - extent[2 * i] + 1 for i in range(3))
+            self.spacing = tuple(float(v) for v in image.get("Spacing", "1 1 1").split())
+            self.origin = tuple(float(v) for v in image.get("Origin", "0 0 0").split())
+            if int(array.get("NumberOfComponents", 1)) != 1:
+                raise ValueError(f"Expected a single-component voxel array in {vti_file_path}")
+            order = ">" if vtk_file.get("byte_order") == "BigEndian" else "<"
+            self.dtype = np.dtype(order + _VTK_TYPES[array["type"]])
+            self._header_dtype = np.dtype(order + _VTK_TYPES[vtk_file.get("header_type", "UInt32")])
+            self._compressed = "compressor" in vtk_file
+            self._format = array.get("format", "ascii")
+
+            if self._format == "appended":
+                while not re.search(rb"<AppendedData[^>]*>\s*_", head):
+                    block = f.read(_BLOCK)
+                    if not block:
+                        raise ValueError(f"No AppendedData section found in {vti_file_path}")
+                    head += block
+                appended = re.search(rb"<AppendedData([^>]*)>\s*_", head)
+                self._encoding = _attributes(appended.group(1)).get("encoding", "raw")
+                # For base64 appended data the offset counts encoded characters, which is still a file offset
+                self._start = appended.end() + int(array.get("offset", 0))
+            else:
+                self._encoding = "base64" if self._format == "binary" else "ascii"
+                self._start = array_tag.end()
+
+    def _values(self, f):
+        if self._encoding == "ascii":
+            return _AsciiValues(f, self._start, self.dtype)
+        stream = (_Base64Bytes if self._encoding == "base64" else _RawBytes)(f, self._start)
+        return _BinaryValues(_DataBytes(stream, self._header_dtype, self._compressed), self.dtype)
+
+    def slabs(self, chunk: int = 64):
+        """Yield (z0, slab) with slab a (dz, ny, nx) array of at most `chunk` z-slices."""
+        nx, ny, nz = self.shape
+        with open(self.path, 'rb') as f:
+            values = self._values(f)
+            for z0 in range(0, nz, chunk):
+                dz = min(chunk, nz - z0)
+                yield z0, values.read(dz * ny * nx).reshape(dz, ny, nx)
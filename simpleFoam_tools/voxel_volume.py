@@ -0,0 +1,226 @@
+import os
+import json
+import hashlib
+import numpy as np
+from .voxel_stream import VTIStream
+
+def _file_hash(file_path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in blocks."""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+class VoxelVolume:
+    """
+    A voxel image read once from a .vti file and shared by the whole workflow.
+
+    The decoded voxel array is cached next to the VTI as ``<file>.vti.npy``
+    (plus a small ``.json`` sidecar) and memory-mapped on later calls, so
+    porosity, shape, pore location and STL/mesh generation all reuse a single
+    decode. The cache is rebuilt when the VTI's mtime changes and its content
+    hash no longer matches. The VTI is decoded slab by slab straight into the
+    cache, so volumes larger than RAM can be loaded.
+
+    Plain ``.npy`` volumes (nz, ny, nx) and headerless ``.raw`` volumes are
+    memory-mapped directly; ``.raw`` needs `shape` and `dtype`.
+
+    Parameters:
+        vti_file_path (str): Path to the .vti, .npy or .raw file.
+        cache (bool): If False, never read or write the on-disk .npy cache.
+        shape (tuple): Dimensions (nx, ny, nz) of a .raw volume.
+        dtype (str): Voxel data type of a .raw volume, e.g. "uint8".
+        header_bytes (int): Bytes to skip at the start of a .raw volume.
+
+    Attributes:
+        path (str): Absolute path of the source file.
+        shape (tuple): Domain dimensions (nx, ny, nz), as returned by VTK.
+        spacing (tuple): Voxel spacing (dx, dy, dz) stored in the VTI.
+        origin (tuple): Origin (x0, y0, z0) stored in the VTI.
+    """
+
+    def __init__(self, vti_file_path, cache=True, shape=None, dtype=None, header_bytes=0):
+        self.path = os.path.abspath(vti_file_path)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"VTI file not found: {self.path}")
+        self._array = None
+        extension = os.path.splitext(self.path)[1].lower()
+        if extension in (".npy", ".raw"):
+            self._open_plain(extension, shape, dtype, header_bytes)
+            return
+        self.cache_path = self.path + ".npy"
+        self.meta_path = self.cache_path + ".json"
+        self._cache = cache
+        self._meta = self._load_meta() if cache else None
+        if self._meta is None:
+            self._read_vti()
+
+    @classmethod
+    def from_array(cls, array, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0)):
+        """
+        Wrap an in-memory (nz, ny, nx) voxel array, e.g. a cleaned or cropped volume.
+
+        The returned volume has no source file (`path` is None) and is never cached on disk.
+        """
+        array = np.asarray(array)
+        if array.ndim != 3:
+            raise ValueError(f"Expected a 3D (nz, ny, nx) array, got shape {array.shape}")
+        h = hashlib.sha256(repr((array.shape, array.dtype.str)).encode())
+        for plane in array:
+            h.update(np.ascontiguousarray(plane).data)
+
+        volume = cls.__new__(cls)
+        volume.path = volume.cache_path = volume.meta_path = None
+        volume._cache = False
+        volume._array = array
+        volume._meta = {
+            "shape": list(array.shape[::-1]),
+            "spacing": list(spacing),
+            "origin": list(origin),
+            "dtype": array.dtype.str,
+            "sha256": h.hexdigest(),
+        }
+        return volume
+
+    def __repr__(self):
+        return f"VoxelVolume({self.path!r}, shape={self.shape})"
+
+    @property
+    def shape(self):
+        return tuple(self._meta["shape"])
+
+    @property
+    def spacing(self):
+        return tuple(self._meta["spacing"])
+
+    @property
+    def origin(self):
+        return tuple(self._meta["origin"])
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the source file (of the array itself for in-memory volumes)."""
+        if "sha256" not in self._meta:
+            self._meta["sha256"] = _file_hash(self.path)
+        return self._meta["sha256"]
+
+    @property
+    def size(self):
+        nx, ny, nz = self.shape
+        return nx * ny * nz
+
+    @property
+    def array(self):
+        """Voxel values as a (nz, ny, nx) array, memory-mapped when cached."""
+        if self._array is None:
+            self._array = np.load(self.cache_path, mmap_mode='r')
+        return self._array
+
+    def slabs(self, chunk: int = 64):
+        """Yield (z0, slab) with slab a (dz, ny, nx) view of at most `chunk` z-slices."""
+        array = self.array
+        for z0 in range(0, array.shape[0], chunk):
+            yield z0, array[z0:z0 + chunk]
+
+    def _open_plain(self, extension, shape, dtype, header_bytes):
+        """Memory-map a .npy or .raw volume in place; no cache is needed."""
+        self.cache_path = self.meta_path = None
+        self._cache = False
+        if extension == ".npy":
+            self._array = np.load(self.path, mmap_mode='r')
+            if self._array.ndim != 3:
+                raise ValueError(f"Expected a 3D (nz, ny, nx) array in {self.path}, got shape {self._array.shape}")
+        else:
+            if shape is None or dtype is None:
+                raise ValueError("Reading a .raw volume needs its shape (nx, ny, nz) and dtype")
+            nx, ny, nz = shape
+            expected = header_bytes + nx * ny * nz * np.dtype(dtype).itemsize
+            if os.path.getsize(self.path) != expected:
+                raise ValueError(f"{self.path} has {os.path.getsize(self.path)} bytes, "
+                                 f"expected {expected} for shape {tuple(shape)} and dtype {dtype}")
+            self._array = np.memmap(self.path, dtype=dtype, mode='r', offset=header_bytes, shape=(nz, ny, nx))
+        stat = os.stat(self.path)
+        self._meta = {
+            "shape": list(self._array.shape[::-1]),
+            "spacing": [1.0, 1.0, 1.0],
+            "origin": [0.0, 0.0, 0.0],
+            "dtype": self._array.dtype.str,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def _load_meta(self):
+        """Return cached metadata if the .npy cache is still valid for the VTI, else None."""
+        if not (os.path.exists(self.cache_path) and os.path.exists(self.meta_path)):
+            return None
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        stat = os.stat(self.path)
+        if meta.get("size") != stat.st_size:
+            return None
+        if meta.get("mtime_ns") != stat.st_mtime_ns:
+            # Touched but possibly unchanged (e.g. copied or checked out): compare content
+            if meta.get("sha256") != _file_hash(self.path):
+                return None
+            meta["mtime_ns"] = stat.st_mtime_ns
+            self._write_meta(meta)
+        return meta
+
+    def _write_meta(self, meta):
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def _read_vti(self):
+        """Decode the VTI slab by slab and (re)build the .npy cache."""
+        print(f"Reading VTI: {self.path}")
+        stream = VTIStream(self.path)
+        nx, ny, nz = stream.shape
+
+        stat = os.stat(self.path)
+        self._meta = {
+            "shape": list(stream.shape),
+            "spacing": list(stream.spacing),
+            "origin": list(stream.origin),
+            "dtype": stream.dtype.newbyteorder("=").str,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": _file_hash(self.path),
+        }
+
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp.npy"
+        try:
+            if self._cache:
+                voxel_values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=self._meta["dtype"],
+                                                         shape=(nz, ny, nx))
+            else:
+                voxel_values = np.empty((nz, ny, nx), dtype=self._meta["dtype"])
+        except OSError as e:
+            print(f"Warning: could not write voxel cache next to {self.path}: {e}")
+            self._cache = False
+            voxel_values = np.empty((nz, ny, nx), dtype=self._meta["dtype"])
+        for z0, slab in stream.slabs():
+            voxel_values[z0:z0 + len(slab)] = slab
+
+        if not self._cache:
+            self._array = voxel_values
+            return
+        voxel_values.flush()
+        del voxel_values
+        os.replace(tmp_path, self.cache_path)
+        self._write_meta(self._meta)
+        # Serve the memory-mapped cache from now on
+        self._array = None
+        print(f"Cached voxel array at: {self.cache_path}")
+
+def as_volume(source):
+    """Return `source` if it is already a VoxelVolume, otherwise load it from a .vti path."""
+    if isinstance(source, VoxelVolume):
+        return source
+    return VoxelVolume(source)
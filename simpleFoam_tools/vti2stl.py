@@ -1,11 +1,25 @@
 import os
 import sys
 import subprocess
+from .voxel_stl import voxel_to_stl
 basedir = os.path.dirname(os.path.abspath(__file__))
 
-def vti_to_stl(vti_path, stl_path):
-    """Convert VTI to STL using paraview_stl.py script."""
-    vti_abs = os.path.abspath(vti_path)
+def vti_to_stl(vti_path, stl_path, method: str = "numpy"):
+    """Convert VTI to STL.
+
+    `vti_path` may also be a VoxelVolume. The default "numpy" method extracts
+    the surface in-process and writes a binary STL with merged coplanar faces;
+    "paraview" runs the original paraview_stl.py script through pvpython.
+    """
+    if method.lower() == "numpy":
+        voxel_to_stl(vti_path, stl_path)
+        return
+    elif method.lower() != "paraview":
+        raise ValueError(f"Unsupported STL method: {method}")
+    if getattr(vti_path, "path", "") is None:
+        raise ValueError("The paraview method needs a VTI file; use method='numpy' for in-memory volumes")
+
+    vti_abs = os.path.abspath(getattr(vti_path, "path", vti_path))
     stl_abs = os.path.abspath(stl_path)
 
     command = ["pvpython",
@@ -0,0 +1,30 @@
+import pytest
+
+from simpleFoam_tools.grid_convergence import richardson_extrapolation
+
+def test_second_order_sequence():
+    h = [1.0, 2.0, 4.0]
+    phi = [1.0 + 1e-3 * x**2 for x in h]
+    result = richardson_extrapolation(h, phi)
+    assert result["order"] == pytest.approx(2.0, abs=1e-8)
+    assert result["extrapolated"] == pytest.approx(1.0, abs=1e-10)
+    assert result["convergence"] == "monotonic"
+    # GCI ratio phi1 / phi2 in the asymptotic range
+    assert result["asymptotic_ratio"] == pytest.approx(phi[0] / phi[1], rel=1e-8)
+    assert 0 < result["gci_fine"] < result["gci_coarse"]
+
+def test_non_constant_refinement_ratio():
+    h = [1.0, 1.5, 3.0]
+    phi = [2.0 - 0.1 * x**2 for x in h]
+    result = richardson_extrapolation(h, phi)
+    assert result["order"] == pytest.approx(2.0, abs=1e-6)
+    assert result["extrapolated"] == pytest.approx(2.0, abs=1e-6)
+
+def test_identical_solutions_are_exact():
+    result = richardson_extrapolation([1.0, 2.0, 4.0], [3.0, 3.0, 3.0])
+    assert result["convergence"] == "exact"
+    assert result["extrapolated"] == 3.0
+
+def test_cell_sizes_must_increase():
+    with pytest.raises(ValueError):
+        richardson_extrapolation([2.0, 1.0, 4.0], [1.0, 2.0, 3.0])
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from simpleFoam_tools.pyramid import build_pyramid, POROSITY_TOLERANCE
+from simpleFoam_tools.voxel_volume import VoxelVolume
+
+def _two_chambers(throat: int) -> np.ndarray:
+    """Two pore chambers joined along x by a throat `throat` voxels wide, plus a sealed pocket."""
+    array = np.zeros((64, 64, 64), dtype=np.uint8)
+    array[8:56, 8:56, :24] = 1
+    array[8:56, 8:56, 40:] = 1
+    array[30:30 + throat, 30:30 + throat, 20:44] = 1
+    array[:8, :8, 24:32] = 1  # isolated pocket, not face-connected to the chambers
+    return array
+
+@pytest.mark.parametrize("throat", [1, 2])
+def test_pyramid_keeps_percolation_and_clusters(throat):
+    levels, reports = build_pyramid(VoxelVolume.from_array(_two_chambers(throat)), cache=False)
+    for factor, report in reports.items():
+        assert report["fine_clusters"] == 2
+        assert report["fine_percolates"] == [True, False, False]
+        assert report["percolates"] == report["fine_percolates"], factor
+        assert report["clusters"] == report["fine_clusters"], factor
+        assert abs(report["porosity"] / report["fine_porosity"] - 1) <= POROSITY_TOLERANCE, factor
+        assert levels[factor].shape == tuple(64 // factor for _ in range(3))
+
+def test_pyramid_opens_only_the_throat_path():
+    fine = _two_chambers(1)
+    levels, _ = build_pyramid(VoxelVolume.from_array(fine), factors=(8,), cache=False)
+    coarse = np.asarray(levels[8].array) > 0
+    # Between the chambers (coarse x blocks 3 and 4, away from the pocket) only the throat path is opened
+    assert np.count_nonzero(coarse[1:, 1:, 3:5]) == 2
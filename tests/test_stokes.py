@@ -0,0 +1,39 @@
+import math
+import numpy as np
+import pytest
+
+from simpleFoam_tools.stokes import solve_stokes
+from simpleFoam_tools.voxel_volume import VoxelVolume
+
+def _square_duct_factor(terms: int = 100) -> float:
+    """k / a^2 of fully developed flow in a square duct of side a (series solution)."""
+    series = sum(math.tanh(n * math.pi / 2) / n**5 for n in range(1, 2 * terms, 2))
+    return (1 - 192 / math.pi**5 * series) / 12
+
+def test_square_duct_matches_poiseuille():
+    side = 16
+    volume = VoxelVolume.from_array(np.ones((side, side, 10), dtype=np.uint8))
+    result = solve_stokes(volume, scale=1.0, boundary="Wall", rtol=1e-10)
+    assert result["converged"]
+    assert result["permeability_m2"] == pytest.approx(_square_duct_factor() * side**2, rel=0.025)
+
+@pytest.mark.parametrize("axis", [0, 1])
+def test_slit_matches_poiseuille(axis):
+    # A slit of height h between two solid voxel layers; symmetryPlane sides make it infinitely wide
+    h, length = 16, 10
+    array = np.zeros((2, h + 2, length), dtype=np.uint8)
+    array[:, 1:h + 1, :] = 1
+    if axis == 1:
+        array = np.ascontiguousarray(array.transpose(0, 2, 1))
+    result = solve_stokes(VoxelVolume.from_array(array), axis=axis, scale=1e-6, dp=2.0, mu=1e-3, rtol=1e-10)
+    assert result["converged"]
+    assert result["flow_rate_inlet"] == pytest.approx(result["flow_rate"], rel=1e-6)
+    # The staggered grid is second-order: k_h = k (1 + 2 / h^2) for a slit
+    k = (h * 1e-6)**3 / (12 * (h + 2) * 1e-6)
+    assert result["permeability_m2"] == pytest.approx(k, rel=0.01)
+
+def test_non_percolating_sample_raises():
+    array = np.zeros((8, 8, 8), dtype=np.uint8)
+    array[2:6, 2:6, 1:7] = 1
+    with pytest.raises(ValueError):
+        solve_stokes(VoxelVolume.from_array(array))